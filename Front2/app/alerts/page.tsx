@@ -10,6 +10,9 @@ import Link from "next/link"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
 import { Badge } from "@/components/ui/badge"
 
+// Alertas por página: /api/alerts devuelve en X-Next-Cursor el cursor de la siguiente
+const PAGE_SIZE = 200
+
 interface Alert {
   IBAN: string
   codigo_transaccion: string
@@ -21,8 +24,25 @@ interface Alert {
 export default function AlertsPage() {
   const [alerts, setAlerts] = useState<Alert[]>([])
   const [loading, setLoading] = useState(false)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [ibanFilter, setIbanFilter] = useState("")
   const [minScoreFilter, setMinScoreFilter] = useState("")
+  // Filtros de la última búsqueda: las páginas siguientes se piden con ellos, no con lo que haya escrito ahora
+  const [searchParams, setSearchParams] = useState<URLSearchParams>(new URLSearchParams())
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+
+  const fetchPage = async (params: URLSearchParams, cursor: string | null) => {
+    const pageParams = new URLSearchParams(params)
+    pageParams.append("limit", String(PAGE_SIZE))
+    if (cursor) pageParams.append("cursor", cursor)
+
+    const response = await fetch(`/api/alerts?${pageParams.toString()}`)
+    if (!response.ok) {
+      throw new Error("Error al cargar alertas")
+    }
+    const data: Alert[] = await response.json()
+    return { data, next: response.headers.get("X-Next-Cursor") }
+  }
 
   const fetchAlerts = async () => {
     setLoading(true)
@@ -31,12 +51,10 @@ export default function AlertsPage() {
       if (ibanFilter) params.append("iban", ibanFilter)
       if (minScoreFilter) params.append("min_score", minScoreFilter)
 
-      const response = await fetch(`/api/alerts?${params.toString()}`)
-      if (!response.ok) {
-        throw new Error("Error al cargar alertas")
-      }
-      const data = await response.json()
+      const { data, next } = await fetchPage(params, null)
+      setSearchParams(params)
       setAlerts(data)
+      setNextCursor(next)
     } catch (err) {
       console.error(err)
     } finally {
@@ -44,6 +62,20 @@ export default function AlertsPage() {
     }
   }
 
+  const loadMoreAlerts = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const { data, next } = await fetchPage(searchParams, nextCursor)
+      setAlerts((previous) => [...previous, ...data])
+      setNextCursor(next)
+    } catch (err) {
+      console.error(err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   useEffect(() => {
     fetchAlerts()
   }, [])
@@ -156,7 +188,7 @@ export default function AlertsPage() {
           <CardHeader>
             <CardTitle className="flex items-center gap-2">
               <AlertTriangle className="w-5 h-5 text-primary" />
-              Alertas Detectadas ({alerts.length})
+              Alertas Detectadas ({alerts.length}{nextCursor ? "+" : ""})
             </CardTitle>
           </CardHeader>
           <CardContent>
@@ -210,6 +242,20 @@ export default function AlertsPage() {
                     ))}
                   </TableBody>
                 </Table>
+                {nextCursor && (
+                  <div className="flex justify-center pt-4">
+                    <Button variant="outline" onClick={loadMoreAlerts} disabled={loadingMore}>
+                      {loadingMore ? (
+                        <>
+                          <Loader2 className="w-4 h-4 mr-2 animate-spin" />
+                          Cargando...
+                        </>
+                      ) : (
+                        "Cargar más"
+                      )}
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </CardContent>
@@ -5,12 +5,16 @@ export async function GET(request: NextRequest) {
     const searchParams = request.nextUrl.searchParams
     const iban = searchParams.get("iban")
     const minScore = searchParams.get("min_score")
+    const limit = searchParams.get("limit")
+    const cursor = searchParams.get("cursor")
 
     // Construir la URL con los parámetros de búsqueda
     const API_URL = process.env.API_URL ?? 'http://backend:8000';
     const params = new URLSearchParams()
     if (iban) params.append("iban", iban)
     if (minScore) params.append("min_score", minScore)
+    if (limit) params.append("limit", limit)
+    if (cursor) params.append("cursor", cursor)
 
     const response = await fetch(`${API_URL}/alerts?${params.toString()}`, {
       method: "GET",
@@ -24,7 +28,9 @@ export async function GET(request: NextRequest) {
     }
 
     const data = await response.json()
-    return NextResponse.json(data)
+    // Cursor de la página siguiente de /alerts (paginación por id)
+    const nextCursor = response.headers.get("X-Next-Cursor")
+    return NextResponse.json(data, { headers: nextCursor ? { "X-Next-Cursor": nextCursor } : {} })
   } catch (error) {
     console.error("Error fetching alerts:", error)
     return NextResponse.json({ error: "Error al obtener las alertas" }, { status: 500 })
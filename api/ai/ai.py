@@ -6,57 +6,88 @@ import warnings
 warnings.filterwarnings('ignore', category=UserWarning)
 warnings.filterwarnings('ignore', category=FutureWarning)
 
-import tensorflow as tf
-tf.get_logger().setLevel('ERROR')
-tf.autograph.set_verbosity(0)
+# TensorFlow solo hace falta con el backend keras; con ML_BACKEND=numpy no se importa
+if os.getenv("ML_BACKEND", "keras") == "keras":
+    import tensorflow as tf
+    tf.get_logger().setLevel('ERROR')
+    tf.autograph.set_verbosity(0)
 
 import logging
 logging.getLogger('tensorflow').setLevel(logging.ERROR)
 
 import json
-from typing import List, Dict, Any
-from largeLanguageModel.queryLargeLanguageModel import queryLargeLanguageModel
-from machineLearning.queryMachineLearning import queryMachineLearning
-from machineLearning.trainMachineLearning import transformar_fecha_a_timestamp_simple
+import time
+from typing import List, Dict, Any, Optional
+from historyStore import AlmacenHistorial, HistorialCliente
+from riskScoring import puntuar_lote
+from metrics import DURACION_ETAPA, metricas
 
+# Fichero donde dejar las métricas (formato texto de Prometheus) al terminar; vacío = no se escriben
+METRICS_FILE = os.getenv("METRICS_FILE", "")
 
-def procesar_transacciones(archivo_json: str, archivo_historial: str) -> List[Dict[str, Any]]:
-    with open(archivo_json, 'r', encoding='utf-8') as file:
-        datos_analizar = json.load(file)
 
-    with open(archivo_historial, 'r', encoding='utf-8') as file:
-        historial_completo = json.load(file)
-    
-    resultados = []
-    
-    for transaccion in datos_analizar['transactions']:
-        datos_comunes = {
-            'transaction_value': transaccion['transaction_value'],
-            'is_recurring': transaccion['is_recurring'],
-            'is_first_purchase': transaccion['is_first_purchase'],
-            'product_category': transaccion['product_category'],
-            'collector_company': transaccion['collector_company'],
-            'iban_anonymized': transaccion['iban_anonymized'],
-            'transaction_date': transaccion['transaction_date'],
-            'has_been_refunded': transaccion['has_been_refunded']
+def puntuar_transacciones_cliente(transacciones: List[Dict[str, Any]], historial_cliente: HistorialCliente,
+                                  iban: str, tiempos: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    Puntúa las transacciones de un cliente con el mismo código que la API: vista del historial
+    antes de la subida, rasgos agregados por empresa (cada transacción entra en el historial
+    al calcularlos) y riskScoring.puntuar_lote.
+    """
+    # Solo la ventana reciente + total: el contexto de cada transacción no depende del tamaño del historial
+    historial_completo = historial_cliente.como_historial()
+
+    lista_datos_comunes = [
+        {
+            # Mismos valores por defecto que la API para los campos que falten
+            'transaction_value': transaccion.get('transaction_value', 0.0),
+            'is_recurring': transaccion.get('is_recurring', False),
+            'is_first_purchase': transaccion.get('is_first_purchase', False),
+            'product_category': transaccion.get('product_category', ''),
+            'collector_company': transaccion.get('collector_company', ''),
+            'iban_anonymized': transaccion.get('iban_anonymized', ''),
+            'transaction_date': transaccion.get('transaction_date', ''),
+            'has_been_refunded': transaccion.get('has_been_refunded', False)
         }
-        
-        riesgo_llm = queryLargeLanguageModel(datos_comunes, historial_completo)
-        riesgo_ml = queryMachineLearning(datos_comunes)
-        umbral_probabilistico = (riesgo_llm * 0.5) + (riesgo_ml * 0.5)
+        for transaccion in transacciones
+    ]
+
+    inicio = time.perf_counter()
+    rasgos = []
+    for datos in lista_datos_comunes:
+        rasgos.append(historial_cliente.rasgos(datos))
+        historial_cliente.anadir(datos)
+    segundos = time.perf_counter() - inicio
+    DURACION_ETAPA.observar(segundos, etapa="historial")
+    if tiempos is not None:
+        tiempos['rasgos'] = tiempos.get('rasgos', 0.0) + segundos
 
+    puntuaciones = puntuar_lote(lista_datos_comunes, [historial_completo] * len(lista_datos_comunes), rasgos, tiempos)
+
+    resultados = []
+
+    for transaccion, (umbral_probabilistico, solo_ml) in zip(transacciones, puntuaciones):
         resultado = {
-            'iban': datos_analizar['user_profile']['iban_number'],
-            'codigo_transaccion': transaccion['transaction_code'],
-            'importe': transaccion['transaction_value'],
+            'iban': iban,
+            'codigo_transaccion': transaccion.get('transaction_code'),
+            'importe': transaccion.get('transaction_value', 0.0),
             'umbral_probabilistico': umbral_probabilistico,
-            'iban_empresa_colaboradora': transaccion['iban_anonymized']
+            'iban_empresa_colaboradora': transaccion.get('iban_anonymized'),
+            'solo_ml': solo_ml
         }
 
         resultados.append(resultado)
-    
+
     return resultados
 
+def procesar_transacciones(archivo_json: str, archivo_historial: str) -> List[Dict[str, Any]]:
+    with open(archivo_json, 'r', encoding='utf-8') as file:
+        datos_analizar = json.load(file)
+
+    historial_cliente = AlmacenHistorial().cargar_fichero(archivo_historial)
+
+    return puntuar_transacciones_cliente(datos_analizar['transactions'], historial_cliente,
+                                         datos_analizar['user_profile']['iban_number'])
+
 if __name__ == "__main__":
     archivo_analizar = "json files/testing/ult_2_dias_cliente1.json"
     archivo_historial = "json files/training/cliente1_total.json"
@@ -66,4 +97,8 @@ if __name__ == "__main__":
         print(resultados)
         
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        print(f"Error: {e}")
+
+    if METRICS_FILE:
+        metricas.escribir(METRICS_FILE)
+        print(f"Métricas escritas en {METRICS_FILE}")
\ No newline at end of file
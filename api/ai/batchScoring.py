@@ -0,0 +1,184 @@
+# batchScoring.py
+# Re-puntuación offline de muchos clientes con el mismo código que la API (ai.puntuar_transacciones_cliente).
+# Cada cliente (customer_id o iban_number del user_profile) se empareja con su fichero *_total.json
+# y los clientes se reparten entre un pool de procesos. Los resultados se escriben según llegan. Uso:
+#   python api/ai/batchScoring.py "json files/testing/*.json" --historiales "json files/training/*_total.json" \
+#       --salida resultados.ndjson --procesos 4
+#   ... --salida resultados.csv       (el formato sale de la extensión o de --formato)
+#   ... --metricas batch.prom         (métricas de todos los procesos, formato texto de Prometheus)
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import metricas
+
+CAMPOS_RESULTADO = ['iban', 'codigo_transaccion', 'importe', 'umbral_probabilistico', 'iban_empresa_colaboradora', 'solo_ml']
+
+
+def _claves_cliente(datos: Dict[str, Any]) -> List[str]:
+    claves = [datos.get('customer_id'), datos.get('user_profile', {}).get('iban_number')]
+    return [clave for clave in claves if clave]
+
+
+def expandir(patrones: List[str]) -> List[str]:
+    rutas = []
+    for patron in patrones:
+        encontradas = sorted(glob.glob(patron))
+        if not encontradas:
+            print(f"Aviso: '{patron}' no coincide con ningún fichero")
+        rutas.extend(ruta for ruta in encontradas if ruta not in rutas)
+    return rutas
+
+
+def planificar(entradas: List[str], historiales: List[str]) -> List[Tuple[str, List[str], Optional[str]]]:
+    """
+    Agrupa los ficheros a puntuar por cliente: [(cliente, [entradas...], historial o None)].
+    """
+    historial_de: Dict[str, str] = {}
+    for ruta in historiales:
+        with open(ruta, 'r', encoding='utf-8') as file:
+            for clave in _claves_cliente(json.load(file)):
+                historial_de[clave] = ruta
+
+    tareas: Dict[str, Tuple[List[str], Optional[str]]] = {}
+    for ruta in entradas:
+        if ruta in historial_de.values():
+            continue  # un *_total.json que también casa con el glob de entrada no se puntúa contra sí mismo
+        with open(ruta, 'r', encoding='utf-8') as file:
+            claves = _claves_cliente(json.load(file))
+        cliente = claves[0] if claves else ruta
+        historial = next((historial_de[clave] for clave in claves if clave in historial_de), None)
+        tareas.setdefault(cliente, ([], historial))[0].append(ruta)
+    return [(cliente, rutas, historial) for cliente, (rutas, historial) in tareas.items()]
+
+
+def preparar_proceso() -> None:
+    """
+    Inicializador del pool: carga preprocesador y modelo una vez por proceso, fuera de los
+    tiempos por etapa (así 'ml' mide solo la puntuación).
+    """
+    try:
+        from machineLearning.modelRegistry import registro_modelo
+        registro_modelo.obtener()
+    except Exception as e:
+        print(f"No se pudo precargar el modelo ML: {e}")
+
+
+def puntuar_cliente(cliente: str, entradas: List[str], historial: Optional[str]) -> Tuple[str, List[Dict[str, Any]], Dict[str, float], Dict[str, Any]]:
+    """
+    Se ejecuta en un proceso del pool: carga el historial del cliente una vez y puntúa
+    sus ficheros en orden, acumulando los segundos de cada etapa. Devuelve también las
+    métricas acumuladas en el proceso desde el cliente anterior, para sumarlas en el padre.
+    """
+    from ai import puntuar_transacciones_cliente
+    from historyStore import AlmacenHistorial, HistorialCliente
+    from metrics import metricas
+
+    inicio = time.perf_counter()
+    historial_cliente = AlmacenHistorial().cargar_fichero(historial) if historial else HistorialCliente(cliente, None, {})
+    tiempos = {'carga': time.perf_counter() - inicio}
+    resultados = []
+    for ruta in entradas:
+        inicio = time.perf_counter()
+        with open(ruta, 'r', encoding='utf-8') as file:
+            datos = json.load(file)
+        tiempos['carga'] += time.perf_counter() - inicio
+        iban = datos.get('user_profile', {}).get('iban_number') or historial_cliente.iban
+        resultados.extend(puntuar_transacciones_cliente(datos.get('transactions', []), historial_cliente, iban, tiempos))
+    return cliente, resultados, tiempos, metricas.instantanea(reiniciar=True)
+
+
+class EscritorResultados:
+    """
+    NDJSON (una línea por transacción) o CSV, escrito y volcado a disco por cliente.
+    """
+
+    def __init__(self, ruta: str, formato: str):
+        self.fichero = open(ruta, 'w', encoding='utf-8', newline='')
+        self.csv = None
+        if formato == 'csv':
+            self.csv = csv.DictWriter(self.fichero, fieldnames=CAMPOS_RESULTADO)
+            self.csv.writeheader()
+
+    def escribir(self, resultados: List[Dict[str, Any]]) -> None:
+        for resultado in resultados:
+            if self.csv is not None:
+                self.csv.writerow(resultado)
+            else:
+                self.fichero.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        self.fichero.flush()
+
+    def cerrar(self) -> None:
+        self.fichero.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Puntuación offline por lotes de muchos clientes")
+    parser.add_argument('entradas', nargs='+', help="Ficheros o globs con transacciones a puntuar (formato de json files/testing)")
+    parser.add_argument('--historiales', nargs='+', default=[os.path.join('json files', 'training', '*_total.json')],
+                        help="Ficheros o globs *_total.json con el historial de cada cliente")
+    parser.add_argument('--salida', required=True, help="Fichero de resultados (.ndjson o .csv)")
+    parser.add_argument('--formato', choices=['ndjson', 'csv'], help="Por defecto según la extensión de --salida")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1, help="Procesos del pool (clientes en paralelo)")
+    parser.add_argument('--metricas', help="Fichero donde escribir las métricas sumadas de todos los procesos")
+    argumentos = parser.parse_args(argv)
+
+    formato = argumentos.formato or ('csv' if argumentos.salida.lower().endswith('.csv') else 'ndjson')
+    tareas = planificar(expandir(argumentos.entradas), expandir(argumentos.historiales))
+    if not tareas:
+        print("Error: no hay ficheros que puntuar")
+        return 1
+
+    inicio = time.perf_counter()
+    escritor = EscritorResultados(argumentos.salida, formato)
+    tiempos_totales: Dict[str, float] = {}
+    total = 0
+    fallidos = 0
+    try:
+        # spawn: cada proceso arranca limpio (sin hilos ni sesiones HTTP heredadas del padre)
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max(1, min(argumentos.procesos, len(tareas))), mp_context=contexto,
+                                 initializer=preparar_proceso) as pool:
+            pendientes = {pool.submit(puntuar_cliente, *tarea): tarea[0] for tarea in tareas}
+            for futuro in as_completed(pendientes):
+                try:
+                    cliente, resultados, tiempos, instantanea = futuro.result()
+                except Exception as e:
+                    # Un cliente con datos rotos no tumba la pasada nocturna entera
+                    print(f"Error al puntuar {pendientes[futuro]}: {e}")
+                    fallidos += 1
+                    continue
+                escritor.escribir(resultados)
+                metricas.fusionar(instantanea)
+                total += len(resultados)
+                for etapa, segundos in tiempos.items():
+                    tiempos_totales[etapa] = tiempos_totales.get(etapa, 0.0) + segundos
+                print(f"{cliente}: {len(resultados)} transacciones")
+    finally:
+        escritor.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    print(f"{total} transacciones de {len(tareas)} clientes en {segundos:.2f} s -> {total / segundos:.1f} tx/s "
+          f"({argumentos.procesos} procesos, salida {formato} en {argumentos.salida})")
+    # Etapas: segundos sumados en todos los procesos y tx/s que daría cada etapa por sí sola
+    for etapa, segundos_etapa in sorted(tiempos_totales.items()):
+        ritmo = f"{total / segundos_etapa:.1f} tx/s" if segundos_etapa > 0 else "-"
+        print(f"  {etapa:7s} {segundos_etapa:8.2f} s  {ritmo}")
+    if argumentos.metricas:
+        metricas.escribir(argumentos.metricas)
+        print(f"Métricas en {argumentos.metricas}")
+    if fallidos:
+        print(f"{fallidos} clientes con error")
+    return 1 if fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
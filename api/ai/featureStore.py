@@ -0,0 +1,103 @@
+import math
+
+from collections import deque
+from datetime import date
+from typing import Any, Dict, Optional
+
+
+# Ventanas (días) para contar cobros repetidos de la misma empresa (patrón 6 del prompt)
+VENTANAS_DIAS = (7, 30)
+# A partir de cuántos días sin cobros un nuevo cargo se considera recobro de algo antiguo (patrón 5)
+DIAS_REACTIVACION = 90
+
+# Rasgos numéricos que se añaden a cada transacción para el modelo ML
+COLUMNAS_AGREGADOS = [
+    'agg_cobros_previos', 'agg_importe_anterior', 'agg_media_importe', 'agg_desviacion_importe',
+    'agg_incremento_vs_anterior', 'agg_zscore_importe', 'agg_dias_desde_anterior', 'agg_dias_desde_primero',
+] + [f'agg_repeticiones_{dias}d' for dias in VENTANAS_DIAS]
+
+
+def ordinal_fecha(fecha: Any) -> Optional[int]:
+    try:
+        return date.fromisoformat(str(fecha)[:10]).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+class AgregadosEmpresa:
+    """
+    Estadísticas acumuladas de los cobros de una empresa a un cliente, actualizadas en O(1)
+    (amortizado) por transacción: último importe, media y varianza (Welford), cobros en
+    ventanas deslizantes de VENTANAS_DIAS y primera/última fecha vistas.
+    """
+
+    __slots__ = ("cobros", "ultimo_importe", "media", "m2", "primera_fecha", "ultima_fecha", "ventanas")
+
+    def __init__(self):
+        self.cobros = 0
+        self.ultimo_importe = 0.0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.primera_fecha: Optional[int] = None
+        self.ultima_fecha: Optional[int] = None
+        self.ventanas = {dias: deque() for dias in VENTANAS_DIAS}
+
+    def _podar(self, hasta: int) -> None:
+        for dias, fechas in self.ventanas.items():
+            while fechas and fechas[0] <= hasta - dias:
+                fechas.popleft()
+
+    def actualizar(self, importe: float, fecha: Optional[int]) -> None:
+        self.cobros += 1
+        delta = importe - self.media
+        self.media += delta / self.cobros
+        self.m2 += delta * (importe - self.media)
+        self.ultimo_importe = importe
+
+        if fecha is not None:
+            self.primera_fecha = fecha if self.primera_fecha is None else min(self.primera_fecha, fecha)
+            self.ultima_fecha = fecha if self.ultima_fecha is None else max(self.ultima_fecha, fecha)
+            for fechas in self.ventanas.values():
+                fechas.append(fecha)
+            self._podar(self.ultima_fecha)
+
+    def desviacion(self) -> float:
+        return math.sqrt(self.m2 / (self.cobros - 1)) if self.cobros > 1 else 0.0
+
+    def rasgos(self, importe: float, fecha: Optional[int]) -> Dict[str, Any]:
+        """
+        Rasgos de una nueva transacción respecto a lo visto antes (no la incluye).
+        """
+        desviacion = self.desviacion()
+        dias_desde_anterior = fecha - self.ultima_fecha if fecha is not None and self.ultima_fecha is not None else -1
+        dias_desde_primero = fecha - self.primera_fecha if fecha is not None and self.primera_fecha is not None else -1
+        if fecha is not None:
+            self._podar(max(fecha, self.ultima_fecha or fecha))
+        return {
+            'agg_cobros_previos': self.cobros,
+            'agg_importe_anterior': self.ultimo_importe,
+            'agg_media_importe': round(self.media, 4),
+            'agg_desviacion_importe': round(desviacion, 4),
+            'agg_incremento_vs_anterior': round((importe - self.ultimo_importe) / self.ultimo_importe, 4) if self.ultimo_importe else 0.0,
+            'agg_zscore_importe': round((importe - self.media) / desviacion, 4) if desviacion > 0 else 0.0,
+            'agg_dias_desde_anterior': dias_desde_anterior,
+            'agg_dias_desde_primero': dias_desde_primero,
+            **{f'agg_repeticiones_{dias}d': len(fechas) for dias, fechas in self.ventanas.items()},
+        }
+
+
+RASGOS_VACIOS = AgregadosEmpresa().rasgos(0.0, None)
+
+
+def senales_para_llm(rasgos: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resumen estable de los rasgos para el prompt: lo que el LLM tendría que deducir del
+    historial (patrones 4, 5 y 6), calculado exactamente. Solo incluye valores que no cambian
+    mes a mes en un cargo recurrente normal, para no romper la caché de riesgos.
+    """
+    return {
+        'primera_vez_con_empresa': rasgos['agg_cobros_previos'] == 0,
+        'incremento_vs_cobro_anterior_pct': round(rasgos['agg_incremento_vs_anterior'] * 100),
+        **{f'cobros_empresa_ultimos_{dias}_dias': rasgos[f'agg_repeticiones_{dias}d'] for dias in VENTANAS_DIAS},
+        'recobro_tras_mas_de_90_dias': rasgos['agg_dias_desde_anterior'] > DIAS_REACTIVACION,
+    }
@@ -0,0 +1,267 @@
+import glob
+import json
+import os
+import threading
+
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .featureStore import AgregadosEmpresa, RASGOS_VACIOS, ordinal_fecha
+except ImportError:  # importado como módulo suelto desde ai/ai.py
+    from featureStore import AgregadosEmpresa, RASGOS_VACIOS, ordinal_fecha
+
+
+DIRECTORIO_REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Ficheros *_total.json con user_profile + transactions de cada cliente
+HISTORY_FILES = os.getenv("HISTORY_FILES", os.path.join(DIRECTORIO_REPO, "json files", "training", "*_total.json"))
+# Tamaño de la ventana de "últimas transacciones" que ve el LLM (preparar_historial_reciente)
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "10"))
+# Filas que guarda como mucho cada cliente en columnas: al pasarse se quedan solo las de la ventana
+# (lo anterior ya está resumido en los agregados por empresa)
+HISTORY_MAX_ROWS = int(os.getenv("HISTORY_MAX_ROWS", "1000"))
+# Clientes creados al puntuar (IBAN/customer_id sin fichero de historial) que se mantienen en
+# memoria; al pasarse se descarta el usado hace más tiempo. Los cargados de HISTORY_FILES se quedan
+HISTORY_MAX_CLIENTS = int(os.getenv("HISTORY_MAX_CLIENTS", "10000"))
+
+
+class HistorialCliente:
+    """
+    Historial de un cliente en columnas (una lista/array por campo) más una ventana con los
+    índices de sus últimas HISTORY_WINDOW transacciones por fecha, mantenida al añadir.
+    El orden de la ventana es el mismo que daría sorted(..., key=fecha, reverse=True).
+    Lleva además los agregados por empresa cobradora (featureStore), actualizados en cada alta.
+    Las columnas no pasan de max_filas filas: al llenarse se compactan a las de la ventana.
+    """
+
+    __slots__ = ("customer_id", "iban", "perfil", "fechas", "categorias", "empresas", "valores",
+                 "recurrentes", "primeras", "reembolsados", "ventana", "tamano_ventana", "agregados",
+                 "total", "max_filas")
+
+    def __init__(self, customer_id: Optional[str], iban: Optional[str], perfil: Dict[str, Any],
+                 tamano_ventana: int = HISTORY_WINDOW, max_filas: int = HISTORY_MAX_ROWS):
+        self.customer_id = customer_id
+        self.iban = iban
+        self.perfil = perfil
+        self.fechas: List[str] = []
+        self.categorias: List[str] = []
+        self.empresas: List[str] = []
+        self.valores = array('d')
+        self.recurrentes = bytearray()
+        self.primeras = bytearray()
+        self.reembolsados = bytearray()
+        self.ventana: List[int] = []
+        self.tamano_ventana = tamano_ventana
+        self.agregados: Dict[str, AgregadosEmpresa] = {}
+        self.total = 0
+        self.max_filas = max(max_filas, tamano_ventana)
+
+    def __len__(self) -> int:
+        # Transacciones vistas, aunque las columnas ya no las guarden todas
+        return self.total
+
+    def _anadir_columnas(self, transaccion: Dict[str, Any]) -> int:
+        self.fechas.append(transaccion.get('transaction_date', '') or '')
+        self.categorias.append(transaccion.get('product_category', 'N/A'))
+        self.empresas.append(transaccion.get('collector_company', 'N/A'))
+        self.valores.append(float(transaccion.get('transaction_value', 0) or 0))
+        self.recurrentes.append(bool(transaccion.get('is_recurring', False)))
+        self.primeras.append(bool(transaccion.get('is_first_purchase', False)))
+        self.reembolsados.append(bool(transaccion.get('has_been_refunded', False)))
+        self.total += 1
+        return len(self.fechas) - 1
+
+    def _compactar(self) -> None:
+        """
+        Deja en las columnas solo las filas de la ventana, conservando su orden.
+        """
+        filas = sorted(self.ventana)
+        nuevo_indice = {viejo: nuevo for nuevo, viejo in enumerate(filas)}
+        self.fechas = [self.fechas[i] for i in filas]
+        self.categorias = [self.categorias[i] for i in filas]
+        self.empresas = [self.empresas[i] for i in filas]
+        self.valores = array('d', (self.valores[i] for i in filas))
+        self.recurrentes = bytearray(self.recurrentes[i] for i in filas)
+        self.primeras = bytearray(self.primeras[i] for i in filas)
+        self.reembolsados = bytearray(self.reembolsados[i] for i in filas)
+        self.ventana = [nuevo_indice[i] for i in self.ventana]
+
+    def _actualizar_agregados(self, indice: int) -> None:
+        empresa = self.empresas[indice]
+        if empresa not in self.agregados:
+            self.agregados[empresa] = AgregadosEmpresa()
+        self.agregados[empresa].actualizar(self.valores[indice], ordinal_fecha(self.fechas[indice]))
+
+    def cargar(self, transacciones: List[Dict[str, Any]]) -> None:
+        for transaccion in transacciones:
+            self._anadir_columnas(transaccion)
+        # Una sola ordenación al cargar; a partir de aquí la ventana se mantiene incrementalmente
+        por_fecha = sorted(range(len(self.fechas)), key=lambda i: self.fechas[i], reverse=True)
+        self.ventana = por_fecha[:self.tamano_ventana]
+        # Los agregados se alimentan en orden cronológico para que las ventanas deslizantes cuadren
+        for indice in reversed(por_fecha):
+            self._actualizar_agregados(indice)
+        if len(self.fechas) > self.max_filas:
+            self._compactar()
+
+    def anadir(self, transaccion: Dict[str, Any]) -> None:
+        """
+        Añade una transacción sin reordenar el historial: O(tamaño de ventana), más una
+        compactación O(max_filas) cada max_filas - tamaño de ventana altas.
+        """
+        indice = self._anadir_columnas(transaccion)
+        self._actualizar_agregados(indice)
+        fecha = self.fechas[indice]
+        # Va detrás de las de fecha >= (a igualdad de fecha, la más reciente en llegar va después)
+        posicion = 0
+        while posicion < len(self.ventana) and self.fechas[self.ventana[posicion]] >= fecha:
+            posicion += 1
+        if posicion < self.tamano_ventana:
+            self.ventana.insert(posicion, indice)
+            del self.ventana[self.tamano_ventana:]
+        if len(self.fechas) > self.max_filas:
+            self._compactar()
+
+    def rasgos(self, transaccion: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Rasgos de comportamiento de la transacción frente a lo que este cliente ya pagó a la misma
+        empresa, sin recorrer el historial.
+        """
+        agregados = self.agregados.get(transaccion.get('collector_company', 'N/A'))
+        if agregados is None:
+            return dict(RASGOS_VACIOS)
+        return agregados.rasgos(float(transaccion.get('transaction_value', 0) or 0),
+                                ordinal_fecha(transaccion.get('transaction_date')))
+
+    def recientes(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'transaction_date': self.fechas[i],
+                'product_category': self.categorias[i],
+                'collector_company': self.empresas[i],
+                'transaction_value': self.valores[i],
+                'is_recurring': bool(self.recurrentes[i]),
+                'is_first_purchase': bool(self.primeras[i]),
+                'has_been_refunded': bool(self.reembolsados[i]),
+            }
+            for i in self.ventana
+        ]
+
+    def como_historial(self) -> Dict[str, Any]:
+        """
+        Vista con la forma de historial_completo que esperan preparar_contexto_cliente /
+        preparar_historial_reciente, pero solo con la ventana (y el total aparte).
+        """
+        return {
+            'customer_id': self.customer_id,
+            'user_profile': self.perfil,
+            'transactions': self.recientes(),
+            'total_transactions': len(self),
+        }
+
+
+class AlmacenHistorial:
+    """
+    Historiales de todos los clientes en memoria, indexados por IBAN y por customer_id.
+    Los clientes que aparecen al puntuar sin historial cargado se crean sobre la marcha y se
+    guardan en un LRU de como mucho max_clientes.
+    """
+
+    def __init__(self, tamano_ventana: int = HISTORY_WINDOW, max_clientes: int = HISTORY_MAX_CLIENTS):
+        self.tamano_ventana = tamano_ventana
+        self.max_clientes = max_clientes
+        self.por_iban: Dict[str, HistorialCliente] = {}
+        self.por_customer_id: Dict[str, HistorialCliente] = {}
+        self._nuevos: "OrderedDict[int, HistorialCliente]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _registrar(self, historial: HistorialCliente) -> None:
+        if historial.iban:
+            self.por_iban[historial.iban] = historial
+        if historial.customer_id:
+            self.por_customer_id[historial.customer_id] = historial
+
+    def _olvidar(self, historial: HistorialCliente) -> None:
+        if historial.iban and self.por_iban.get(historial.iban) is historial:
+            del self.por_iban[historial.iban]
+        if historial.customer_id and self.por_customer_id.get(historial.customer_id) is historial:
+            del self.por_customer_id[historial.customer_id]
+
+    def cargar_fichero(self, ruta: str) -> HistorialCliente:
+        with open(ruta, 'r', encoding='utf-8') as file:
+            datos = json.load(file)
+        perfil = datos.get('user_profile', {})
+        historial = HistorialCliente(datos.get('customer_id'), perfil.get('iban_number'), perfil, self.tamano_ventana)
+        historial.cargar(datos.get('transactions', []))
+        with self._lock:
+            self._registrar(historial)
+        return historial
+
+    def cargar_ficheros(self, patron: str = HISTORY_FILES) -> int:
+        rutas = sorted(glob.glob(patron))
+        for ruta in rutas:
+            try:
+                self.cargar_fichero(ruta)
+            except Exception as e:
+                print(f"No se pudo cargar el historial {ruta}: {e}")
+        return len(rutas)
+
+    def buscar(self, iban: Optional[str] = None, customer_id: Optional[str] = None) -> Optional[HistorialCliente]:
+        if customer_id and customer_id in self.por_customer_id:
+            return self.por_customer_id[customer_id]
+        if iban:
+            return self.por_iban.get(iban)
+        return None
+
+    def historial_de(self, iban: Optional[str] = None, customer_id: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            historial = self.buscar(iban, customer_id)
+            if historial is None:
+                return {'transactions': [], 'user_profile': {}}
+            return historial.como_historial()
+
+    def _buscar_o_crear(self, iban: Optional[str], customer_id: Optional[str]) -> HistorialCliente:
+        historial = self.buscar(iban, customer_id)
+        if historial is None:
+            historial = HistorialCliente(customer_id, iban, {}, self.tamano_ventana)
+            if not (iban or customer_id):
+                return historial  # sin identidad no hay a quién asociarlo: no se guarda
+            self._registrar(historial)
+            self._nuevos[id(historial)] = historial
+            while len(self._nuevos) > self.max_clientes:
+                self._olvidar(self._nuevos.popitem(last=False)[1])
+        elif id(historial) in self._nuevos:
+            self._nuevos.move_to_end(id(historial))
+        return historial
+
+    def rasgos_y_anadir(self, transacciones: List[Tuple[Dict[str, Any], Optional[str], Optional[str]]]) -> List[Dict[str, Any]]:
+        """
+        Rasgos de cada (transacción, iban, customer_id) frente al historial de su cliente, que
+        después la incorpora (como ai.py offline): la siguiente del mismo lote o de otra subida
+        ya la cuenta. Los IBAN sin historial cargado empiezan uno vacío.
+        """
+        resultado = []
+        with self._lock:
+            for transaccion, iban, customer_id in transacciones:
+                historial = self._buscar_o_crear(iban, customer_id)
+                resultado.append(historial.rasgos(transaccion))
+                historial.anadir(transaccion)
+        return resultado
+
+
+_almacen: Optional[AlmacenHistorial] = None
+_lock_carga = threading.Lock()
+
+def obtener_almacen_historial() -> AlmacenHistorial:
+    """
+    Almacén del proceso, cargado desde HISTORY_FILES la primera vez que se pide.
+    """
+    global _almacen
+    if _almacen is None:
+        with _lock_carga:
+            if _almacen is None:
+                almacen = AlmacenHistorial()
+                almacen.cargar_ficheros()
+                _almacen = almacen
+    return _almacen
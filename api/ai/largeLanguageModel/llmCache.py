@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from typing import Any, Dict, Optional
+
+
+DIRECTORIO_API = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Por defecto junto a la BD de la API (DB_PATH en Docker, zombis.db en local)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") or os.path.join(
+    os.path.dirname(os.getenv("DB_PATH") or os.path.join(DIRECTORIO_API, "zombis.db")), "llm_cache.db"
+)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Campos de la transacción que forman la huella. Fecha e iban_anonymized (único por movimiento)
+# se excluyen: el cargo de Netflix de cada mes tiene que caer en la misma entrada.
+# senales_historial (featureStore.senales_para_llm) forma parte del prompt, así que también de la huella
+CAMPOS_HUELLA = ['transaction_value', 'is_recurring', 'is_first_purchase', 'product_category',
+                 'collector_company', 'has_been_refunded', 'senales_historial']
+# Partes del contexto del cliente (preparar_contexto_cliente) que cambian con cada transacción que
+# entra en el historial: con ellas en la huella, el cargo de cada mes nunca acertaría. Lo que el
+# historial aporta al riesgo de la transacción ya viaja en senales_historial
+CAMPOS_CONTEXTO_VOLATILES = ('total_transacciones', 'historial_reciente')
+
+
+def _normalizar(valor: Any) -> Any:
+    if isinstance(valor, bool) or valor is None:
+        return valor
+    if isinstance(valor, dict):
+        return {clave: _normalizar(v) for clave, v in valor.items()}
+    if isinstance(valor, (int, float)):
+        return round(float(valor), 2)
+    return str(valor).strip().casefold()
+
+
+def huella_transaccion(transaccion: Dict[str, Any]) -> str:
+    canonica = {campo: _normalizar(transaccion.get(campo)) for campo in CAMPOS_HUELLA}
+    return hashlib.sha256(json.dumps(canonica, sort_keys=True).encode()).hexdigest()
+
+
+def huella_contexto(contexto_cliente: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(contexto_cliente, sort_keys=True, default=str, ensure_ascii=False).encode()).hexdigest()
+
+
+def huella_contexto_estable(contexto_cliente: Dict[str, Any]) -> str:
+    """
+    Huella del contexto sin CAMPOS_CONTEXTO_VOLATILES, para la caché de riesgos. La de prefijos
+    (contexto de Ollama) sí necesita huella_contexto: es el texto exacto del prompt.
+    """
+    return huella_contexto({campo: valor for campo, valor in contexto_cliente.items() if campo not in CAMPOS_CONTEXTO_VOLATILES})
+
+
+class CacheRiesgoLLM:
+    """
+    Caché persistente (SQLite) de riesgos devueltos por el LLM, con caducidad por TTL
+    y expulsión LRU cuando se supera el máximo de entradas.
+    """
+
+    def __init__(self, ruta: str = LLM_CACHE_PATH, max_entradas: int = LLM_CACHE_MAX_ENTRIES, ttl_segundos: float = LLM_CACHE_TTL_SECONDS):
+        self.ruta = ruta
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.aciertos = 0
+        self.fallos = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._escrituras_desde_poda = 0
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo (y por proceso, por si hay fork)
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None or getattr(self._local, "pid", None) != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS riesgo_llm ("
+                " clave TEXT PRIMARY KEY, riesgo REAL NOT NULL, creado REAL NOT NULL, usado REAL NOT NULL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS ix_riesgo_llm_usado ON riesgo_llm (usado)")
+            self._local.conexion, self._local.pid = conexion, os.getpid()
+        return conexion
+
+    def obtener(self, clave: str) -> Optional[float]:
+        ahora = time.time()
+        conexion = self._conexion()
+        fila = conexion.execute(
+            "SELECT riesgo FROM riesgo_llm WHERE clave = ? AND creado >= ?", (clave, ahora - self.ttl_segundos)
+        ).fetchone()
+        with self._lock:
+            if fila is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+        conexion.execute("UPDATE riesgo_llm SET usado = ? WHERE clave = ?", (ahora, clave))
+        return fila[0]
+
+    def guardar(self, clave: str, riesgo: float) -> None:
+        ahora = time.time()
+        conexion = self._conexion()
+        conexion.execute(
+            "INSERT OR REPLACE INTO riesgo_llm (clave, riesgo, creado, usado) VALUES (?, ?, ?, ?)",
+            (clave, riesgo, ahora, ahora)
+        )
+        with self._lock:
+            self._escrituras_desde_poda += 1
+            # Podar cada ~1% del máximo de escrituras evita un COUNT(*) por inserción
+            if self._escrituras_desde_poda < max(self.max_entradas // 100, 1):
+                return
+            self._escrituras_desde_poda = 0
+        self.podar()
+
+    def podar(self) -> None:
+        conexion = self._conexion()
+        conexion.execute("DELETE FROM riesgo_llm WHERE creado < ?", (time.time() - self.ttl_segundos,))
+        sobrantes = conexion.execute("SELECT COUNT(*) FROM riesgo_llm").fetchone()[0] - self.max_entradas
+        if sobrantes > 0:
+            conexion.execute(
+                "DELETE FROM riesgo_llm WHERE clave IN (SELECT clave FROM riesgo_llm ORDER BY usado LIMIT ?)", (sobrantes,)
+            )
+
+    def estadisticas(self) -> Dict[str, Any]:
+        total = self.aciertos + self.fallos
+        return {
+            "activa": LLM_CACHE_ENABLED,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            "ruta": self.ruta,
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl_segundos,
+        }
+
+
+cache_riesgo_llm = CacheRiesgoLLM()
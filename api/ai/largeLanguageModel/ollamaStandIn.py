@@ -0,0 +1,255 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# Lo que contesta una respuesta "malformada": texto sin ningún número que extraer_riesgo pueda leer
+RESPUESTA_MALFORMADA = "Lo siento, no puedo evaluar el riesgo de esta transacción."
+
+
+def _tokens(texto: str) -> List[int]:
+    # "Tokenizador" de juguete: una palabra = un token, estable entre llamadas
+    return [zlib.crc32(palabra.encode()) for palabra in texto.split()]
+
+
+def _riesgo_de(texto: str) -> float:
+    # Determinista según la transacción, para que prompt completo y prefijo reutilizado coincidan
+    return (zlib.crc32(texto.strip().encode()) % 100) / 100
+
+
+def distribucion_latencia(especificacion: str) -> Callable[[random.Random], float]:
+    """
+    Segundos de espera antes de cada respuesta según 'especificacion':
+      fija:0.2 | uniforme:0.05,0.5 | lognormal:0.3,0.5 (mediana, sigma) | exponencial:0.3 (media)
+    """
+    tipo, _, parametros = (especificacion or "fija:0").partition(":")
+    valores = [float(valor) for valor in parametros.split(",") if valor.strip()]
+    try:
+        if tipo == "fija":
+            return lambda aleatorio: valores[0] if valores else 0.0
+        if tipo == "uniforme":
+            return lambda aleatorio: aleatorio.uniform(valores[0], valores[1])
+        if tipo == "lognormal":
+            mediana, sigma = valores
+            return lambda aleatorio: mediana * aleatorio.lognormvariate(0.0, sigma)
+        if tipo == "exponencial":
+            return lambda aleatorio: aleatorio.expovariate(1.0 / valores[0])
+    except (IndexError, ValueError):
+        pass
+    raise ValueError(f"Latencia no válida: '{especificacion}' (p.ej. fija:0.2, uniforme:0.05,0.5, lognormal:0.3,0.5, exponencial:0.3)")
+
+
+class ServidorOllamaLocal:
+    """
+    Sustituto local de POST /api/generate de Ollama para ejecutar sin GPU ni modelo:
+    responde un riesgo determinista por transacción (o el JSON del prompt por lotes),
+    devuelve 'context' como hace Ollama y cuenta peticiones y tokens de prompt evaluados
+    (los que ya venían en 'context' no cuentan, igual que con la caché KV real).
+    Para pruebas de carga puede además esperar según una distribución de latencia, fallar con
+    HTTP 500 una fracción de las peticiones (tasa_errores) y contestar texto sin número en otra
+    (tasa_malformadas). GET /stats devuelve los contadores.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latencia: str = "fija:0",
+                 tasa_errores: float = 0.0, tasa_malformadas: float = 0.0, semilla: Optional[int] = None):
+        self.peticiones = 0
+        self.peticiones_con_context = 0
+        self.tokens_prompt_evaluados = 0
+        self.errores_simulados = 0
+        self.respuestas_malformadas = 0
+        self.segundos_espera = 0.0
+        self.latencia = distribucion_latencia(latencia)
+        self.tasa_errores = tasa_errores
+        self.tasa_malformadas = tasa_malformadas
+        self._aleatorio = random.Random(semilla)
+        self._lock = threading.Lock()
+        servidor_local = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _responder(self, estado: int, respuesta: Dict[str, Any]) -> None:
+                datos = json.dumps(respuesta).encode()
+                self.send_response(estado)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_POST(self):
+                longitud = int(self.headers.get("Content-Length", 0))
+                cuerpo = json.loads(self.rfile.read(longitud) or b"{}")
+                espera, fallar, malformar = servidor_local.sortear()
+                time.sleep(espera)
+                if fallar:
+                    self._responder(500, {"error": "fallo simulado por el sustituto de Ollama"})
+                    return
+                respuesta = servidor_local.generar(cuerpo)
+                if malformar:
+                    respuesta["response"] = RESPUESTA_MALFORMADA
+                self._responder(200, respuesta)
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._responder(200, servidor_local.estadisticas())
+                else:
+                    self._responder(404, {"error": "no encontrado"})
+
+        self._servidor = ThreadingHTTPServer((host, port), Manejador)
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._servidor.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def sortear(self):
+        """
+        (segundos de espera, si falla con 500, si contesta sin número) para una petición.
+        """
+        with self._lock:
+            espera = max(0.0, self.latencia(self._aleatorio))
+            fallar = self._aleatorio.random() < self.tasa_errores
+            malformar = not fallar and self._aleatorio.random() < self.tasa_malformadas
+            self.segundos_espera += espera
+            self.errores_simulados += fallar
+            self.respuestas_malformadas += malformar
+        return espera, fallar, malformar
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "peticiones": self.peticiones,
+                "peticiones_con_context": self.peticiones_con_context,
+                "tokens_prompt_evaluados": self.tokens_prompt_evaluados,
+                "errores_simulados": self.errores_simulados,
+                "respuestas_malformadas": self.respuestas_malformadas,
+                "segundos_espera": round(self.segundos_espera, 3),
+            }
+
+    def generar(self, cuerpo: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = cuerpo.get("prompt", "")
+        contexto = cuerpo.get("context") or []
+        tokens_prompt = _tokens(prompt)
+
+        if cuerpo.get("format") == "json":
+            riesgos = [{"id": int(identificador), "riesgo": _riesgo_de(transaccion)}
+                       for identificador, transaccion in re.findall(r"^id (\d+): (.*)$", prompt, re.M)]
+            texto = json.dumps({"riesgos": riesgos})
+        elif "TRANSACCIÓN ACTUAL A EVALUAR" in prompt:
+            transaccion = prompt.split("TRANSACCIÓN ACTUAL A EVALUAR:**", 1)[1].split("**PATRONES", 1)[0]
+            texto = f"{_riesgo_de(transaccion):.2f}"
+        else:
+            texto = "OK"
+
+        with self._lock:
+            self.peticiones += 1
+            self.peticiones_con_context += 1 if contexto else 0
+            self.tokens_prompt_evaluados += len(tokens_prompt)
+
+        return {
+            "model": cuerpo.get("model"),
+            "response": texto,
+            "done": True,
+            "context": list(contexto) + tokens_prompt + _tokens(texto),
+            "prompt_eval_count": len(tokens_prompt),
+        }
+
+    def iniciar(self) -> "ServidorOllamaLocal":
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="ollama-stand-in", daemon=True)
+        self._hilo.start()
+        return self
+
+    def parar(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def comprobar_reutilizacion_prefijo() -> bool:
+    """
+    Puntúa las mismas transacciones con y sin reutilización del prefijo contra el sustituto
+    local y comprueba que: los riesgos coinciden, el prefijo se evalúa una vez por cliente,
+    se procesan menos tokens y un cambio en el historial obliga a evaluar un prefijo nuevo.
+    """
+    from . import queryLargeLanguageModel as llm
+
+    servidor = ServidorOllamaLocal().iniciar()
+    llm.OLLAMA_URL = servidor.url
+    llm.LLM_CACHE_ENABLED = False
+    historial = {
+        "user_profile": {"age": 35, "salary_usd": 35000.5, "is_urban": True},
+        "transactions": [
+            {"product_category": "Monthly Subscription", "collector_company": "Netflix", "transaction_value": 12.99,
+             "transaction_date": f"2025-{mes:02d}-17", "is_recurring": True, "has_been_refunded": False}
+            for mes in range(1, 10)
+        ],
+    }
+    transacciones = [{"product_category": "Monthly Subscription", "collector_company": f"Servicio {i}",
+                      "transaction_value": 5.0 + i, "transaction_date": "2025-10-17"} for i in range(6)]
+
+    try:
+        llm.LLM_PREFIX_REUSE = False
+        completos = [llm.evaluar_riesgo_llm(transaccion, historial) for transaccion in transacciones]
+        tokens_completos = servidor.tokens_prompt_evaluados
+
+        llm.LLM_PREFIX_REUSE = True
+        servidor.tokens_prompt_evaluados = 0
+        reutilizados = llm.queryLargeLanguageModelBatch(transacciones, [historial] * len(transacciones))
+        tokens_reutilizados = servidor.tokens_prompt_evaluados
+        evaluaciones_antes = llm.cache_prefijos.evaluaciones
+
+        historial["transactions"].append(dict(historial["transactions"][-1], transaction_date="2025-10-17"))
+        llm.evaluar_riesgo_llm(transacciones[0], historial)
+        evaluaciones_despues = llm.cache_prefijos.evaluaciones
+    finally:
+        servidor.parar()
+
+    comprobaciones = {
+        "mismos riesgos con y sin prefijo": completos == reutilizados,
+        "un prefijo por cliente": evaluaciones_antes == 1,
+        "menos tokens de prompt evaluados": tokens_reutilizados < tokens_completos,
+        "historial cambiado -> prefijo nuevo": evaluaciones_despues == 2,
+    }
+    for descripcion, correcta in comprobaciones.items():
+        print(f"{'OK ' if correcta else 'FALLO'} {descripcion}")
+    print(f"tokens de prompt: {tokens_completos} sin reutilizar, {tokens_reutilizados} reutilizando el prefijo")
+    return all(comprobaciones.values())
+
+
+if __name__ == "__main__":
+    # python -m ai.largeLanguageModel.ollamaStandIn --port 11434     -> sirve /api/generate en local
+    # python -m ai.largeLanguageModel.ollamaStandIn --port 11434 --latencia lognormal:0.4,0.6 --errores 0.02 --malformadas 0.05
+    # python -m ai.largeLanguageModel.ollamaStandIn --check-prefix   -> comprobación offline del prefijo (sale con 1 si falla;
+    #                                                                   la misma comprobación corre en tests/test_prefix_reuse.py)
+    parser = argparse.ArgumentParser(description="Sustituto local de la API /api/generate de Ollama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latencia", default="fija:0", help="fija:S | uniforme:MIN,MAX | lognormal:MEDIANA,SIGMA | exponencial:MEDIA (segundos)")
+    parser.add_argument("--errores", type=float, default=0.0, help="Fracción de peticiones que fallan con HTTP 500")
+    parser.add_argument("--malformadas", type=float, default=0.0, help="Fracción de respuestas sin número legible")
+    parser.add_argument("--semilla", type=int)
+    parser.add_argument("--check-prefix", action="store_true")
+    argumentos = parser.parse_args()
+
+    if argumentos.check_prefix:
+        sys.exit(0 if comprobar_reutilizacion_prefijo() else 1)
+
+    try:
+        servidor = ServidorOllamaLocal(argumentos.host, argumentos.port, argumentos.latencia,
+                                       argumentos.errores, argumentos.malformadas, argumentos.semilla)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Sirviendo en {servidor.url}")
+    servidor._servidor.serve_forever()
@@ -2,13 +2,40 @@ import requests
 import json
 import re
 import os
+import threading
+import time
 
-from typing import Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, Optional, Tuple
+
+from .llmCache import LLM_CACHE_ENABLED, cache_riesgo_llm, huella_contexto, huella_contexto_estable, huella_transaccion
+
+try:
+    from ..metrics import ACIERTOS_CACHE, FALLOS_CACHE, PETICIONES_LLM
+except ImportError:  # importado como paquete suelto desde ai/ai.py
+    from metrics import ACIERTOS_CACHE, FALLOS_CACHE, PETICIONES_LLM
 
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434/api/generate")
+MODELO_LLM = "cas/salamandra-7b-instruct:latest"
+# Peticiones simultáneas a Ollama por cada lote que se puntúa
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Presupuesto por transacción: timeout de cada petición, nº de intentos y plazo total
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "15"))
+LLM_MAX_INTENTOS = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+# Plazo para todo un lote (una subida o un trabajo, aunque se puntúe por trozos); lo que no llegue
+# a tiempo se queda en solo-ML
+LLM_BATCH_DEADLINE_SECONDS = float(os.getenv("LLM_BATCH_DEADLINE_SECONDS", "120"))
+# Transacciones del mismo cliente por prompt (1 = un prompt por transacción, como siempre)
+LLM_PROMPT_BATCH_SIZE = int(os.getenv("LLM_PROMPT_BATCH_SIZE", "1"))
+# Reutilizar el 'context' de Ollama del prefijo (perfil + historial) de cada cliente
+LLM_PREFIX_REUSE = os.getenv("LLM_PREFIX_REUSE", "0") == "1"
+LLM_PREFIX_CACHE_SIZE = int(os.getenv("LLM_PREFIX_CACHE_SIZE", "256"))
 
-PLANTILLA_PROMPT_RIESGO = """
+BLOQUE_CONTEXTO_CLIENTE = """
 Eres un sistema especializado en detección de fraudes y evaluación de riesgos financieros.
 
 **CONTEXTO DEL CLIENTE:**
@@ -18,10 +45,9 @@ Eres un sistema especializado en detección de fraudes y evaluación de riesgos
 **HISTORIAL RECIENTE DEL CLIENTE (últimas transacciones):**
 {historial_reciente}
 
-**TRANSACCIÓN ACTUAL A EVALUAR:**
-{transaccion_actual}
+"""
 
-**PATRONES DE RIESGO A CONSIDERAR:**
+BLOQUE_PATRONES_RIESGO = """**PATRONES DE RIESGO A CONSIDERAR:**
 1. Compras en categorías de alto riesgo (gambling, criptomonedas...)
 2. Primeras compras en comercios desconocidos: Empresas con Estructuras Opacas, Sectores con Alto Flujo de Efectivo, Empresas con Actividad Internacional Inusual, Negocios con Patrones de Transacción Sospechosos, Empresas "Fantasmas" o con Poca Trazabilidad, Sectores con Historial de Blanqueo de Capitales, Empresas Vinculadas a Personas Expuestas Políticamente (PEP)
 3. Patrones inconsistentes con el comportamiento histórico del cliente
@@ -29,7 +55,14 @@ Eres un sistema especializado en detección de fraudes y evaluación de riesgos
 5. Recobros de antiguas suscripciones o servicios que ha pagado el cliente
 6. Movimientos repetidos en cortos periodos de tiempo del mismo producto o servicio a partir de 5 repeticiones
 
-**INSTRUCCIÓN:**
+Si una transacción trae "senales_historial", son datos exactos calculados sobre TODO el historial del cliente con esa empresa (no solo el reciente): úsalos para los patrones 4, 5 y 6.
+
+"""
+
+PLANTILLA_SUFIJO_TRANSACCION = """**TRANSACCIÓN ACTUAL A EVALUAR:**
+{transaccion_actual}
+
+""" + BLOQUE_PATRONES_RIESGO + """**INSTRUCCIÓN:**
 Analiza la transacción actual en contexto del historial del cliente y devuelve SOLO un número entre 0.00 y 1.00 (puede tener 2 decimales) donde:
 - 0.00 = Riesgo mínimo (transacción normal, consistente con el historial)
 - 1.00 = Riesgo máximo (múltiples señales de fraude)
@@ -38,6 +71,46 @@ Entonces tienes que decidir según tu conocimiento y el contexto dado, ¿cuál e
 NO DEVUELVAS NADA MÁS. SOLO EL NÚMERO DEL 0.00 AL 1.00. SOLO EL NÚMERO DEL 0.00 AL 1.00. SOLO EL NÚMERO DEL 0.00 AL 1.00.
 """
 
+PLANTILLA_PROMPT_RIESGO = BLOQUE_CONTEXTO_CLIENTE + PLANTILLA_SUFIJO_TRANSACCION
+
+# Variante para puntuar varias transacciones del mismo cliente en una sola generación
+PLANTILLA_SUFIJO_LOTE = """**TRANSACCIONES A EVALUAR (cada una con su id):**
+{transacciones_actuales}
+
+""" + BLOQUE_PATRONES_RIESGO + """**INSTRUCCIÓN:**
+Analiza CADA transacción por separado en contexto del historial del cliente y asígnale un número entre 0.00 y 1.00 (puede tener 2 decimales) donde:
+- 0.00 = Riesgo mínimo (transacción normal, consistente con el historial)
+- 1.00 = Riesgo máximo (múltiples señales de fraude)
+
+Devuelve SOLO un JSON con esta forma exacta, una entrada por id y nada más:
+{{"riesgos": [{{"id": 1, "riesgo": 0.12}}, {{"id": 2, "riesgo": 0.85}}]}}
+"""
+
+PLANTILLA_PROMPT_RIESGO_LOTE = BLOQUE_CONTEXTO_CLIENTE + PLANTILLA_SUFIJO_LOTE
+
+# Primer turno cuando se reutiliza el prefijo: solo el contexto del cliente, que Ollama
+# evalúa una vez y devuelve como 'context' para encadenar cada transacción detrás
+PLANTILLA_PREFIJO_CLIENTE = BLOQUE_CONTEXTO_CLIENTE + """A continuación recibirás transacciones de este cliente para evaluar. Por ahora responde únicamente: OK
+"""
+
+
+_sesion = None
+_pid_sesion = None
+
+def obtener_sesion() -> requests.Session:
+    """
+    Sesión keep-alive compartida con un pool de tantas conexiones como peticiones en vuelo.
+    Se recrea si el proceso cambia (fork) para no compartir sockets entre procesos.
+    """
+    global _sesion, _pid_sesion
+    if _sesion is None or _pid_sesion != os.getpid():
+        sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max(LLM_MAX_CONCURRENCY, 1))
+        sesion.mount("http://", adaptador)
+        sesion.mount("https://", adaptador)
+        _sesion, _pid_sesion = sesion, os.getpid()
+    return _sesion
+
 
 def preparar_historial_reciente(historial_completo: Dict[str, Any], limite: int = 10) -> str:
     transacciones = historial_completo.get('transactions', [])
@@ -60,52 +133,362 @@ def preparar_historial_reciente(historial_completo: Dict[str, Any], limite: int
     
     return "\n".join(resumen) if resumen else "No hay historial reciente"
 
-def queryLargeLanguageModel(transaccion_actual: Dict[str, Any], historial_completo: Dict[str, Any]) -> float:
+def preparar_contexto_cliente(historial_completo: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parte del prompt que depende solo del cliente (perfil + historial reciente).
+    """
     perfil = historial_completo.get('user_profile', {})
-    edad = perfil.get('age', 'N/A')
-    salario = perfil.get('salary_usd', 'N/A')
-    zona = "urbana" if perfil.get('is_urban', False) else "rural"
-    total_transacciones = len(historial_completo.get('transactions', []))
+    return {
+        'edad': perfil.get('age', 'N/A'),
+        'salario': perfil.get('salary_usd', 'N/A'),
+        'zona': "urbana" if perfil.get('is_urban', False) else "rural",
+        # Las vistas del almacén de historial solo traen la ventana reciente y el total aparte
+        'total_transacciones': historial_completo.get('total_transactions', len(historial_completo.get('transactions', []))),
+        'historial_reciente': preparar_historial_reciente(historial_completo),
+    }
+
+def extraer_riesgo(respuesta_texto: str) -> Optional[float]:
+    """
+    Primer decimal entre 0 y 1 de la respuesta del modelo ("0.75", ".4", "0,45", "1.00"). Un 0 o 1
+    sin decimales solo vale si es el último número (o toda la respuesta): en "Según el patrón 1,
+    el riesgo es 0.80" el 1 es el número de patrón del prompt. None si no hay.
+    """
+    for match in re.finditer(r"(?<![\d.,])[01]?[.,]\d+(?!\d)", respuesta_texto):
+        numero_encontrado = match.group(0).replace(',', '.')
+        if numero_encontrado.startswith('.'):
+            numero_encontrado = '0' + numero_encontrado
+        riesgo = float(numero_encontrado)
+        if 0.0 <= riesgo <= 1.0:
+            return riesgo
+    numeros = re.findall(r"\d+(?:[.,]\d+)?", respuesta_texto)
+    if numeros and numeros[-1] in ("0", "1"):
+        return float(numeros[-1])
+    return None
+
+def extraer_riesgos_lote(respuesta_texto: str, num_transacciones: int) -> List[Optional[float]]:
+    """
+    Interpreta la respuesta JSON de un prompt por lote. Acepta {"riesgos": [...]} o la lista
+    directamente, con entradas {"id", "riesgo"} o números sueltos en orden, aunque venga
+    rodeada de texto. Las posiciones que no se puedan leer quedan a None.
+    """
+    riesgos: List[Optional[float]] = [None] * num_transacciones
+
+    datos = None
+    for candidato in (respuesta_texto, respuesta_texto[respuesta_texto.find('{'):respuesta_texto.rfind('}') + 1],
+                      respuesta_texto[respuesta_texto.find('['):respuesta_texto.rfind(']') + 1]):
+        try:
+            datos = json.loads(candidato)
+            break
+        except (ValueError, TypeError):
+            continue
+    if isinstance(datos, dict):
+        datos = datos.get('riesgos', datos.get('risks'))
+    if not isinstance(datos, list):
+        return riesgos
+
+    for posicion, entrada in enumerate(datos):
+        if isinstance(entrada, dict):
+            identificador, valor = entrada.get('id', posicion + 1), entrada.get('riesgo', entrada.get('risk'))
+        else:
+            identificador, valor = posicion + 1, entrada
+        try:
+            indice = int(identificador) - 1
+            riesgo = extraer_riesgo(str(valor)) if not isinstance(valor, (int, float)) else float(valor)
+        except (ValueError, TypeError):
+            continue
+        if 0 <= indice < num_transacciones and riesgo is not None and 0.0 <= riesgo <= 1.0:
+            riesgos[indice] = riesgo
+    return riesgos
+
+def _consultar_ollama(payload: Dict[str, Any], limite: float, interpretar):
+    """
+    Envía el payload hasta que interpretar(texto) devuelva algo distinto de None, con como mucho
+    LLM_MAX_INTENTOS peticiones (errores HTTP, timeouts o respuestas inválidas) y sin pasar de 'limite'.
+    """
+    for intento in range(LLM_MAX_INTENTOS):
+        restante = limite - time.monotonic()
+        if restante <= 0:
+            break
+        inicio = time.perf_counter()
+        try:
+            response = obtener_sesion().post(OLLAMA_URL, json=payload, timeout=min(LLM_TIMEOUT_SECONDS, restante))
+            response.raise_for_status()
+            respuesta_texto = response.json()['response'].strip()
+        except Exception:
+            respuesta_texto = None
 
-    historial_reciente = preparar_historial_reciente(historial_completo)
+        resultado = interpretar(respuesta_texto or "")
+        PETICIONES_LLM.observar(time.perf_counter() - inicio, resultado="error" if respuesta_texto is None
+                                else "ok" if resultado is not None else "ilegible")
+        if resultado is not None:
+            return resultado
 
+        # pequeña espera creciente antes de reintentar, sin pasarse del límite (tras el último, ninguna)
+        if intento < LLM_MAX_INTENTOS - 1:
+            time.sleep(min(0.1 * (2 ** intento), max(limite - time.monotonic(), 0)))
+
+    return None
+
+def _evaluar_prefijo(contexto_cliente: Dict[str, Any], limite: float) -> Optional[List[int]]:
+    restante = limite - time.monotonic()
+    if restante <= 0:
+        return None
+    payload = {
+        "model": MODELO_LLM,
+        "prompt": PLANTILLA_PREFIJO_CLIENTE.format(**contexto_cliente),
+        "stream": False,
+        "options": {
+            "temperature": 0/0.2,
+            "num_predict": 2
+        }
+    }
+    inicio = time.perf_counter()
+    try:
+        response = obtener_sesion().post(OLLAMA_URL, json=payload, timeout=min(LLM_TIMEOUT_SECONDS, restante))
+        response.raise_for_status()
+        contexto_ollama = response.json().get('context')
+    except Exception:
+        PETICIONES_LLM.observar(time.perf_counter() - inicio, resultado="error")
+        return None
+    PETICIONES_LLM.observar(time.perf_counter() - inicio, resultado="prefijo")
+    return contexto_ollama if isinstance(contexto_ollama, list) and contexto_ollama else None
+
+class CachePrefijos:
+    """
+    'context' de Ollama tras evaluar el prefijo de cada cliente, para que cada transacción
+    solo envíe (y el modelo solo procese) su parte. La clave es la huella del contexto del
+    cliente, así que si su historial cambia la entrada vieja deja de usarse y se evalúa otra;
+    las antiguas salen por LRU. Cada prefijo se evalúa una sola vez aunque haya hilos en paralelo.
+    """
+
+    def __init__(self, max_entradas: int = LLM_PREFIX_CACHE_SIZE):
+        self.max_entradas = max_entradas
+        self.evaluaciones = 0
+        self.reutilizaciones = 0
+        self._entradas: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._locks_huella: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _buscar(self, huella: str) -> Optional[List[int]]:
+        contexto_ollama = self._entradas.get(huella)
+        if contexto_ollama is not None:
+            self._entradas.move_to_end(huella)
+            self.reutilizaciones += 1
+        return contexto_ollama
+
+    def obtener(self, contexto_cliente: Dict[str, Any], limite: float) -> Optional[List[int]]:
+        huella = f"{MODELO_LLM}:{huella_contexto(contexto_cliente)}"
+        with self._lock:
+            contexto_ollama = self._buscar(huella)
+            if contexto_ollama is not None:
+                ACIERTOS_CACHE.inc(cache="prefijo")
+                return contexto_ollama
+            lock_huella = self._locks_huella.setdefault(huella, threading.Lock())
+
+        with lock_huella:
+            with self._lock:
+                contexto_ollama = self._buscar(huella)  # otro hilo pudo evaluarlo mientras esperábamos
+            if contexto_ollama is not None:
+                ACIERTOS_CACHE.inc(cache="prefijo")
+                return contexto_ollama
+            FALLOS_CACHE.inc(cache="prefijo")
+
+            contexto_ollama = _evaluar_prefijo(contexto_cliente, limite)
+            with self._lock:
+                self._locks_huella.pop(huella, None)
+                if contexto_ollama is not None:
+                    self.evaluaciones += 1
+                    self._entradas[huella] = contexto_ollama
+                    while len(self._entradas) > self.max_entradas:
+                        self._entradas.popitem(last=False)
+            return contexto_ollama
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_prefijos = CachePrefijos()
+
+def _aplicar_prefijo(payload: Dict[str, Any], contexto_cliente: Dict[str, Any], sufijo: str, limite: float) -> None:
+    """
+    Si está activa la reutilización y el prefijo del cliente está (o se puede poner) en caché,
+    el payload pasa a llevar solo el sufijo más el 'context' del prefijo. Si no, se deja el prompt completo.
+    """
+    if not LLM_PREFIX_REUSE:
+        return
+    contexto_ollama = cache_prefijos.obtener(contexto_cliente, limite)
+    if contexto_ollama is not None:
+        payload["prompt"] = sufijo
+        payload["context"] = contexto_ollama
+
+def _clave_cache(transaccion: Dict[str, Any], contexto_cliente: Dict[str, Any]) -> str:
+    return f"{MODELO_LLM}:{huella_transaccion(transaccion)}:{huella_contexto_estable(contexto_cliente)}"
+
+def _leer_cache(clave: str) -> Optional[float]:
+    try:
+        riesgo = cache_riesgo_llm.obtener(clave)
+    except Exception:
+        riesgo = None  # si la caché falla, se consulta al modelo igualmente
+    (ACIERTOS_CACHE if riesgo is not None else FALLOS_CACHE).inc(cache="llm")
+    return riesgo
+
+def _guardar_cache(clave: str, riesgo: float) -> None:
+    try:
+        cache_riesgo_llm.guardar(clave, riesgo)
+    except Exception:
+        pass
+
+def construir_prompt_riesgo(transaccion_actual: Dict[str, Any], contexto_cliente: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Prompt completo de una transacción y su sufijo (lo que va tras el prefijo del cliente).
+    """
     transaccion_formateada = json.dumps(transaccion_actual, indent=2, ensure_ascii=False)
-    
-    prompt_final = PLANTILLA_PROMPT_RIESGO.format(
-        edad=edad,
-        salario=salario,
-        zona=zona,
-        total_transacciones=total_transacciones,
-        historial_reciente=historial_reciente,
-        transaccion_actual=transaccion_formateada
-    )
+    prompt_final = PLANTILLA_PROMPT_RIESGO.format(transaccion_actual=transaccion_formateada, **contexto_cliente)
+    return prompt_final, PLANTILLA_SUFIJO_TRANSACCION.format(transaccion_actual=transaccion_formateada)
+
+def evaluar_riesgo_llm(transaccion_actual: Dict[str, Any], historial_completo: Dict[str, Any],
+                       limite: Optional[float] = None, contexto_cliente: Optional[Dict[str, Any]] = None) -> Optional[float]:
+    """
+    Riesgo según el LLM o None si se agota el presupuesto: como mucho LLM_MAX_INTENTOS
+    peticiones (errores HTTP, timeouts o respuestas sin número) y nunca más allá de
+    'limite' (time.monotonic()); por defecto LLM_DEADLINE_SECONDS desde ahora.
+    """
+    if limite is None:
+        limite = time.monotonic() + LLM_DEADLINE_SECONDS
+    if contexto_cliente is None:
+        contexto_cliente = preparar_contexto_cliente(historial_completo)
+
+    clave_cache = None
+    if LLM_CACHE_ENABLED:
+        clave_cache = _clave_cache(transaccion_actual, contexto_cliente)
+        riesgo_cacheado = _leer_cache(clave_cache)
+        if riesgo_cacheado is not None:
+            return riesgo_cacheado
+
+    prompt_final, sufijo = construir_prompt_riesgo(transaccion_actual, contexto_cliente)
 
     payload = {
-        "model": "cas/salamandra-7b-instruct:latest",
+        "model": MODELO_LLM,
         "prompt": prompt_final,
         "stream": False,
         "options": {
             "temperature": 0/0.2 
         }
     }
+    _aplicar_prefijo(payload, contexto_cliente, sufijo, limite)
 
-    try:
-        while (True):
-            response = requests.post(OLLAMA_URL, json=payload)
-            response.raise_for_status()
+    riesgo = _consultar_ollama(payload, limite, extraer_riesgo)
+    if riesgo is not None and clave_cache is not None:
+        _guardar_cache(clave_cache, riesgo)
+    return riesgo
 
-            response_data = response.json()
-            respuesta_texto = response_data['response'].strip()
+def evaluar_lote_cliente(transacciones: List[Dict[str, Any]], historial_completo: Dict[str, Any],
+                         limite: Optional[float] = None) -> List[Optional[float]]:
+    """
+    Puntúa varias transacciones del MISMO cliente con un único prompt (el contexto del cliente
+    se envía una vez). Las que salgan de la caché no se envían; las que el modelo no puntúe
+    de forma legible se reintentan con el prompt individual.
+    """
+    if limite is None:
+        limite = time.monotonic() + LLM_DEADLINE_SECONDS
+    contexto_cliente = preparar_contexto_cliente(historial_completo)
+    riesgos: List[Optional[float]] = [None] * len(transacciones)
 
-            match = re.search(r"0?\.\d+", respuesta_texto)
-        
-            if match:
-                numero_encontrado = match.group(0)
-                if numero_encontrado.startswith('.'):
-                    numero_encontrado = '0' + numero_encontrado
-                
-                riesgo = float(numero_encontrado)
+    claves = [None] * len(transacciones)
+    pendientes = list(range(len(transacciones)))
+    if LLM_CACHE_ENABLED:
+        claves = [_clave_cache(transaccion, contexto_cliente) for transaccion in transacciones]
+        for indice, clave in enumerate(claves):
+            riesgos[indice] = _leer_cache(clave)
+        pendientes = [indice for indice in pendientes if riesgos[indice] is None]
 
-                return riesgo
-    except Exception:
-        return 0.5, "Error en la evaluación del riesgo"
\ No newline at end of file
+    if len(pendientes) > 1:
+        transacciones_formateadas = "\n".join(
+            f"id {numero}: {json.dumps(transacciones[indice], ensure_ascii=False)}"
+            for numero, indice in enumerate(pendientes, 1)
+        )
+        payload = {
+            "model": MODELO_LLM,
+            "prompt": PLANTILLA_PROMPT_RIESGO_LOTE.format(transacciones_actuales=transacciones_formateadas, **contexto_cliente),
+            "stream": False,
+            "format": "json",
+            "options": {
+                "temperature": 0/0.2
+            }
+        }
+        _aplicar_prefijo(payload, contexto_cliente,
+                         PLANTILLA_SUFIJO_LOTE.format(transacciones_actuales=transacciones_formateadas), limite)
+
+        def interpretar(texto: str) -> Optional[List[Optional[float]]]:
+            leidos = extraer_riesgos_lote(texto, len(pendientes))
+            return leidos if any(riesgo is not None for riesgo in leidos) else None
+
+        leidos = _consultar_ollama(payload, limite, interpretar) or [None] * len(pendientes)
+        for indice, riesgo in zip(pendientes, leidos):
+            if riesgo is not None:
+                riesgos[indice] = riesgo
+                if claves[indice] is not None:
+                    _guardar_cache(claves[indice], riesgo)
+
+    # Lo que no haya salido del lote va por el prompt de una transacción
+    for indice in pendientes:
+        if riesgos[indice] is None:
+            riesgos[indice] = evaluar_riesgo_llm(transacciones[indice], historial_completo, limite, contexto_cliente)
+    return riesgos
+
+def queryLargeLanguageModel(transaccion_actual: Dict[str, Any], historial_completo: Dict[str, Any]) -> float:
+    riesgo = evaluar_riesgo_llm(transaccion_actual, historial_completo)
+    return riesgo if riesgo is not None else 0.5
+
+
+def queryLargeLanguageModelBatch(lista_transacciones: List[Dict[str, Any]], lista_historiales: List[Dict[str, Any]],
+                                 max_en_vuelo: int = LLM_MAX_CONCURRENCY,
+                                 tamano_prompt: int = LLM_PROMPT_BATCH_SIZE,
+                                 limite_lote: Optional[float] = None) -> List[Optional[float]]:
+    """
+    Puntúa varias transacciones contra Ollama con como mucho max_en_vuelo peticiones a la vez
+    (reutilizando conexiones) y devuelve los riesgos en el mismo orden que la entrada.
+    lista_historiales va en paralelo a lista_transacciones (el historial de cada una).
+    Con tamano_prompt > 1, las transacciones que comparten historial (mismo cliente) se envían
+    de tamano_prompt en tamano_prompt en un solo prompt.
+    Todo el lote termina antes de 'limite_lote' (time.monotonic(); por defecto
+    LLM_BATCH_DEADLINE_SECONDS desde ahora); las transacciones que no consiguen respuesta a
+    tiempo (o agotan sus intentos) devuelven None. Con el plazo ya vencido solo se sirve la caché.
+    """
+    if limite_lote is None:
+        limite_lote = time.monotonic() + LLM_BATCH_DEADLINE_SECONDS
+    riesgos: List[Optional[float]] = [None] * len(lista_transacciones)
+
+    # Cada tarea es una lista de índices que comparten historial
+    if tamano_prompt > 1:
+        por_cliente: Dict[int, List[int]] = {}
+        for indice, historial in enumerate(lista_historiales):
+            por_cliente.setdefault(id(historial), []).append(indice)
+        tareas = [indices[inicio:inicio + tamano_prompt]
+                  for indices in por_cliente.values()
+                  for inicio in range(0, len(indices), tamano_prompt)]
+    else:
+        tareas = [[indice] for indice in range(len(lista_transacciones))]
+
+    def puntuar(indices: List[int]) -> None:
+        limite = min(time.monotonic() + LLM_DEADLINE_SECONDS, limite_lote)
+        historial = lista_historiales[indices[0]]
+        try:
+            if len(indices) == 1:
+                resultado = [evaluar_riesgo_llm(lista_transacciones[indices[0]], historial, limite)]
+            else:
+                resultado = evaluar_lote_cliente([lista_transacciones[indice] for indice in indices], historial, limite)
+        except Exception:
+            return
+        for indice, riesgo in zip(indices, resultado):
+            riesgos[indice] = riesgo
+
+    if max_en_vuelo <= 1 or len(tareas) <= 1:
+        for tarea in tareas:
+            puntuar(tarea)
+        return riesgos
+
+    with ThreadPoolExecutor(max_workers=min(max_en_vuelo, len(tareas)), thread_name_prefix="llm") as pool:
+        list(pool.map(puntuar, tareas))
+    return riesgos
@@ -0,0 +1,105 @@
+import numpy
+import pandas
+
+from typing import Any, Dict, List
+
+from .trainMachineLearning import transformar_fecha_a_timestamp_simple
+
+
+# Fechas distintas que se recuerdan ya convertidas a epoch; en la práctica son pocos días
+MAX_FECHAS_CACHEADAS = 100_000
+
+
+class CodificadorCompilado:
+    """
+    Equivalente a preprocessor.transform(DataFrame).astype(float) sin DataFrame ni ColumnTransformer:
+    - fecha: epoch en segundos, memorizado por valor (las subidas repiten muy pocos días)
+    - num: (x - mean_) / scale_ con las constantes del StandardScaler ajustado
+    - cat: índice de columna precalculado por categoría (las desconocidas se ignoran),
+      o el índice del CodificadorHashing calculado por valor
+    - bool: passthrough
+    Escribe directamente en un buffer NumPy preasignado y acepta una fila o un lote.
+    """
+
+    def __init__(self, preprocessor):
+        self.num_features = len(preprocessor.get_feature_names_out())
+        self.fechas = []
+        self.numericas = []
+        self.categoricas = []
+        self.hasheadas = []
+        self.passthrough = []
+        self._cache_fechas: Dict[Any, int] = {}
+
+        for nombre, transformador, columnas in preprocessor.transformers_:
+            if nombre == 'remainder' or transformador == 'drop':
+                continue
+            indices = preprocessor.output_indices_[nombre]
+            columnas = list(columnas)
+            tipo = type(transformador).__name__
+
+            if tipo == 'FunctionTransformer' and getattr(transformador.func, '__name__', None) == 'transformar_fecha_a_timestamp_simple':
+                self.fechas.append((columnas[0], indices.start))
+            elif transformador == 'passthrough' or (tipo == 'FunctionTransformer' and transformador.func is None):
+                self.passthrough.append((columnas, indices))
+            elif tipo == 'StandardScaler':
+                media = transformador.mean_ if transformador.with_mean else None
+                escala = transformador.scale_ if transformador.with_std else None
+                self.numericas.append((columnas, indices, media, escala))
+            elif tipo == 'OneHotEncoder':
+                if transformador.drop is not None or getattr(transformador, 'infrequent_categories_', None) is not None:
+                    raise ValueError("OneHotEncoder con drop/infrequent no soportado por el codificador compilado")
+                desplazamiento = indices.start
+                for columna, categorias in zip(columnas, transformador.categories_):
+                    mapa = {categoria: desplazamiento + posicion for posicion, categoria in enumerate(categorias)}
+                    self.categoricas.append((columna, mapa))
+                    desplazamiento += len(categorias)
+            elif tipo == 'CodificadorHashing':
+                self.hasheadas.append((columnas, indices.start, transformador))
+            else:
+                raise ValueError(f"Transformador '{nombre}' ({tipo}) no soportado por el codificador compilado")
+
+    def _timestamps(self, valores: List[Any]) -> numpy.ndarray:
+        cache = self._cache_fechas
+        pendientes = list({valor for valor in valores if valor not in cache})
+        if pendientes:
+            if len(cache) + len(pendientes) > MAX_FECHAS_CACHEADAS:
+                cache.clear()
+            # Misma función que usa el preprocesador, así que el resultado es idéntico
+            convertidos = transformar_fecha_a_timestamp_simple(pandas.Series(pendientes, dtype=object))
+            cache.update(zip(pendientes, convertidos[:, 0].tolist()))
+        return numpy.fromiter((cache[valor] for valor in valores), dtype=numpy.float64, count=len(valores))
+
+    def transform(self, registros: List[Dict[str, Any]]) -> numpy.ndarray:
+        X = numpy.zeros((len(registros), self.num_features), dtype=numpy.float64)
+        if not registros:
+            return X
+
+        for columna, indice in self.fechas:
+            X[:, indice] = self._timestamps([registro[columna] for registro in registros])
+
+        for columnas, indices, media, escala in self.numericas:
+            valores = numpy.array([[registro[columna] for columna in columnas] for registro in registros], dtype=numpy.float64)
+            if media is not None:
+                valores -= media
+            if escala is not None:
+                valores /= escala
+            X[:, indices] = valores
+
+        filas = numpy.arange(len(registros))
+        for columna, mapa in self.categoricas:
+            destino = numpy.fromiter((mapa.get(registro[columna], -1) for registro in registros), dtype=numpy.int64, count=len(registros))
+            conocidas = destino >= 0
+            X[filas[conocidas], destino[conocidas]] = 1.0
+
+        # Hashing: mismo índice que CodificadorHashing.transform; las colisiones se suman
+        for columnas, inicio, transformador in self.hasheadas:
+            for columna, nombre in zip(columnas, transformador.columnas_):
+                for fila, registro in enumerate(registros):
+                    valor = registro[columna]
+                    if valor is not None and valor == valor:
+                        X[fila, inicio + transformador.indice(nombre, valor)] += 1.0
+
+        for columnas, indices in self.passthrough:
+            X[:, indices] = numpy.array([[registro[columna] for columna in columnas] for registro in registros], dtype=numpy.float64)
+
+        return X
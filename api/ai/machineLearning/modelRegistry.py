@@ -0,0 +1,191 @@
+import warnings
+warnings.filterwarnings('ignore', message='.*Skipping variable loading for optimizer.*')
+
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import __main__
+import hashlib
+import joblib
+import threading
+import time
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from .compiledEncoder import CodificadorCompilado
+from .numpyInference import ModeloNumpy
+from .trainMachineLearning import CodificadorHashing, transformar_fecha_a_timestamp_simple
+
+
+DIRECTORIO_ML = os.path.dirname(os.path.abspath(__file__))
+NOMBRE_ARCHIVO_MODELO = os.getenv("ML_WEIGHTS_PATH", os.path.join(DIRECTORIO_ML, 'machineLearning.weights.h5'))
+NOMBRE_ARCHIVO_PREPROCESSOR = os.getenv("ML_PREPROCESSOR_PATH", os.path.join(DIRECTORIO_ML, 'preprocessor.joblib'))
+# Cada cuántos segundos, como mucho, se mira el mtime de los artefactos para recargar en caliente
+INTERVALO_COMPROBACION = float(os.getenv("ML_RELOAD_CHECK_SECONDS", "5"))
+# 'keras' reconstruye el modelo con TensorFlow; 'numpy' hace el forward pass sin importar tensorflow
+BACKEND_ML = os.getenv("ML_BACKEND", "keras")
+DTYPE_NUMPY = os.getenv("ML_NUMPY_DTYPE", "float32")
+# Sustituye preprocessor.transform por el codificador compilado (misma salida, sin DataFrame)
+CODIFICADOR_COMPILADO = os.getenv("ML_COMPILED_ENCODER", "1") == "1"
+
+
+@dataclass(frozen=True)
+class ArtefactosML:
+    preprocessor: Any
+    model: Any
+    num_features: int
+    codificador: Optional[CodificadorCompilado]
+    backend: str
+    version: str
+    cargado_en: datetime
+
+
+def version_artefactos(ruta_modelo: str = NOMBRE_ARCHIVO_MODELO, ruta_preprocessor: str = NOMBRE_ARCHIVO_PREPROCESSOR) -> str:
+    """
+    Sello de versión derivado de mtime y tamaño de ambos artefactos.
+    Cambia cada vez que trainMachineLearning.py reescribe cualquiera de los dos.
+    """
+    huella = hashlib.sha1()
+    for ruta in (ruta_modelo, ruta_preprocessor):
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No se encontró el artefacto en {ruta}")
+        estado = os.stat(ruta)
+        huella.update(f"{ruta}:{estado.st_mtime_ns}:{estado.st_size};".encode())
+    return huella.hexdigest()[:12]
+
+
+def construir_modelo(num_features: int):
+    import tensorflow
+
+    # Misma arquitectura que en entrenamiento
+    model = tensorflow.keras.models.Sequential([
+        tensorflow.keras.layers.Input(shape=(num_features,)),
+        tensorflow.keras.layers.Dense(8, activation='relu'),
+        tensorflow.keras.layers.Dense(1, activation='sigmoid')
+    ])
+
+    model.compile(
+        optimizer=tensorflow.keras.optimizers.Adam(learning_rate=0.001),
+        loss='binary_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+
+def cargar_artefactos(ruta_modelo: str = NOMBRE_ARCHIVO_MODELO, ruta_preprocessor: str = NOMBRE_ARCHIVO_PREPROCESSOR,
+                      backend: str = BACKEND_ML) -> ArtefactosML:
+    version = version_artefactos(ruta_modelo, ruta_preprocessor)
+
+    # El preprocesador se serializó ejecutando trainMachineLearning.py como script, así que
+    # el pickle busca la función de fecha (y el CodificadorHashing) en __main__ (que en la API es app.py)
+    if not hasattr(__main__, 'transformar_fecha_a_timestamp_simple'):
+        __main__.transformar_fecha_a_timestamp_simple = transformar_fecha_a_timestamp_simple
+    if not hasattr(__main__, 'CodificadorHashing'):
+        __main__.CodificadorHashing = CodificadorHashing
+
+    preprocessor = joblib.load(ruta_preprocessor)
+    num_features = len(preprocessor.get_feature_names_out())
+
+    codificador = None
+    if CODIFICADOR_COMPILADO:
+        try:
+            codificador = CodificadorCompilado(preprocessor)
+        except ValueError as e:
+            print(f"Codificador compilado no disponible, se usa preprocessor.transform: {e}")
+
+    if backend == 'numpy':
+        model = ModeloNumpy(ruta_modelo, DTYPE_NUMPY)
+        if model.num_features != num_features:
+            raise ValueError(f"Los pesos esperan {model.num_features} features y el preprocesador genera {num_features}")
+    elif backend == 'keras':
+        model = construir_modelo(num_features)
+        model.load_weights(ruta_modelo)
+    else:
+        raise ValueError(f"ML_BACKEND desconocido: {backend} (usa 'keras' o 'numpy')")
+
+    return ArtefactosML(
+        preprocessor=preprocessor,
+        model=model,
+        num_features=num_features,
+        codificador=codificador,
+        backend=backend,
+        version=version,
+        cargado_en=datetime.utcnow(),
+    )
+
+
+class RegistroModelo:
+    """
+    Mantiene en memoria (una vez por proceso) el preprocesador y el modelo.
+    La recarga construye unos artefactos nuevos completos y solo entonces sustituye la
+    referencia, así que las peticiones en vuelo siguen usando la versión anterior.
+    """
+
+    def __init__(self, ruta_modelo: str = NOMBRE_ARCHIVO_MODELO, ruta_preprocessor: str = NOMBRE_ARCHIVO_PREPROCESSOR,
+                 intervalo_comprobacion: float = INTERVALO_COMPROBACION, backend: str = BACKEND_ML):
+        self.ruta_modelo = ruta_modelo
+        self.ruta_preprocessor = ruta_preprocessor
+        self.intervalo_comprobacion = intervalo_comprobacion
+        self.backend = backend
+        self._artefactos: Optional[ArtefactosML] = None
+        self._ultima_comprobacion = 0.0
+        self._lock = threading.Lock()
+
+    def precargar(self) -> ArtefactosML:
+        with self._lock:
+            self._artefactos = cargar_artefactos(self.ruta_modelo, self.ruta_preprocessor, self.backend)
+            self._ultima_comprobacion = time.monotonic()
+            return self._artefactos
+
+    def obtener(self) -> ArtefactosML:
+        artefactos = self._artefactos
+        if artefactos is None:
+            with self._lock:
+                if self._artefactos is None:
+                    self._artefactos = cargar_artefactos(self.ruta_modelo, self.ruta_preprocessor, self.backend)
+                    self._ultima_comprobacion = time.monotonic()
+                return self._artefactos
+
+        if time.monotonic() - self._ultima_comprobacion >= self.intervalo_comprobacion:
+            self._recargar_si_cambio()
+        return self._artefactos
+
+    def _recargar_si_cambio(self) -> None:
+        # Si otro hilo ya está comprobando/recargando, seguimos sirviendo con lo que hay
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._ultima_comprobacion = time.monotonic()
+            try:
+                version = version_artefactos(self.ruta_modelo, self.ruta_preprocessor)
+            except FileNotFoundError:
+                return  # artefacto a medio escribir o borrado: mantenemos la versión cargada
+            if version == self._artefactos.version:
+                return
+            try:
+                self._artefactos = cargar_artefactos(self.ruta_modelo, self.ruta_preprocessor, self.backend)
+            except Exception as e:
+                print(f"Error recargando artefactos ML (se mantiene la versión {self._artefactos.version}): {e}")
+        finally:
+            self._lock.release()
+
+    def info(self) -> Dict[str, Any]:
+        artefactos = self._artefactos
+        if artefactos is None:
+            return {"cargado": False, "backend": self.backend, "modelo": self.ruta_modelo, "preprocesador": self.ruta_preprocessor}
+        return {
+            "cargado": True,
+            "version": artefactos.version,
+            "cargado_en": artefactos.cargado_en.isoformat(),
+            "num_features": artefactos.num_features,
+            "backend": artefactos.backend,
+            "codificador_compilado": artefactos.codificador is not None,
+            "modelo": self.ruta_modelo,
+            "preprocesador": self.ruta_preprocessor,
+        }
+
+
+registro_modelo = RegistroModelo()
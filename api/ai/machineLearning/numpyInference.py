@@ -0,0 +1,96 @@
+import h5py
+import numpy
+import re
+
+from scipy import sparse
+from typing import List, Tuple
+
+
+# Diferencia absoluta máxima admitida frente a model.predict de Keras con los mismos pesos
+TOLERANCIA_FLOAT64 = 1e-6
+TOLERANCIA_FLOAT32 = 1e-5
+
+
+def _orden_capa(nombre: str) -> int:
+    # Keras nombra las capas densas 'dense', 'dense_1', 'dense_2'... en orden de creación
+    coincidencia = re.search(r"_(\d+)$", nombre)
+    return int(coincidencia.group(1)) if coincidencia else 0
+
+
+def leer_pesos_densos(ruta_pesos: str) -> List[Tuple[numpy.ndarray, numpy.ndarray]]:
+    """
+    Lee (kernel, bias) de cada capa Dense del .weights.h5 que guarda Keras 3 con save_weights.
+    """
+    with h5py.File(ruta_pesos, 'r') as archivo:
+        capas = archivo['layers']
+        pesos = []
+        for nombre in sorted(capas.keys(), key=_orden_capa):
+            variables = capas[nombre].get('vars')
+            if variables is None or len(variables) != 2:
+                continue
+            pesos.append((variables['0'][()], variables['1'][()]))
+    return pesos
+
+
+class ModeloNumpy:
+    """
+    Forward pass de Input -> Dense(8, relu) -> Dense(1, sigmoid) con matmuls de NumPy.
+    Expone predict() con la misma forma de salida que Keras (n, 1) para poder sustituirlo
+    en el registro sin tocar a quien lo llama. No importa tensorflow.
+    """
+
+    def __init__(self, ruta_pesos: str, dtype: str = 'float32'):
+        self.dtype = numpy.dtype(dtype)
+        pesos = leer_pesos_densos(ruta_pesos)
+        if len(pesos) != 2:
+            raise ValueError(f"Se esperaban 2 capas densas en {ruta_pesos} y hay {len(pesos)}")
+
+        (kernel_oculta, bias_oculta), (kernel_salida, bias_salida) = pesos
+        if kernel_oculta.shape[1] != kernel_salida.shape[0]:
+            raise ValueError(f"Pesos incompatibles: {kernel_oculta.shape} seguido de {kernel_salida.shape}")
+
+        self.kernel_oculta = numpy.ascontiguousarray(kernel_oculta, dtype=self.dtype)
+        self.bias_oculta = bias_oculta.astype(self.dtype)
+        self.kernel_salida = numpy.ascontiguousarray(kernel_salida, dtype=self.dtype)
+        self.bias_salida = bias_salida.astype(self.dtype)
+        self.num_features = self.kernel_oculta.shape[0]
+
+    def predict(self, X, batch_size=None, verbose=0) -> numpy.ndarray:
+        # Acepta también la matriz CSR del preprocesador con hashing (sparse @ denso -> denso)
+        X = X.astype(self.dtype) if sparse.issparse(X) else numpy.asarray(X, dtype=self.dtype)
+        if X.shape[1] != self.num_features:
+            raise ValueError(f"El modelo espera {self.num_features} features y llegan {X.shape[1]}")
+
+        oculta = numpy.asarray(X @ self.kernel_oculta)
+        oculta += self.bias_oculta
+        numpy.maximum(oculta, 0, out=oculta)
+
+        logits = oculta @ self.kernel_salida
+        logits += self.bias_salida
+        # sigmoide estable: 1 / (1 + e^-z) = e^-log(1 + e^-z)
+        return numpy.exp(-numpy.logaddexp(0, -logits))
+
+
+if __name__ == "__main__":
+    # Comprobación de equivalencia con Keras sobre un fichero de transacciones:
+    #   python -m ai.machineLearning.numpyInference "../json files/training/all_transactions.json"
+    import json
+    import sys
+
+    import pandas
+
+    from .modelRegistry import NOMBRE_ARCHIVO_MODELO, cargar_artefactos
+    from .queryMachineLearning import COLUMNAS_REQUERIDAS
+
+    with open(sys.argv[1], 'r', encoding='utf-8') as file:
+        transacciones = json.load(file)['transactions']
+
+    artefactos = cargar_artefactos(backend='keras')
+    transaction_df = pandas.DataFrame.from_records(transacciones, columns=COLUMNAS_REQUERIDAS)
+    X = artefactos.preprocessor.transform(transaction_df).astype(float)
+    referencia = artefactos.model.predict(X, batch_size=len(X), verbose=0)
+
+    for dtype, tolerancia in (('float64', TOLERANCIA_FLOAT64), ('float32', TOLERANCIA_FLOAT32)):
+        diferencia = numpy.abs(ModeloNumpy(NOMBRE_ARCHIVO_MODELO, dtype).predict(X) - referencia).max()
+        estado = "OK" if diferencia <= tolerancia else "FUERA DE TOLERANCIA"
+        print(f"{dtype}: diferencia máxima {diferencia:.2e} (tolerancia {tolerancia:.0e}) -> {estado}")
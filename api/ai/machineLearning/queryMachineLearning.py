@@ -5,76 +5,105 @@ import os
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
+import numpy
 import pandas
-import tensorflow
+import time
 import traceback
-import joblib
 
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+from .modelRegistry import registro_modelo
+try:
+    from ..featureStore import COLUMNAS_AGREGADOS
+    from ..metrics import DURACION_ETAPA, ERRORES, ML_FALLBACK
+except ImportError:  # importado como paquete suelto desde ai/ai.py
+    from featureStore import COLUMNAS_AGREGADOS
+    from metrics import DURACION_ETAPA, ERRORES, ML_FALLBACK
+
+
+COLUMNAS_NUMERICAS = ['transaction_value']
+COLUMNAS_BOOLEANAS = ['is_recurring', 'is_first_purchase']
+COLUMNAS_CATEGORICAS = ['product_category', 'collector_company', 'iban_anonymized']
+COLUMNA_FECHA = 'transaction_date'
+COLUMNAS_REQUERIDAS = COLUMNAS_NUMERICAS + COLUMNAS_BOOLEANAS + COLUMNAS_CATEGORICAS + [COLUMNA_FECHA]
+
+# Filas por forward pass; acota la memoria de la matriz preprocesada en ficheros muy grandes
+TAMANO_TROZO_ML = int(os.getenv("ML_BATCH_CHUNK_SIZE", "4096"))
+
+
+def columnas_modelo(preprocessor) -> List[str]:
+    """
+    Columnas de entrada del preprocesador: las básicas más los rasgos agregados (featureStore)
+    si se entrenó con ellos (ML_USE_AGGREGATES=1 en trainMachineLearning.py).
+    """
+    entrenadas = set(getattr(preprocessor, 'feature_names_in_', []))
+    return COLUMNAS_REQUERIDAS + [columna for columna in COLUMNAS_AGREGADOS if columna in entrenadas]
 
 
 def queryMachineLearning(transaction_data: Dict[str, Any]) -> float:
-    COLUMNAS_NUMERICAS = ['transaction_value']
-    COLUMNAS_BOOLEANAS = ['is_recurring', 'is_first_purchase']
-    COLUMNAS_CATEGORICAS = ['product_category', 'collector_company', 'iban_anonymized']
-    COLUMNA_FECHA = 'transaction_date'
-    
-    NOMBRE_ARCHIVO_MODELO = 'api/ai/machineLearning/machineLearning.weights.h5'
-    NOMBRE_ARCHIVO_PREPROCESSOR = 'api/ai/machineLearning/preprocessor.joblib'
-    
+    return float(queryMachineLearningBatch([transaction_data])[0])
+
+
+def queryMachineLearningBatch(lista_transacciones: List[Dict[str, Any]], tamano_trozo: int = TAMANO_TROZO_ML) -> numpy.ndarray:
+    """
+    Puntúa todas las transacciones preprocesándolas como una única matriz por trozo
+    y haciendo una sola predicción por trozo. Devuelve un array con el mismo orden;
+    las filas que no se puedan puntuar quedan a 0.5, igual que en la versión por fila.
+    """
+    riesgos = numpy.full(len(lista_transacciones), 0.5)
+    if not lista_transacciones:
+        return riesgos
+    puntuadas = 0
+
     try:
-        if not os.path.exists(NOMBRE_ARCHIVO_MODELO):
-            raise FileNotFoundError(f"No se encontró el modelo en {NOMBRE_ARCHIVO_MODELO}")
-        
-        if not os.path.exists(NOMBRE_ARCHIVO_PREPROCESSOR):
-            raise FileNotFoundError(f"No se encontró el preprocesador en {NOMBRE_ARCHIVO_PREPROCESSOR}")
-        
-        # 1. Cargar el preprocesador
-        preprocessor = joblib.load(NOMBRE_ARCHIVO_PREPROCESSOR)
-        
-        # 2. Convertir el diccionario a DataFrame (una sola fila)
-        transaction_df = pandas.DataFrame([transaction_data])
-        
-        # 3. Verificar que tenemos todas las columnas necesarias
-        columnas_requeridas = COLUMNAS_NUMERICAS + COLUMNAS_BOOLEANAS + COLUMNAS_CATEGORICAS + [COLUMNA_FECHA]
-        for columna in columnas_requeridas:
-            if columna not in transaction_df.columns:
-                raise ValueError(f"Falta la columna requerida: {columna}")
-        
-        # 4. Preprocesar los datos
-        X_processed = preprocessor.transform(transaction_df)
-        X_processed = X_processed.astype(float)
-        
-        # 5. Cargar y construir el modelo (misma arquitectura que en entrenamiento)
-        num_features = X_processed.shape[1]
-        
-        model = tensorflow.keras.models.Sequential([
-            tensorflow.keras.layers.Input(shape=(num_features,)),
-            tensorflow.keras.layers.Dense(8, activation='relu'),
-            tensorflow.keras.layers.Dense(1, activation='sigmoid')
-        ])
-        
-        model.compile(
-            optimizer=tensorflow.keras.optimizers.Adam(learning_rate=0.001),
-            loss='binary_crossentropy',
-            metrics=['accuracy']
-        )
-        
-        # 6. Cargar los pesos entrenados
-        model.load_weights(NOMBRE_ARCHIVO_MODELO)
-        
-        # 7. Realizar la predicción
-        prediction = model.predict(X_processed, verbose=0)
-        
-        # 8. Devolver la probabilidad como float
-        return float(prediction[0][0])
-        
+        # 1. Preprocesador y modelo residentes (se cargan una vez y se recargan si cambian)
+        artefactos = registro_modelo.obtener()
+        columnas = columnas_modelo(artefactos.preprocessor)
+
+        # 2. Verificar que cada fila tiene todas las columnas necesarias
+        indices_validos = []
+        for indice, transaccion in enumerate(lista_transacciones):
+            faltantes = [columna for columna in columnas if columna not in transaccion]
+            if faltantes:
+                print(f"Error durante la predicción: Falta la columna requerida: {faltantes[0]}")
+                continue
+            indices_validos.append(indice)
+
+        for inicio in range(0, len(indices_validos), tamano_trozo):
+            indices_trozo = indices_validos[inicio:inicio + tamano_trozo]
+
+            # 3. Preprocesar el trozo de una vez
+            inicio_trozo = time.perf_counter()
+            registros = [lista_transacciones[indice] for indice in indices_trozo]
+            if artefactos.codificador is not None:
+                X_processed = artefactos.codificador.transform(registros)
+            else:
+                transaction_df = pandas.DataFrame.from_records(registros, columns=columnas)
+                X_processed = artefactos.preprocessor.transform(transaction_df)
+                X_processed = X_processed.astype(float)
+
+            # 4. Una única predicción para todo el trozo
+            medio_trozo = time.perf_counter()
+            prediction = artefactos.model.predict(X_processed, batch_size=len(indices_trozo), verbose=0)
+            riesgos[indices_trozo] = prediction[:, 0]
+            puntuadas += len(indices_trozo)
+            DURACION_ETAPA.observar(medio_trozo - inicio_trozo, etapa="preprocesado")
+            DURACION_ETAPA.observar(time.perf_counter() - medio_trozo, etapa="prediccion")
+
+        # Las filas a las que les faltaban columnas se quedan en 0.5
+        ML_FALLBACK.inc(len(lista_transacciones) - puntuadas)
+        return riesgos
+
     except FileNotFoundError as e:
         print(f"Error: {e}")
         print("Asegúrate de que el modelo ha sido entrenado primero ejecutando trainMachineLearning.py")
-        return 0.5
-        
+        ERRORES.inc(componente="ml")
+        ML_FALLBACK.inc(len(lista_transacciones) - puntuadas)
+        return riesgos
+
     except Exception as e:
         print(f"Error durante la predicción: {e}")
         traceback.print_exc()
-        return 0.5
\ No newline at end of file
+        ERRORES.inc(componente="ml")
+        ML_FALLBACK.inc(len(lista_transacciones) - puntuadas)
+        return riesgos
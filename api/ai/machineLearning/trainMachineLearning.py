@@ -2,16 +2,21 @@ import os
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
+import glob
 import joblib
 import json
+import numpy
 import pandas
+import re
 import sys
-import tensorflow
 import traceback
 
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import FunctionTransformer
+from sklearn.utils import murmurhash3_32
 
 
 def transformar_fecha_a_timestamp_simple(X):
@@ -26,7 +31,149 @@ def transformar_fecha_a_timestamp_simple(X):
     
     return timestamps.values.reshape(-1, 1)
 
+
+class CodificadorHashing(BaseEstimator, TransformerMixin):
+    """
+    Feature hashing de las categóricas: 'columna=valor' -> murmurhash3 % n_features.
+    A diferencia del OneHotEncoder la dimensión es fija (no crece con cada empresa o IBAN nuevo)
+    y la salida es una matriz dispersa CSR. Las colisiones se suman.
+    """
+
+    def __init__(self, n_features = 1024, semilla = 0):
+        self.n_features = n_features
+        self.semilla = semilla
+
+    def fit(self, X, y = None):
+        self.columnas_ = [str(columna) for columna in X.columns] if isinstance(X, pandas.DataFrame) \
+            else [f"x{indice}" for indice in range(numpy.shape(X)[1])]
+        self.n_features_in_ = len(self.columnas_)
+        return self
+
+    def indice(self, columna, valor):
+        return murmurhash3_32(f"{columna}={valor}", seed = self.semilla, positive = True) % self.n_features
+
+    def transform(self, X):
+        valores = X.to_numpy(dtype = object) if isinstance(X, pandas.DataFrame) else numpy.asarray(X, dtype = object)
+        filas, indices = [], []
+        for posicion, columna in enumerate(self.columnas_):
+            for fila, valor in enumerate(valores[:, posicion]):
+                if valor is None or (isinstance(valor, float) and valor != valor):
+                    continue
+                filas.append(fila)
+                indices.append(self.indice(columna, valor))
+        datos = numpy.ones(len(filas), dtype = numpy.float64)
+        return sparse.csr_matrix((datos, (filas, indices)), shape = (len(valores), self.n_features))
+
+    def get_feature_names_out(self, input_features = None):
+        return numpy.array([f"hash_{indice}" for indice in range(self.n_features)], dtype = object)
+
+
+def codificador_categoricas(codificacion, n_features_hash, categorias = 'auto'):
+    """
+    'onehot' (por defecto, denso) o 'hash' (CodificadorHashing, disperso y de tamaño fijo).
+    """
+    if codificacion == 'hash':
+        return CodificadorHashing(n_features = n_features_hash)
+    if codificacion != 'onehot':
+        print(f"Error: ML_CATEGORICAL_ENCODING desconocido: '{codificacion}' (usa 'onehot' o 'hash').")
+        sys.exit(1)
+    return OneHotEncoder(categories = categorias, handle_unknown = 'ignore', sparse_output = False)
+
+
+# --- Lectura por trozos para el modo streaming (ML_TRAIN_STREAMING=1) ---
+PATRON_INICIO_TRANSACCIONES = re.compile(r'"transactions"\s*:\s*\[')
+PATRON_CLIENTE = re.compile(r'"customer_id"\s*:\s*"([^"]*)"')
+
+
+def expandir_fuentes(patrones):
+    rutas = []
+    for patron in patrones:
+        encontradas = sorted(glob.glob(patron)) or [patron]  # si no es un glob, que falle al abrirlo
+        rutas.extend(ruta for ruta in encontradas if ruta not in rutas)
+    return rutas
+
+
+def leer_transacciones_json(ruta, tamano_bloque = 1 << 20):
+    """
+    Recorre el array 'transactions' de un JSON sin cargar el fichero entero: lee bloques y
+    decodifica los objetos de uno en uno. Devuelve (customer_id de la cabecera o None, transacción).
+    """
+    decodificador = json.JSONDecoder()
+    with open(ruta, 'r', encoding = 'utf-8') as file:
+        buffer = ''
+        inicio = PATRON_INICIO_TRANSACCIONES.search(buffer)
+        while inicio is None:
+            bloque = file.read(tamano_bloque)
+            if not bloque:
+                raise ValueError(f"'{ruta}' no tiene la clave 'transactions' en la raíz")
+            buffer += bloque
+            inicio = PATRON_INICIO_TRANSACCIONES.search(buffer)
+        cliente = PATRON_CLIENTE.search(buffer, 0, inicio.start())
+        cliente = cliente.group(1) if cliente else None
+
+        buffer, posicion = buffer[inicio.end():], 0
+        while True:
+            while posicion < len(buffer) and buffer[posicion] in ' \t\r\n,':
+                posicion += 1
+            if posicion < len(buffer) and buffer[posicion] == ']':
+                return
+            try:
+                if posicion == len(buffer):
+                    raise json.JSONDecodeError("fin de bloque", buffer, posicion)
+                transaccion, posicion = decodificador.raw_decode(buffer, posicion)
+            except json.JSONDecodeError:
+                # Objeto partido entre dos bloques: se descarta lo ya leído y se añade el siguiente
+                bloque = file.read(tamano_bloque)
+                if not bloque:
+                    raise
+                buffer, posicion = buffer[posicion:] + bloque, 0
+                continue
+            yield cliente, transaccion
+
+
+def leer_transacciones_ndjson(ruta):
+    with open(ruta, 'r', encoding = 'utf-8') as file:
+        for linea in file:
+            if linea.strip():
+                yield None, json.loads(linea)
+
+
+def leer_trozos(rutas, columnas_minimas, tamano_trozo, usar_agregados = False):
+    """
+    DataFrames de como mucho 'tamano_trozo' registros válidos, fuente a fuente.
+    Con usar_agregados calcula los rasgos de featureStore en el orden de lectura (las exportaciones
+    van en orden cronológico); el estado es por (cliente, empresa), no por fila.
+    """
+    if usar_agregados:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from featureStore import AgregadosEmpresa, ordinal_fecha
+        agregados = {}
+
+    trozo = []
+    for ruta in rutas:
+        es_ndjson = ruta.lower().endswith(('.ndjson', '.jsonl'))
+        for cliente, transaccion in (leer_transacciones_ndjson(ruta) if es_ndjson else leer_transacciones_json(ruta)):
+            if not all(columna in transaccion for columna in columnas_minimas):
+                continue
+            if usar_agregados:
+                cliente = cliente or (str(transaccion.get('transaction_code', '')).split('-') + [''])[1]
+                importe, fecha = float(transaccion['transaction_value']), ordinal_fecha(transaccion['transaction_date'])
+                agregados_empresa = agregados.setdefault((cliente, transaccion['collector_company']), AgregadosEmpresa())
+                transaccion.update(agregados_empresa.rasgos(importe, fecha))
+                agregados_empresa.actualizar(importe, fecha)
+            trozo.append(transaccion)
+            if len(trozo) >= tamano_trozo:
+                yield pandas.DataFrame.from_records(trozo)
+                trozo = []
+    if trozo:
+        yield pandas.DataFrame.from_records(trozo)
+
+
 if __name__ == "__main__":
+    # TensorFlow solo hace falta para entrenar; importarlo aquí permite usar
+    # transformar_fecha_a_timestamp_simple (p.ej. al cargar el preprocesador) sin arrastrarlo
+    import tensorflow
+
     # --- 1. Definición de Constantes ---
     COLUMNAS_NUMERICAS = ['transaction_value']
     COLUMNAS_BOOLEANAS = ['is_recurring', 'is_first_purchase']
@@ -35,96 +182,225 @@ if __name__ == "__main__":
 
     NOMBRE_ARCHIVO_MODELO = 'api/ai/machineLearning/machineLearning.weights.h5'
 
+    # Añade como columnas numéricas los rasgos por (cliente, empresa cobradora) de featureStore,
+    # calculados igual que en la API; el preprocesador guardado las pedirá al puntuar
+    USAR_AGREGADOS = os.getenv("ML_USE_AGGREGATES", "0") == "1"
+
+    # 'hash' sustituye el one-hot de las categóricas por hashing a ML_HASH_FEATURES columnas:
+    # la entrada del modelo (y su primera capa) deja de crecer con el universo de empresas/IBANs
+    CODIFICACION_CATEGORICAS = os.getenv("ML_CATEGORICAL_ENCODING", "onehot")
+    N_FEATURES_HASH = int(os.getenv("ML_HASH_FEATURES", "1024"))
+    USAR_HASHING = CODIFICACION_CATEGORICAS == 'hash'
+
+    # Modo streaming: muchas fuentes JSON/NDJSON (o globs) leídas por trozos en dos pasadas;
+    # la memoria depende del tamaño de trozo/lote, no del volumen de datos. Uso:
+    #   ML_TRAIN_STREAMING=1 python trainMachineLearning.py "datos/2025-*.ndjson" has_been_refunded "otros/*.json"
+    MODO_STREAMING = os.getenv("ML_TRAIN_STREAMING", "0") == "1"
+    TAMANO_TROZO = int(os.getenv("ML_TRAIN_CHUNK_ROWS", "5000"))
+    TAMANO_LOTE = int(os.getenv("ML_TRAIN_BATCH_SIZE", "32"))
+    # 1 de cada N filas va a validación (equivale al validation_split = 0.2 del modo normal)
+    CADA_N_VALIDACION = 5
+
     # --- 2. Verificación de Argumentos ---
     ruta_json = sys.argv[1]
     columna_objetivo = sys.argv[2]
 
-    # --- 3. Cargar y CONVERTIR Datos ---
-    try:
-        with open(ruta_json, 'r', encoding = 'utf-8') as file:
-            data_dict = json.load(file)
+    if MODO_STREAMING:
+        # --- 3-4 (streaming). Primera pasada: escalador y vocabularios ---
+        rutas = expandir_fuentes([ruta_json] + sys.argv[3:])
+        columnas_minimas = COLUMNAS_NUMERICAS + COLUMNAS_BOOLEANAS + COLUMNAS_CATEGORICAS + [COLUMNA_FECHA, columna_objetivo]
+        if USAR_AGREGADOS:
+            sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            from featureStore import COLUMNAS_AGREGADOS
+            COLUMNAS_NUMERICAS = COLUMNAS_NUMERICAS + COLUMNAS_AGREGADOS
+
+        def trozos():
+            return leer_trozos(rutas, columnas_minimas, TAMANO_TROZO, USAR_AGREGADOS)
 
-        if 'transactions' not in data_dict:
-            print("Error: El JSON no tiene la clave 'transactions' en la raíz.")
+        escalador = StandardScaler()
+        vocabularios = {columna: set() for columna in COLUMNAS_CATEGORICAS}
+        muestra = None
+        num_validos = 0
+        try:
+            for trozo in trozos():
+                if muestra is None:
+                    muestra = trozo.drop(columns = [columna_objetivo, 'transaction_code'], errors = 'ignore')
+                escalador.partial_fit(trozo[COLUMNAS_NUMERICAS])
+                if not USAR_HASHING:  # con hashing no hace falta vocabulario
+                    for columna in COLUMNAS_CATEGORICAS:
+                        vocabularios[columna].update(trozo[columna].dropna().unique())
+                num_validos += len(trozo)
+        except FileNotFoundError as e:
+            print(f"Error: No encontré tu JSON en '{e.filename}'.")
+            sys.exit(1)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"Error: Tu JSON está corrupto: {e}")
             sys.exit(1)
-        lista_plana_transacciones = data_dict['transactions']
 
-        columnas_minimas = COLUMNAS_NUMERICAS + COLUMNAS_BOOLEANAS + COLUMNAS_CATEGORICAS + [COLUMNA_FECHA, columna_objetivo]
-        registros_validos = [transaccion for transaccion in lista_plana_transacciones
-                             if all(columna in transaccion for columna in columnas_minimas)]
+        if num_validos == 0:
+            print("Error: No se encontraron registros válidos con todas las columnas necesarias en las fuentes.")
+            sys.exit(1)
 
-        num_original = len(lista_plana_transacciones)
-        num_validos = len(registros_validos)
+        # Mismo ColumnTransformer que el modo normal, con las categorías ya conocidas. Se ajusta
+        # con el primer trozo y el escalador se sustituye por el de la pasada completa
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('date', FunctionTransformer(
+                    transformar_fecha_a_timestamp_simple,
+                    validate=False,
+                    feature_names_out='one-to-one'
+                ), [COLUMNA_FECHA]),
+                ('num', StandardScaler(), COLUMNAS_NUMERICAS),
+                ('cat', codificador_categoricas(CODIFICACION_CATEGORICAS, N_FEATURES_HASH,
+                                                [sorted(vocabularios[columna]) for columna in COLUMNAS_CATEGORICAS]), COLUMNAS_CATEGORICAS),
+                ('bool', 'passthrough', COLUMNAS_BOOLEANAS)
+            ],
+            remainder='drop',
+            sparse_threshold=1.0 if USAR_HASHING else 0.3
+        )
+        try:
+            preprocessor.fit(muestra)
+            preprocessor.transformers_ = [(nombre, escalador if nombre == 'num' else transformador, columnas)
+                                          for nombre, transformador, columnas in preprocessor.transformers_]
+            num_features = len(preprocessor.get_feature_names_out())
+        except Exception as e:
+            print(f"Fallé durante el preprocesamiento: {e}")
+            traceback.print_exc()
+            sys.exit(1)
 
-        if num_validos == 0:
-             print("Error: No se encontraron registros válidos con todas las columnas necesarias en el JSON.")
-             sys.exit(1)
+        # Segunda pasada (una por época): lotes ya transformados para tf.data
+        def lotes(validacion):
+            fila = 0
+            for trozo in trozos():
+                es_validacion = (numpy.arange(fila, fila + len(trozo)) % CADA_N_VALIDACION) == CADA_N_VALIDACION - 1
+                fila += len(trozo)
+                trozo = trozo[es_validacion == validacion]
+                if len(trozo) == 0:
+                    continue
+                X_trozo = preprocessor.transform(trozo).astype('float32')
+                y_trozo = trozo[columna_objetivo].astype(int).values.astype('float32')
+                for inicio in range(0, X_trozo.shape[0], TAMANO_LOTE):
+                    X_lote = X_trozo[inicio:inicio + TAMANO_LOTE]
+                    # Con hashing el trozo es disperso; solo se densifica el lote (TAMANO_LOTE x dimensión fija)
+                    yield (X_lote.toarray() if sparse.issparse(X_lote) else X_lote), y_trozo[inicio:inicio + TAMANO_LOTE]
+
+        def dataset(validacion):
+            return tensorflow.data.Dataset.from_generator(
+                lambda: lotes(validacion),
+                output_signature = (
+                    tensorflow.TensorSpec(shape = (None, num_features), dtype = tensorflow.float32),
+                    tensorflow.TensorSpec(shape = (None,), dtype = tensorflow.float32)
+                )
+            ).prefetch(2)
+
+        datos_entrenamiento = dataset(False)
+        datos_validacion = dataset(True) if num_validos >= CADA_N_VALIDACION else None
+        print(f"Streaming: {num_validos} registros válidos en {len(rutas)} fuentes, {num_features} características")
+    else:
+        # --- 3. Cargar y CONVERTIR Datos ---
+        try:
+            with open(ruta_json, 'r', encoding = 'utf-8') as file:
+                data_dict = json.load(file)
+
+            if 'transactions' not in data_dict:
+                print("Error: El JSON no tiene la clave 'transactions' en la raíz.")
+                sys.exit(1)
+            lista_plana_transacciones = data_dict['transactions']
+
+            columnas_minimas = COLUMNAS_NUMERICAS + COLUMNAS_BOOLEANAS + COLUMNAS_CATEGORICAS + [COLUMNA_FECHA, columna_objetivo]
+            registros_validos = [transaccion for transaccion in lista_plana_transacciones
+                                 if all(columna in transaccion for columna in columnas_minimas)]
+
+            if USAR_AGREGADOS:
+                sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                from featureStore import AgregadosEmpresa, COLUMNAS_AGREGADOS, ordinal_fecha
+
+                # Cliente: customer_id de la raíz o el segmento Cxxx del transaction_code
+                agregados = {}
+                for transaccion in sorted(registros_validos, key=lambda t: t[COLUMNA_FECHA]):
+                    cliente = data_dict.get('customer_id') or (str(transaccion.get('transaction_code', '')).split('-') + [''])[1]
+                    clave = (cliente, transaccion['collector_company'])
+                    importe, fecha = float(transaccion['transaction_value']), ordinal_fecha(transaccion[COLUMNA_FECHA])
+                    agregados_empresa = agregados.setdefault(clave, AgregadosEmpresa())
+                    transaccion.update(agregados_empresa.rasgos(importe, fecha))
+                    agregados_empresa.actualizar(importe, fecha)
+                COLUMNAS_NUMERICAS = COLUMNAS_NUMERICAS + COLUMNAS_AGREGADOS
+
+            num_original = len(lista_plana_transacciones)
+            num_validos = len(registros_validos)
+
+            if num_validos == 0:
+                 print("Error: No se encontraron registros válidos con todas las columnas necesarias en el JSON.")
+                 sys.exit(1)
     
-        datos = pandas.DataFrame.from_records(registros_validos)
+            datos = pandas.DataFrame.from_records(registros_validos)
 
-        if len(datos) == 0:
-            print("Error: El DataFrame resultante está vacío.")
-            sys.exit(1)
+            if len(datos) == 0:
+                print("Error: El DataFrame resultante está vacío.")
+                sys.exit(1)
 
-    except FileNotFoundError:
-        print(f"Error: No encontré tu JSON en '{ruta_json}'.")
-        sys.exit(1)
-    except json.JSONDecodeError:
-        print("Error: Tu JSON está corrupto.")
-        sys.exit(1)
-    except Exception as e:
-        print(f"Error inesperado al leer y convertir el JSON: {e}")
-        sys.exit(1)
+        except FileNotFoundError:
+            print(f"Error: No encontré tu JSON en '{ruta_json}'.")
+            sys.exit(1)
+        except json.JSONDecodeError:
+            print("Error: Tu JSON está corrupto.")
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error inesperado al leer y convertir el JSON: {e}")
+            sys.exit(1)
 
-    # --- 4. Preparación y Preprocesamiento Avanzado ---
-    if columna_objetivo not in datos.columns:
-        print(f"Error: La columna objetivo '{columna_objetivo}' no se encontró.")
-        sys.exit(1)
+        # --- 4. Preparación y Preprocesamiento Avanzado ---
+        if columna_objetivo not in datos.columns:
+            print(f"Error: La columna objetivo '{columna_objetivo}' no se encontró.")
+            sys.exit(1)
 
-    try:
-        y = datos[columna_objetivo].astype(int)
-        X = datos.drop(columns = [columna_objetivo, 'transaction_code'], errors = 'ignore')
-    except Exception as e:
-        print(f"Error al separar X e y: {e}")
-        sys.exit(1)
+        try:
+            y = datos[columna_objetivo].astype(int)
+            X = datos.drop(columns = [columna_objetivo, 'transaction_code'], errors = 'ignore')
+        except Exception as e:
+            print(f"Error al separar X e y: {e}")
+            sys.exit(1)
 
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('date', FunctionTransformer(
-                transformar_fecha_a_timestamp_simple, 
-                validate=False,
-                feature_names_out='one-to-one'
-            ), [COLUMNA_FECHA]),
-            ('num', StandardScaler(), COLUMNAS_NUMERICAS),
-            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), COLUMNAS_CATEGORICAS),
-            ('bool', 'passthrough', COLUMNAS_BOOLEANAS)
-        ],
-        remainder='drop'
-    )
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('date', FunctionTransformer(
+                    transformar_fecha_a_timestamp_simple, 
+                    validate=False,
+                    feature_names_out='one-to-one'
+                ), [COLUMNA_FECHA]),
+                ('num', StandardScaler(), COLUMNAS_NUMERICAS),
+                ('cat', codificador_categoricas(CODIFICACION_CATEGORICAS, N_FEATURES_HASH), COLUMNAS_CATEGORICAS),
+                ('bool', 'passthrough', COLUMNAS_BOOLEANAS)
+            ],
+            remainder='drop',
+            # Con hashing la matriz se queda dispersa (CSR) hasta model.fit
+            sparse_threshold=1.0 if USAR_HASHING else 0.3
+        )
 
-    try:
-        X_processed = preprocessor.fit_transform(X)
+        try:
+            X_processed = preprocessor.fit_transform(X)
 
-        X_train = X_processed.astype(float)
-        y_train = y.values
+            X_train = X_processed.astype(float)
+            y_train = y.values
 
-        feature_names_out = preprocessor.get_feature_names_out()
-    except Exception as e:
-        print(f"Fallé durante el preprocesamiento: {e}")
-        traceback.print_exc()
-        sys.exit(1)
+            feature_names_out = preprocessor.get_feature_names_out()
+        except Exception as e:
+            print(f"Fallé durante el preprocesamiento: {e}")
+            traceback.print_exc()
+            sys.exit(1)
 
-    if X_train.size == 0:
-         print("Error fatal: No hay características (features) después del preprocesamiento.")
-         sys.exit(1)
-    if X_train.shape[0] != y_train.shape[0]:
-         print(f"Error fatal: Desajuste en número de muestras -> X:{X_train.shape[0]}, y:{y_train.shape[0]}")
-         sys.exit(1)
+        if X_train.size == 0:
+             print("Error fatal: No hay características (features) después del preprocesamiento.")
+             sys.exit(1)
+        if X_train.shape[0] != y_train.shape[0]:
+             print(f"Error fatal: Desajuste en número de muestras -> X:{X_train.shape[0]}, y:{y_train.shape[0]}")
+             sys.exit(1)
 
     # --- 5. Definir la Arquitectura del Modelo ---
     tasa_aprendizaje = 0.001
     epocas = 100
-    num_features = X_train.shape[1]
+    if not MODO_STREAMING:
+        num_features = X_train.shape[1]
 
     model = tensorflow.keras.models.Sequential([
         tensorflow.keras.layers.Input(shape = (num_features,)),
@@ -157,18 +433,31 @@ if __name__ == "__main__":
         restore_best_weights = True
     )
 
-    history = model.fit(
-        X_train,
-        y_train,
-        epochs = epocas,
-        callbacks = [early_stopping],
-        validation_split = 0.2,
-        verbose = 0
-    )
+    if MODO_STREAMING:
+        history = model.fit(
+            datos_entrenamiento,
+            epochs = epocas,
+            callbacks = [early_stopping],
+            validation_data = datos_validacion,
+            verbose = 0
+        )
+    else:
+        history = model.fit(
+            X_train,
+            y_train,
+            epochs = epocas,
+            callbacks = [early_stopping],
+            validation_split = 0.2,
+            verbose = 0
+        )
 
     # --- 8. Guardar la 'Inteligencia' Mejorada ---
+    # Se escribe a un temporal y se sustituye con os.replace para que la API
+    # (que recarga en caliente por mtime) nunca lea un .h5 a medio escribir
     try:
-        model.save_weights(NOMBRE_ARCHIVO_MODELO)
+        ruta_temporal_modelo = NOMBRE_ARCHIVO_MODELO[:-len('.weights.h5')] + '.tmp.weights.h5'
+        model.save_weights(ruta_temporal_modelo)
+        os.replace(ruta_temporal_modelo, NOMBRE_ARCHIVO_MODELO)
     except Exception as e:
         print(f"Error al guardar el modelo: {e}")
         if modelo_dir and not os.path.exists(modelo_dir):
@@ -182,6 +471,7 @@ if __name__ == "__main__":
         os.makedirs(modelo_dir, exist_ok=True)
 
     try:
-        joblib.dump(preprocessor, NOMBRE_ARCHIVO_PREPROCESSOR)
+        joblib.dump(preprocessor, NOMBRE_ARCHIVO_PREPROCESSOR + '.tmp')
+        os.replace(NOMBRE_ARCHIVO_PREPROCESSOR + '.tmp', NOMBRE_ARCHIVO_PREPROCESSOR)
     except Exception as e:
         print(f"Error al guardar el preprocesador: {e}")
\ No newline at end of file
@@ -0,0 +1,181 @@
+import bisect
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Límites (segundos) de los histogramas de duración: de medio milisegundo a un minuto
+LIMITES_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escapar(valor: Any) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _formatear(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(nombre, "")) for nombre in self.etiquetas)
+
+    def _selector(self, clave: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pares = list(zip(self.etiquetas, clave)) + list(extra)
+        return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + "}" if pares else ""
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor: float = 1.0, **etiquetas) -> None:
+        if not valor:
+            return
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def valor(self, **etiquetas) -> float:
+        return self._valores.get(self._clave(etiquetas), 0.0)
+
+    def lineas(self) -> List[str]:
+        with self._lock:
+            valores = dict(self._valores) or ({(): 0.0} if not self.etiquetas else {})
+        return [f"{self.nombre}{self._selector(clave)} {_formatear(valor)}" for clave, valor in sorted(valores.items())]
+
+    def _sumar(self, clave: Tuple[str, ...], valor: float) -> None:
+        self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (), limites: Tuple[float, ...] = LIMITES_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(limites)
+
+    def observar(self, valor: float, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        posicion = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            # [cuentas por cubo (sin acumular, el último es +Inf), suma, número de observaciones]
+            cubos, suma, cuenta = self._valores.get(clave) or ([0] * (len(self.limites) + 1), 0.0, 0)
+            cubos[posicion] += 1
+            self._valores[clave] = (cubos, suma + valor, cuenta + 1)
+
+    @contextmanager
+    def cronometrar(self, **etiquetas) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def lineas(self) -> List[str]:
+        with self._lock:
+            valores = {clave: (list(cubos), suma, cuenta) for clave, (cubos, suma, cuenta) in self._valores.items()}
+        lineas = []
+        for clave, (cubos, suma, cuenta) in sorted(valores.items()):
+            acumulado = 0
+            for limite, numero in zip(self.limites + (float("inf"),), cubos):
+                acumulado += numero
+                lineas.append(f"{self.nombre}_bucket{self._selector(clave, (('le', _formatear(limite)),))} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{self._selector(clave)} {_formatear(suma)}")
+            lineas.append(f"{self.nombre}_count{self._selector(clave)} {cuenta}")
+        return lineas
+
+    def _sumar(self, clave: Tuple[str, ...], valor) -> None:
+        cubos, suma, cuenta = self._valores.get(clave) or ([0] * (len(self.limites) + 1), 0.0, 0)
+        self._valores[clave] = ([a + b for a, b in zip(cubos, valor[0])], suma + valor[1], cuenta + valor[2])
+
+
+class RegistroMetricas:
+    """
+    Contadores e histogramas en memoria del proceso, expuestos en formato texto de Prometheus.
+    Registrar una observación es un bisect y un lock por llamada; se mide por lote/etapa, no por fila.
+    instantanea()/fusionar() permiten juntar las métricas de varios procesos (batchScoring.py).
+    """
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (),
+                   limites: Tuple[float, ...] = LIMITES_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def exposicion(self) -> str:
+        lineas = []
+        for metrica in sorted(self._metricas.values(), key=lambda m: m.nombre):
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.lineas())
+        return "\n".join(lineas) + "\n"
+
+    def escribir(self, ruta: str) -> None:
+        # Escritura atómica, para el textfile collector de node_exporter
+        with open(ruta + ".tmp", "w", encoding="utf-8") as fichero:
+            fichero.write(self.exposicion())
+        os.replace(ruta + ".tmp", ruta)
+
+    def instantanea(self, reiniciar: bool = False) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        resultado = {}
+        for nombre, metrica in self._metricas.items():
+            with metrica._lock:
+                # Copia de los cubos: observar() los modifica en sitio
+                resultado[nombre] = {clave: (list(valor[0]), valor[1], valor[2]) if isinstance(valor, tuple) else valor
+                                     for clave, valor in metrica._valores.items()}
+                if reiniciar:
+                    metrica._valores = {}
+        return resultado
+
+    def fusionar(self, instantanea: Dict[str, Dict[Tuple[str, ...], Any]]) -> None:
+        for nombre, valores in instantanea.items():
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                continue
+            with metrica._lock:
+                for clave, valor in valores.items():
+                    metrica._sumar(clave, valor)
+
+
+metricas = RegistroMetricas()
+
+# Comunes a /processing/file y al procesado offline (ai.py, batchScoring.py)
+DURACION_ETAPA = metricas.histograma(
+    "cleanpai_etapa_segundos",
+    "Duración de cada etapa de la puntuación (parseo, huellas, historial, preprocesado, prediccion, ml, llm, guardado, usuarios, alertas, commit)",
+    ("etapa",))
+PETICIONES_LLM = metricas.histograma(
+    "cleanpai_llm_peticion_segundos", "Ida y vuelta de cada petición a Ollama por resultado (ok, error, ilegible, prefijo)", ("resultado",))
+FILAS_PUNTUADAS = metricas.contador("cleanpai_filas_puntuadas_total", "Transacciones puntuadas por ML + LLM")
+LLM_FALLBACK = metricas.contador(
+    "cleanpai_llm_fallback_total", "Transacciones puntuadas solo con ML porque el LLM no respondió a tiempo")
+ML_FALLBACK = metricas.contador(
+    "cleanpai_ml_fallback_total", "Transacciones con riesgo ML por defecto (0.5) porque el modelo falló o faltaban columnas")
+ALERTAS_CREADAS = metricas.contador("cleanpai_alertas_creadas_total", "Alertas enviadas a guardar")
+ACIERTOS_CACHE = metricas.contador(
+    "cleanpai_cache_aciertos_total", "Aciertos por caché (llm, prefijo, umbrales, ya_puntuadas)", ("cache",))
+FALLOS_CACHE = metricas.contador(
+    "cleanpai_cache_fallos_total", "Fallos por caché (llm, prefijo, umbrales, ya_puntuadas)", ("cache",))
+ERRORES = metricas.contador("cleanpai_errores_total", "Errores capturados por componente", ("componente",))
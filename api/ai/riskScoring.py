@@ -0,0 +1,71 @@
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .featureStore import senales_para_llm
+    from .largeLanguageModel.queryLargeLanguageModel import queryLargeLanguageModelBatch
+    from .metrics import DURACION_ETAPA, ERRORES, FILAS_PUNTUADAS, LLM_FALLBACK, ML_FALLBACK
+except ImportError:  # importado como módulo suelto desde ai/ai.py
+    from featureStore import senales_para_llm
+    from largeLanguageModel.queryLargeLanguageModel import queryLargeLanguageModelBatch
+    from metrics import DURACION_ETAPA, ERRORES, FILAS_PUNTUADAS, LLM_FALLBACK, ML_FALLBACK
+
+
+def _query_ml_batch():
+    # Import diferido: pandas/sklearn/h5py solo se cargan cuando de verdad hay que puntuar
+    try:
+        from .machineLearning.queryMachineLearning import queryMachineLearningBatch
+    except ImportError:
+        from machineLearning.queryMachineLearning import queryMachineLearningBatch
+    return queryMachineLearningBatch
+
+
+def combinar_riesgos(riesgo_llm: Optional[float], riesgo_ml: float) -> Tuple[float, bool]:
+    """
+    Score final y si es solo ML (el LLM no respondió dentro de su presupuesto).
+    """
+    if riesgo_llm is None:
+        return round(float(riesgo_ml), 3), True
+    return round((riesgo_llm + float(riesgo_ml)) / 2, 3), False
+
+
+def puntuar_lote(lista_tx_data: List[Dict[str, Any]], historiales: List[Dict[str, Any]],
+                 rasgos: List[Dict[str, Any]], tiempos: Optional[Dict[str, float]] = None,
+                 limite: Optional[float] = None) -> List[Tuple[float, bool]]:
+    """
+    Puntuación común de la API (/processing/file) y del procesado offline (ai.py, batchScoring.py):
+    ML vectorizado con los rasgos agregados + LLM concurrente con las señales del historial.
+    Si se pasa 'tiempos', acumula ahí los segundos de cada etapa ('ml', 'llm'); además
+    quedan siempre en las métricas del proceso (ai/metrics.py).
+    'limite' (time.monotonic()) es el plazo LLM de toda la subida cuando se puntúa en varias
+    llamadas (un trozo cada una); por defecto LLM_BATCH_DEADLINE_SECONDS desde esta llamada.
+    """
+    lista_tx_ml = [{**tx_data, **r} for tx_data, r in zip(lista_tx_data, rasgos)]
+    lista_tx_llm = [{**tx_data, 'senales_historial': senales_para_llm(r)} for tx_data, r in zip(lista_tx_data, rasgos)]
+
+    # ML: una sola pasada vectorizada para todo el lote
+    inicio = time.perf_counter()
+    try:
+        riesgos_ml = _query_ml_batch()(lista_tx_ml)
+    except Exception as e:
+        print(f"Error durante la predicción ML: {e}")
+        ERRORES.inc(componente="ml")
+        ML_FALLBACK.inc(len(lista_tx_ml))
+        riesgos_ml = [0.5] * len(lista_tx_ml)
+    medio = time.perf_counter()
+
+    # LLM: peticiones concurrentes (LLM_MAX_CONCURRENCY), resultados en el orden original.
+    # None = el LLM agotó su plazo/reintentos -> la transacción se puntúa solo con ML
+    riesgos_llm = queryLargeLanguageModelBatch(lista_tx_llm, historiales, limite_lote=limite)
+    fin = time.perf_counter()
+
+    DURACION_ETAPA.observar(medio - inicio, etapa="ml")
+    DURACION_ETAPA.observar(fin - medio, etapa="llm")
+    FILAS_PUNTUADAS.inc(len(lista_tx_data))
+    LLM_FALLBACK.inc(sum(riesgo is None for riesgo in riesgos_llm))
+    if tiempos is not None:
+        tiempos['ml'] = tiempos.get('ml', 0.0) + medio - inicio
+        tiempos['llm'] = tiempos.get('llm', 0.0) + fin - medio
+
+    return [combinar_riesgos(riesgo_llm, riesgo_ml) for riesgo_llm, riesgo_ml in zip(riesgos_llm, riesgos_ml)]
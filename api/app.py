@@ -1,18 +1,63 @@
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import List, Dict, Any
-from flask import Flask, request, jsonify
+from typing import List, Dict, Any, Optional
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS # habilitar CORS para que no haya problemas al incorporar la API local desde un front-end
-from sqlalchemy import Enum as SAEnum
+from sqlalchemy import Enum as SAEnum, event, func, insert, inspect as sa_inspect, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from pathlib import Path
-from ai.largeLanguageModel.queryLargeLanguageModel import queryLargeLanguageModel
-from ai.machineLearning.queryMachineLearning import queryMachineLearning
+from ai.largeLanguageModel.queryLargeLanguageModel import LLM_BATCH_DEADLINE_SECONDS, cache_prefijos
+from ai.largeLanguageModel.llmCache import cache_riesgo_llm
+from ai.historyStore import obtener_almacen_historial
+from ai.riskScoring import puntuar_lote
+from ai.metrics import ACIERTOS_CACHE, ALERTAS_CREADAS, DURACION_ETAPA, ERRORES, FALLOS_CACHE, metricas
 import json
 import os
+import hashlib
+import itertools
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
 DB_PATH = os.getenv("DB_PATH", "data.db")
 MODEL_CACHE = os.getenv("MODEL_CACHE", "/models")
 BASE_DIR = Path(__file__).resolve().parent  # carpeta donde está app.py
+# Cuándo se importa el backend de scoring (pandas/sklearn/h5py o TF) y se cargan los artefactos:
+# - background: en un hilo al arrancar; /users y /alerts sirven desde el primer momento
+# - eager: bloquea el arranque hasta tener los modelos (comportamiento antiguo)
+# - lazy: en la primera petición que puntúe
+ML_WARMUP = os.getenv("ML_WARMUP", "background")
+# 1 cuando sirve gunicorn con preload (gunicorn.conf.py): el proceso padre solo carga modelos
+# y no arranca el hilo de calentamiento; cada worker lo arranca tras el fork (preparar_worker)
+SERVIDOR_PREFORK = os.getenv("SERVIDOR_PREFORK", "0") == "1"
+# PRAGMAs de SQLite aplicados a cada conexión a la BD de la API. Vacío = valor por defecto de SQLite
+# - WAL: las lecturas (/alerts) no esperan a las escrituras de /processing/file
+# - synchronous NORMAL: con WAL no pierde consistencia, solo las últimas transacciones si cae el SO
+# - cache_size negativo = KiB (64 MiB); mmap_size en bytes (256 MiB)
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", "268435456"),
+}
+# Página de /alerts: por defecto y máximo que se puede pedir con ?limit=
+ALERTS_DEFAULT_LIMIT = int(os.getenv("ALERTS_DEFAULT_LIMIT", "500"))  # 0 = sin límite si no se pide ?limit=
+ALERTS_MAX_LIMIT = int(os.getenv("ALERTS_MAX_LIMIT", "5000"))
+# Transacciones por trozo al ingerir NDJSON en /processing/file (cada trozo se puntúa y se confirma)
+PROCESSING_CHUNK_SIZE = int(os.getenv("PROCESSING_CHUNK_SIZE", "1000"))
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+# Cola de trabajos de /processing/file:
+# - PROCESSING_ASYNC=1: por defecto se encola y se responde 202 con job_id (también con ?async=1
+#   o la cabecera "Prefer: respond-async"); si no, se puntúa dentro de la petición como siempre
+# - JOB_WORKERS hilos puntúan trabajos; un trabajo "en_curso" sin latido en JOB_LEASE_SECONDS
+#   (proceso caído) lo retoma otro trabajador desde el último trozo confirmado
+PROCESSING_ASYNC = os.getenv("PROCESSING_ASYNC", "0") == "1"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Segundos que vale una entrada de la caché IBAN -> umbral (se invalida también al cambiar usuarios)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
 
 
 app = Flask(__name__)
@@ -20,9 +65,21 @@ CORS(app)  # Habilitar CORS para todas las rutas
 # elegir ruta de BD: primero DB_PATH (Docker), si no, tu zombis.db local
 db_path = os.getenv("DB_PATH") or str((BASE_DIR / "zombis.db"))
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+# Copia NDJSON de la entrada de cada trabajo encolado (se borra al terminar)
+JOBS_SPOOL_DIR = os.getenv("JOBS_SPOOL_DIR") or os.path.join(os.path.dirname(os.path.abspath(db_path)), "jobs_spool")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 db = SQLAlchemy(app)
 
+def _aplicar_pragmas(conexion_dbapi, _registro):
+    cursor = conexion_dbapi.cursor()
+    for pragma, valor in SQLITE_PRAGMAS.items():
+        if valor:
+            cursor.execute(f"PRAGMA {pragma}={valor}")
+    cursor.close()
+
+with app.app_context():
+    event.listen(db.engine, "connect", _aplicar_pragmas)
+
 # -------------------------
 # Modelos (tablas exactas)
 # -------------------------
@@ -37,12 +94,19 @@ class Usuarios(db.Model):
     id = db.Column("Id_usuario_anonim", db.String, primary_key=True)  # id_usuario anonim
     token_acceso = db.Column("Token_acceso", db.String, nullable=False)
     valido_hasta = db.Column("Valido_hasta", db.DateTime, nullable=False)
-    iban = db.Column("IBAN", db.String, nullable=False)
+    iban = db.Column("IBAN", db.String, nullable=False, index=True)
     notificaciones = db.Column("Notificaciones", db.Boolean, nullable=False, default=True)
     umbral = db.Column("Umbral", SAEnum(UmbralEnum), nullable=True)  # puede ser null
 
 class AlertasEmitidas(db.Model):
     __tablename__ = "AlertasEmitidas"
+    # Los filtros de /alerts (iban, min_score) paginan por id: rango sobre índice en vez de recorrer la tabla
+    __table_args__ = (
+        db.Index("ix_AlertasEmitidas_IBAN_id", "IBAN", "id"),
+        db.Index("ix_AlertasEmitidas_Umbral_probabilistico_id", "Umbral_probabilistico", "id"),
+        # Una alerta por transacción: reintentos y resubidas no la duplican
+        db.Index("ux_AlertasEmitidas_IBAN_Cod_Transaccion", "IBAN", "Cod_Transaccion", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     iban = db.Column("IBAN", db.String, nullable=False)
     codigo_transaccion = db.Column("Cod_Transaccion", db.String, nullable=False)
@@ -50,8 +114,99 @@ class AlertasEmitidas(db.Model):
     umbral_probabilistico = db.Column("Umbral_probabilistico", db.Float, nullable=False)
     iban_empresa_cobradora = db.Column("IBAN_Empresa_cobradora", db.String, nullable=True)
 
-with app.app_context():
-    db.create_all()
+class TransaccionesPuntuadas(db.Model):
+    """
+    Transacciones ya puntuadas con ML y LLM (superen o no el umbral), para no volver a pasar
+    por los modelos las que lleguen repetidas. Identidad: (IBAN, Cod_Transaccion). Las que se
+    quedaron en solo ML no se guardan: si vuelven a llegar se puntúan otra vez.
+    """
+    __tablename__ = "TransaccionesPuntuadas"
+    __table_args__ = (
+        db.Index("ux_TransaccionesPuntuadas_IBAN_Cod_Transaccion", "IBAN", "Cod_Transaccion", unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    iban = db.Column("IBAN", db.String, nullable=False)
+    codigo_transaccion = db.Column("Cod_Transaccion", db.String, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    puntuada_en = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class TrabajosProcesamiento(db.Model):
+    __tablename__ = "TrabajosProcesamiento"
+    id = db.Column(db.String, primary_key=True)
+    estado = db.Column(db.String, nullable=False, default="pendiente", index=True)  # pendiente|en_curso|completado|error
+    ruta_entrada = db.Column(db.String, nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    procesadas = db.Column(db.Integer, nullable=False, default=0)
+    alertas_creadas = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String, nullable=True)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    latido = db.Column(db.DateTime, nullable=True)
+
+# -------------------------
+# Arranque diferido (BD + modelos)
+# -------------------------
+
+ESTADO_ARRANQUE = {"bd": False, "modelos": False, "error_modelos": None}
+_lock_arranque = threading.Lock()
+
+def inicializar_bd():
+    """
+    Crea las tablas la primera vez que se necesitan, no al importar el módulo.
+    """
+    if ESTADO_ARRANQUE["bd"]:
+        return
+    with _lock_arranque:
+        if not ESTADO_ARRANQUE["bd"]:
+            with app.app_context():
+                db.create_all()
+                # create_all no añade índices a tablas que ya existían (BDs anteriores)
+                for tabla in db.metadata.sorted_tables:
+                    for indice in tabla.indexes:
+                        try:
+                            indice.create(db.engine, checkfirst=True)
+                        except IntegrityError:
+                            if not indice.unique:
+                                raise
+                            # Índice único sobre datos antiguos con duplicados: se quitan y se reintenta
+                            # (si vuelve a fallar, la excepción llega a quien arranca la BD)
+                            borradas = quitar_duplicados(tabla, indice)
+                            print(f"Índice {indice.name}: borradas {borradas} filas duplicadas de {tabla.name}")
+                            indice.create(db.engine, checkfirst=True)
+            ESTADO_ARRANQUE["bd"] = True
+
+def quitar_duplicados(tabla, indice) -> int:
+    """
+    Borra las filas de 'tabla' que repiten las columnas de 'indice' y deja la más antigua de
+    cada grupo (la que habría sobrevivido al INSERT OR IGNORE). Devuelve cuántas ha borrado.
+    """
+    clave = tabla.primary_key.columns.values()[0]
+    conservar = select(func.min(clave)).group_by(*indice.columns)
+    with db.engine.begin() as conexion:
+        return conexion.execute(tabla.delete().where(clave.not_in(conservar))).rowcount
+
+@app.before_request
+def _asegurar_bd():
+    inicializar_bd()
+
+def cargar_modelos():
+    """
+    Importa el backend de scoring y deja preprocesador + pesos en memoria.
+    """
+    try:
+        from ai.machineLearning.modelRegistry import registro_modelo
+        registro_modelo.obtener()
+        obtener_almacen_historial()
+        ESTADO_ARRANQUE["modelos"] = True
+        ESTADO_ARRANQUE["error_modelos"] = None
+    except Exception as e:
+        ESTADO_ARRANQUE["error_modelos"] = str(e)
+        print(f"No se pudo precargar el modelo ML (se reintentará en la primera petición): {e}")
+
+if ML_WARMUP == "eager":
+    cargar_modelos()
+elif ML_WARMUP == "background" and not SERVIDOR_PREFORK:
+    threading.Thread(target=cargar_modelos, name="ml-warmup", daemon=True).start()
 
 # -------------------------
 # Helpers y mapping
@@ -70,6 +225,135 @@ def resolve_user_threshold(user: Usuarios) -> float:
     effective = (user.umbral.value if isinstance(user.umbral, UmbralEnum) else user.umbral) or "medio"
     return UMBRAL_SCORE[effective]
 
+# Máximo de parámetros por IN (SQLite antiguo limita a 999 variables por sentencia)
+TAMANO_LOTE_IN = 500
+
+class CacheUmbrales:
+    """
+    IBAN -> umbral efectivo del usuario, o None si no hay usuario o tiene las notificaciones
+    apagadas. Los IBAN que faltan se resuelven de una vez con un IN sobre Usuarios.IBAN (indexada).
+    Se vacía al dar de alta/baja o reconfigurar usuarios; el TTL cubre cambios hechos
+    desde otro proceso.
+    """
+
+    def __init__(self, ttl_segundos: float = USER_CACHE_TTL_SECONDS):
+        self.ttl_segundos = ttl_segundos
+        self._datos: Dict[str, Any] = {}
+        self._generacion = 0
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        with self._lock:
+            self._datos.clear()
+            self._generacion += 1
+
+    def resolver(self, ibans) -> Dict[str, Any]:
+        ahora = time.monotonic()
+        resultado = {}
+        pendientes = []
+        with self._lock:
+            generacion = self._generacion
+            for iban in set(ibans):
+                entrada = self._datos.get(iban)
+                if entrada is not None and ahora - entrada[1] < self.ttl_segundos:
+                    resultado[iban] = entrada[0]
+                else:
+                    pendientes.append(iban)
+        ACIERTOS_CACHE.inc(len(resultado), cache="umbrales")
+        FALLOS_CACHE.inc(len(pendientes), cache="umbrales")
+
+        if pendientes:
+            encontrados = {}
+            for inicio in range(0, len(pendientes), TAMANO_LOTE_IN):
+                usuarios = Usuarios.query.filter(Usuarios.iban.in_(pendientes[inicio:inicio + TAMANO_LOTE_IN])).all()
+                for user in usuarios:
+                    # Mismo criterio que el antiguo filter_by(iban=...).first(): el primero que aparece
+                    encontrados.setdefault(user.iban, resolve_user_threshold(user) if user.notificaciones else None)
+            with self._lock:
+                # Si alguien invalidó mientras leíamos, no guardamos datos posiblemente viejos
+                guardar = generacion == self._generacion
+                for iban in pendientes:
+                    resultado[iban] = encontrados.get(iban)
+                    if guardar:
+                        self._datos[iban] = (resultado[iban], ahora)
+        return resultado
+
+cache_umbrales = CacheUmbrales()
+
+# Atributo ORM -> columna de AlertasEmitidas ("iban" -> "IBAN"...), para el INSERT Core de guardar_alertas
+COLUMNAS_ALERTA = {atributo.key: atributo.columns[0].key for atributo in sa_inspect(AlertasEmitidas).column_attrs}
+
+def guardar_alertas(filas: List[Dict[str, Any]]) -> int:
+    """
+    Inserta las alertas en bloque (un único INSERT executemany) dentro de la transacción
+    en curso, sin crear un objeto ORM por fila. El commit lo hace quien llama.
+    Las que ya existían (mismo IBAN y código) se ignoran. Devuelve las insertadas de verdad.
+    """
+    if not filas:
+        return 0
+    # INSERT Core sobre la tabla (el bulk del ORM no da rowcount); OR IGNORE no cuenta las repetidas
+    resultado = db.session.execute(
+        insert(AlertasEmitidas.__table__).prefix_with("OR IGNORE"),
+        [{COLUMNAS_ALERTA[clave]: valor for clave, valor in fila.items()} for fila in filas],
+    )
+    return max(resultado.rowcount, 0)
+
+# Campos de la transacción de entrada que forman su huella cuando no trae codigo_transaccion
+CAMPOS_HUELLA_TX = ("IBAN", "empresa_cobradora_norm", "producto_map", "valor", "fecha",
+                    "recurrente", "primer_gasto_con_empresa")
+
+def huella_transaccion(t: Dict[str, Any]) -> str:
+    """
+    Huella de contenido estable entre procesos y ejecuciones (a diferencia de hash()).
+    """
+    canonica = {campo: t.get(campo) for campo in CAMPOS_HUELLA_TX}
+    try:
+        canonica["valor"] = f"{float(canonica['valor'] or 0):.2f}"
+    except (TypeError, ValueError):
+        pass
+    return hashlib.sha256(json.dumps(canonica, sort_keys=True, default=str).encode()).hexdigest()
+
+def asignar_codigos(txs: List[Dict[str, Any]], vistas: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    Copia de las transacciones con codigo_transaccion siempre relleno: el que traigan o
+    TX-<huella>. Filas idénticas dentro de un mismo fichero se numeran (#2, #3...) en orden,
+    así el mismo fichero produce siempre los mismos códigos. Si el fichero se procesa por
+    trozos, se pasa el mismo 'vistas' a todos para que la numeración siga entre trozos.
+    """
+    if vistas is None:
+        vistas = {}
+    salida = []
+    for t in txs:
+        codigo = t.get("codigo_transaccion")
+        if not codigo:
+            codigo = f"TX-{huella_transaccion(t)[:24]}"
+            vistas[codigo] = vistas.get(codigo, 0) + 1
+            if vistas[codigo] > 1:
+                codigo = f"{codigo}#{vistas[codigo]}"
+        salida.append({**t, "codigo_transaccion": codigo})
+    return salida
+
+def filtrar_ya_puntuadas(txs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Quita las transacciones cuya identidad (IBAN, codigo) ya está en TransaccionesPuntuadas
+    (un IN por cada TAMANO_LOTE_IN sobre el índice único) o repetida en el propio lote.
+    """
+    identidades = list({(t.get("IBAN") or "", t["codigo_transaccion"]) for t in txs})
+    existentes = set()
+    columnas = tuple_(TransaccionesPuntuadas.iban, TransaccionesPuntuadas.codigo_transaccion)
+    for inicio in range(0, len(identidades), TAMANO_LOTE_IN):
+        existentes.update(
+            tuple(fila) for fila in db.session.query(TransaccionesPuntuadas.iban, TransaccionesPuntuadas.codigo_transaccion)
+            .filter(columnas.in_(identidades[inicio:inicio + TAMANO_LOTE_IN]))
+        )
+    nuevas = []
+    for t in txs:
+        identidad = (t.get("IBAN") or "", t["codigo_transaccion"])  # como se guarda en TransaccionesPuntuadas
+        if identidad not in existentes:
+            existentes.add(identidad)
+            nuevas.append(t)
+    return nuevas
+
 # ===========================================
 # ============ CONTRATOS API =================
 # ===========================================
@@ -127,6 +411,7 @@ def alta_cliente():
         user.umbral = umbral_value
 
     db.session.commit()
+    cache_umbrales.invalidar()
     return jsonify({
         "id_usuario": user.id,
         "iban": user.iban,
@@ -147,6 +432,7 @@ def baja_cliente(user_id: str):
     user.notificaciones = False
     user.valido_hasta = datetime.utcnow()  # expiramos el token ya TO-DO en un futuro deberemos de expirar el token de forma realista
     db.session.commit()
+    cache_umbrales.invalidar()
 
     return jsonify({"status": "ok", "id_usuario": user.id, "notificaciones": user.notificaciones, "valido_hasta": user.valido_hasta.isoformat()})
 
@@ -181,6 +467,7 @@ def config_cliente(user_id: str):
         user.umbral = UmbralEnum(umbral)
 
     db.session.commit()
+    cache_umbrales.invalidar()
     return jsonify({
         "id_usuario": user.id,
         "notificaciones": user.notificaciones,
@@ -190,30 +477,22 @@ def config_cliente(user_id: str):
 
 
 # 4) SUBIDA DE ARCHIVO PROCESAMIENTO
-@app.route("/processing/file", methods=["POST"])
-def processing_file():
+def puntuar_y_guardar_alertas(txs: List[Dict[str, Any]], vistas: Optional[Dict[str, int]] = None,
+                              limite_llm: Optional[float] = None) -> int:
     """
-    Espera JSON:
-    {
-      "transacciones": [
-        {
-          "IBAN": "string",
-          "producto_map": "string",
-          "empresa_cobradora_norm": "string",
-          "valor": float,
-          "fecha": "YYYY-MM-DD",
-          "recurrente": bool,
-          "primer_gasto_con_empresa": bool,
-          "codigo_transaccion": "opcional_string"   # opcional: si no llega, generamos uno
-        },
-        ...
-      ]
-    }
+    Puntúa un lote de transacciones y añade sus alertas a la transacción en curso (sin commit).
+    Las ya puntuadas antes (reintentos, resubidas) se saltan sin pasar por los modelos.
+    'vistas' es el contador de filas idénticas del fichero (ver asignar_codigos) y 'limite_llm'
+    el plazo LLM de todo el fichero (time.monotonic()), ambos compartidos entre sus trozos.
+    Devuelve cuántas alertas se han creado.
     """
-    body = request.get_json(force=True, silent=False)
-    txs: List[Dict[str, Any]] = body.get("transacciones") if isinstance(body, dict) else None
-    if not txs or not isinstance(txs, list):
-        return jsonify({"error": "Se requiere 'transacciones' como lista"}), 400
+    recibidas = len(txs)
+    with DURACION_ETAPA.cronometrar(etapa="huellas"):
+        txs = filtrar_ya_puntuadas(asignar_codigos(txs, vistas))
+    ACIERTOS_CACHE.inc(recibidas - len(txs), cache="ya_puntuadas")
+    FALLOS_CACHE.inc(len(txs), cache="ya_puntuadas")
+    if not txs:
+        return 0
 
     # >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>
     # ML_PIPELINE_ENTRYPOINT: AQUÍ ENLAZAMOS CON EL MÓDULO DE ML
@@ -222,41 +501,355 @@ def processing_file():
     #   forward_to_zombie_detector_ml(transacciones: List[dict]) -> List[dict]
     #
     # Debe devolver una lista con el mismo orden, cada item enriquecido con:
-    #   "score" (float entre 0 y 1), "codigo_transaccion" (string)
+    #   "score" (float entre 0 y 1), "codigo_transaccion" (string),
+    #   "solo_ml" (bool: el LLM no respondió a tiempo y el score es solo del modelo ML)
     # <<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<
 
-    enriched = forward_to_zombie_detector_ml(txs)
-
-    # Persistimos alertas que superen el umbral del usuario y que tenga notificaciones ON
-    created = 0
+    enriched = forward_to_zombie_detector_ml(txs, limite_llm)
+
+    with DURACION_ETAPA.cronometrar(etapa="guardado"):
+        # Las de solo ML no cuentan como puntuadas: si vuelven a llegar, se intenta de nuevo con el LLM
+        puntuadas = [
+            {"iban": item.get("IBAN") or "", "codigo_transaccion": item["codigo_transaccion"], "score": float(item["score"])}
+            for item in enriched if item.get("score") is not None and not item.get("solo_ml")
+        ]
+        if puntuadas:
+            db.session.execute(insert(TransaccionesPuntuadas).prefix_with("OR IGNORE"), puntuadas)
+
+    # Persistimos alertas que superen el umbral del usuario y que tenga notificaciones ON.
+    # Umbrales de todos los IBAN del lote de una vez (caché + un único IN para los que falten)
+    with DURACION_ETAPA.cronometrar(etapa="usuarios"):
+        umbrales = cache_umbrales.resolver(item.get("IBAN") for item in enriched if item.get("IBAN"))
+    alertas = []
     for item in enriched:
         iban = item.get("IBAN")
         score = item.get("score")
         importe = float(item.get("valor", 0.0))
-        cod_tx = item.get("codigo_transaccion") or f"TX-{int(datetime.utcnow().timestamp()*1000)}"
+        cod_tx = item["codigo_transaccion"]
         empresa_norm = item.get("empresa_cobradora_norm")
 
         if not iban or score is None:
             continue
 
-        user = Usuarios.query.filter_by(iban=iban).first()
-        if not user or not user.notificaciones:
+        threshold = umbrales.get(iban)
+        if threshold is None:  # sin usuario o con notificaciones OFF
             continue
 
-        threshold = resolve_user_threshold(user)
         if score >= threshold:
-            alerta = AlertasEmitidas(
-                iban=iban,
-                codigo_transaccion=cod_tx,
-                importe=importe,
-                umbral_probabilistico=float(score),
-                iban_empresa_cobradora=empresa_norm  # si no hay IBAN real, guardamos lo que venga normalizado
-            )
-            db.session.add(alerta)
-            created += 1
+            alertas.append({
+                "iban": iban,
+                "codigo_transaccion": cod_tx,
+                "importe": importe,
+                "umbral_probabilistico": float(score),
+                "iban_empresa_cobradora": empresa_norm,  # si no hay IBAN real, guardamos lo que venga normalizado
+            })
+
+    with DURACION_ETAPA.cronometrar(etapa="alertas"):
+        creadas = guardar_alertas(alertas)
+    ALERTAS_CREADAS.inc(creadas)
+    return creadas
+
+def procesar_lote(txs: List[Dict[str, Any]], vistas: Optional[Dict[str, int]] = None,
+                  limite_llm: Optional[float] = None) -> int:
+    """
+    Puntúa un lote, persiste sus alertas y hace commit. Devuelve cuántas alertas se han creado.
+    """
+    created = puntuar_y_guardar_alertas(txs, vistas, limite_llm)
+    with DURACION_ETAPA.cronometrar(etapa="commit"):
+        db.session.commit()
+    return created
+
+class LineaNDJSONInvalida(ValueError):
+    def __init__(self, numero: int):
+        super().__init__(f"La línea {numero} no es un objeto JSON")
+
+def leer_ndjson(lineas):
+    """
+    Genera las transacciones de un NDJSON (una por línea, se ignoran las vacías).
+    Lanza LineaNDJSONInvalida en la primera línea que no sea un objeto JSON.
+    """
+    for numero, linea in enumerate(lineas, 1):
+        if not linea.strip():
+            continue
+        try:
+            tx = json.loads(linea)
+        except ValueError:
+            tx = None
+        if not isinstance(tx, dict):
+            raise LineaNDJSONInvalida(numero)
+        yield tx
+
+def en_trozos(transacciones, tamano: int = PROCESSING_CHUNK_SIZE):
+    """
+    Agrupa en listas de 'tamano'. El tiempo de llenar cada trozo (leer y parsear las líneas)
+    cuenta como etapa "parseo".
+    """
+    trozo: List[Dict[str, Any]] = []
+    inicio = time.perf_counter()
+    for tx in transacciones:
+        trozo.append(tx)
+        if len(trozo) >= tamano:
+            DURACION_ETAPA.observar(time.perf_counter() - inicio, etapa="parseo")
+            yield trozo
+            trozo = []
+            inicio = time.perf_counter()
+    if trozo:
+        DURACION_ETAPA.observar(time.perf_counter() - inicio, etapa="parseo")
+        yield trozo
+
+def procesar_ndjson(lineas) -> tuple:
+    """
+    Lee una transacción por línea y procesa en trozos de PROCESSING_CHUNK_SIZE, con commit
+    por trozo: la memoria depende del tamaño del trozo, no del fichero (salvo el contador
+    de filas idénticas, una entrada por huella distinta). El plazo LLM_BATCH_DEADLINE_SECONDS
+    es para todo el fichero: agotado, los trozos restantes se puntúan solo con ML (y caché LLM).
+    Devuelve (respuesta, código HTTP) con los contadores acumulados.
+    """
+    procesadas = 0
+    alertas_creadas = 0
+    vistas: Dict[str, int] = {}
+    limite_llm = time.monotonic() + LLM_BATCH_DEADLINE_SECONDS
+    try:
+        for trozo in en_trozos(leer_ndjson(lineas)):
+            alertas_creadas += procesar_lote(trozo, vistas, limite_llm)
+            procesadas += len(trozo)
+    except LineaNDJSONInvalida as e:
+        # Los trozos anteriores ya están guardados: se informa de hasta dónde se llegó
+        return {"error": str(e), "procesadas": procesadas, "alertas_creadas": alertas_creadas}, 400
+    if not procesadas:
+        return {"error": "El fichero NDJSON no contiene transacciones"}, 400
+    return {"procesadas": procesadas, "alertas_creadas": alertas_creadas}, 202
+
+@app.route("/processing/file", methods=["POST"])
+def processing_file():
+    """
+    Espera JSON:
+    {
+      "transacciones": [
+        {
+          "IBAN": "string",
+          "producto_map": "string",
+          "empresa_cobradora_norm": "string",
+          "valor": float,
+          "fecha": "YYYY-MM-DD",
+          "recurrente": bool,
+          "primer_gasto_con_empresa": bool,
+          "codigo_transaccion": "opcional_string"   # opcional: si no llega, se usa la huella del contenido
+        },
+        ...
+      ]
+    }
+    o, con Content-Type application/x-ndjson, una de esas transacciones por línea
+    (se procesa en streaming, por trozos, sin cargar el fichero entero).
+
+    En modo asíncrono (PROCESSING_ASYNC=1, ?async=1 o "Prefer: respond-async") solo se
+    encola: 202 con {"job_id", "estado", "total", "url"} y el avance en GET /processing/jobs/<id>.
+    """
+    ndjson = request.mimetype in TIPOS_NDJSON
+    asincrono = request.args.get("async", "1" if PROCESSING_ASYNC or "respond-async" in request.headers.get("Prefer", "") else "0")
+    asincrono = asincrono.lower() in ("1", "true")
 
+    if ndjson and not asincrono:
+        respuesta, codigo = procesar_ndjson(request.stream)
+        return jsonify(respuesta), codigo
+
+    if ndjson:
+        txs = leer_ndjson(request.stream)
+    else:
+        with DURACION_ETAPA.cronometrar(etapa="parseo"):
+            body = request.get_json(force=True, silent=False)
+        txs = body.get("transacciones") if isinstance(body, dict) else None
+        if not txs or not isinstance(txs, list):
+            return jsonify({"error": "Se requiere 'transacciones' como lista"}), 400
+
+    if not asincrono:
+        created = procesar_lote(txs)
+        return jsonify({"procesadas": len(txs), "alertas_creadas": created}), 202
+
+    try:
+        trabajo = encolar_trabajo(txs)
+    except LineaNDJSONInvalida as e:
+        return jsonify({"error": str(e)}), 400
+    if trabajo is None:
+        return jsonify({"error": "El fichero NDJSON no contiene transacciones"}), 400
+    url = f"/processing/jobs/{trabajo.id}"
+    return jsonify({"job_id": trabajo.id, "estado": trabajo.estado, "total": trabajo.total, "url": url}), 202, {"Location": url}
+
+# 4b) TRABAJOS DE PROCESAMIENTO (cola duradera en la BD)
+_aviso_trabajos = threading.Event()
+_parar_trabajos = threading.Event()
+_trabajadores_pid = None
+_hilos_trabajadores: List[threading.Thread] = []
+
+def encolar_trabajo(transacciones) -> "TrabajosProcesamiento":
+    """
+    Copia las transacciones a un NDJSON en JOBS_SPOOL_DIR y crea el trabajo "pendiente".
+    Devuelve None si no había ninguna transacción.
+    """
+    os.makedirs(JOBS_SPOOL_DIR, exist_ok=True)
+    trabajo_id = uuid.uuid4().hex
+    ruta = os.path.join(JOBS_SPOOL_DIR, f"{trabajo_id}.ndjson")
+    total = 0
+    try:
+        with open(ruta, "w", encoding="utf-8") as fichero:
+            for tx in transacciones:
+                fichero.write(json.dumps(tx, ensure_ascii=False) + "\n")
+                total += 1
+    except BaseException:
+        os.remove(ruta)
+        raise
+    if not total:
+        os.remove(ruta)
+        return None
+
+    trabajo = TrabajosProcesamiento(id=trabajo_id, estado="pendiente", ruta_entrada=ruta, total=total)
+    db.session.add(trabajo)
     db.session.commit()
-    return jsonify({"procesadas": len(enriched), "alertas_creadas": created}), 202
+    # Con flask run (o cualquier servidor que no pase por preparar_worker) los hilos nacen aquí
+    iniciar_trabajadores()
+    _aviso_trabajos.set()
+    return trabajo
+
+def _reclamar_trabajo():
+    """
+    Marca como "en_curso" el trabajo pendiente más antiguo (o uno cuyo dueño dejó de dar latido).
+    El UPDATE condicional hace que solo un trabajador, de este u otro proceso, se lo quede.
+    """
+    T = TrabajosProcesamiento
+    while True:
+        ahora = datetime.utcnow()
+        disponible = db.or_(T.estado == "pendiente",
+                            db.and_(T.estado == "en_curso", T.latido < ahora - timedelta(seconds=JOB_LEASE_SECONDS)))
+        candidato = db.session.query(T.id).filter(disponible).order_by(T.creado).first()
+        if candidato is None:
+            db.session.commit()
+            return None
+        reclamados = T.query.filter(T.id == candidato.id, disponible).update(
+            {"estado": "en_curso", "latido": ahora, "actualizado": ahora}, synchronize_session=False)
+        db.session.commit()
+        if reclamados == 1:
+            return db.session.get(T, candidato.id)
+
+def _ejecutar_trabajo(trabajo: "TrabajosProcesamiento"):
+    """
+    Procesa el NDJSON del trabajo por trozos. Alertas y avance de cada trozo van en el mismo
+    commit, así que al retomar se salta exactamente lo ya confirmado. Si el proceso se está
+    parando (detener_trabajadores), lo devuelve a "pendiente" tras el trozo en curso. Un trabajo
+    en "error" no se reintenta: su NDJSON se borra igual que al completarse.
+    El plazo LLM_BATCH_DEADLINE_SECONDS cuenta desde que este trabajador lo reclama.
+    """
+    limite_llm = time.monotonic() + LLM_BATCH_DEADLINE_SECONDS
+    try:
+        with open(trabajo.ruta_entrada, "r", encoding="utf-8") as fichero:
+            transacciones = leer_ndjson(fichero)
+            # Al retomar, lo ya confirmado solo se recorre para seguir la numeración de filas idénticas
+            vistas: Dict[str, int] = {}
+            for trozo in en_trozos(itertools.islice(transacciones, trabajo.procesadas)):
+                asignar_codigos(trozo, vistas)
+            for trozo in en_trozos(transacciones):
+                creadas = puntuar_y_guardar_alertas(trozo, vistas, limite_llm)
+                trabajo.procesadas += len(trozo)
+                trabajo.alertas_creadas += creadas
+                trabajo.latido = trabajo.actualizado = datetime.utcnow()
+                parar = _parar_trabajos.is_set()
+                if parar:
+                    trabajo.estado = "pendiente"
+                with DURACION_ETAPA.cronometrar(etapa="commit"):
+                    db.session.commit()
+                if parar:
+                    return
+        trabajo.estado = "completado"
+        trabajo.actualizado = datetime.utcnow()
+        db.session.commit()
+        os.remove(trabajo.ruta_entrada)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error en el trabajo {trabajo.id}: {e}")
+        ERRORES.inc(componente="trabajo")
+        trabajo.estado = "error"
+        trabajo.error = str(e)
+        trabajo.actualizado = datetime.utcnow()
+        db.session.commit()
+        try:
+            os.remove(trabajo.ruta_entrada)
+        except OSError:
+            pass  # p.ej. el propio error era que el fichero ya no estaba
+
+def _trabajador():
+    inicializar_bd()
+    while not _parar_trabajos.is_set():
+        try:
+            with app.app_context():
+                trabajo = _reclamar_trabajo()
+                if trabajo is not None:
+                    _ejecutar_trabajo(trabajo)
+                    continue
+        except Exception as e:
+            print(f"Error en el trabajador de la cola: {e}")
+            ERRORES.inc(componente="cola")
+        _aviso_trabajos.wait(JOB_POLL_SECONDS)
+        _aviso_trabajos.clear()
+
+def iniciar_trabajadores(num_trabajadores: int = JOB_WORKERS):
+    """
+    Arranca los hilos que consumen la cola (una vez por proceso). Al arrancar retoman
+    los trabajos pendientes o abandonados que hubiera en la BD. No se llama al importar:
+    lo hacen python app.py, gunicorn (preparar_worker) y, con cualquier otro servidor,
+    el primer encolado o consulta de un trabajo.
+    """
+    global _trabajadores_pid
+    if num_trabajadores <= 0 or _trabajadores_pid == os.getpid():
+        return
+    _trabajadores_pid = os.getpid()
+    _parar_trabajos.clear()
+    _hilos_trabajadores.clear()
+    for numero in range(num_trabajadores):
+        hilo = threading.Thread(target=_trabajador, name=f"job-worker-{numero}", daemon=True)
+        hilo.start()
+        _hilos_trabajadores.append(hilo)
+
+def detener_trabajadores(espera_segundos: float) -> None:
+    """
+    Pide a los hilos de la cola que terminen el trozo en curso y dejen su trabajo "pendiente"
+    para otro proceso; espera como mucho 'espera_segundos' en total. Lo que no acabe a tiempo
+    lo retoma otro trabajador cuando venza JOB_LEASE_SECONDS.
+    """
+    _parar_trabajos.set()
+    _aviso_trabajos.set()
+    limite = time.monotonic() + espera_segundos
+    for hilo in _hilos_trabajadores:
+        hilo.join(max(limite - time.monotonic(), 0))
+
+def preparar_worker():
+    """
+    Se llama en cada worker de gunicorn recién creado (post_fork en gunicorn.conf.py).
+    Las conexiones SQLite del pool heredadas del padre no se pueden usar desde otro proceso:
+    se olvidan sin cerrarlas (close=False no toca las del padre). La sesión HTTP de Ollama y la
+    caché LLM ya se recrean solas al cambiar de pid. Después se arrancan los hilos de este worker.
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if not ESTADO_ARRANQUE["modelos"] and ML_WARMUP == "background":
+        threading.Thread(target=cargar_modelos, name="ml-warmup", daemon=True).start()
+    iniciar_trabajadores()
+
+@app.route("/processing/jobs/<job_id>", methods=["GET"])
+def estado_trabajo(job_id: str):
+    iniciar_trabajadores()  # retoma lo pendiente de una ejecución anterior aunque no se encole nada
+    trabajo = db.session.get(TrabajosProcesamiento, job_id)
+    if trabajo is None:
+        return jsonify({"error": "trabajo no encontrado"}), 404
+    return jsonify({
+        "job_id": trabajo.id,
+        "estado": trabajo.estado,
+        "total": trabajo.total,
+        "procesadas": trabajo.procesadas,
+        "alertas_creadas": trabajo.alertas_creadas,
+        "progreso": round(trabajo.procesadas / trabajo.total, 4) if trabajo.total else 0.0,
+        "error": trabajo.error,
+        "creado": trabajo.creado.isoformat(),
+        "actualizado": trabajo.actualizado.isoformat(),
+    })
 
 # 5) CONSUMO DE ALERTAS
 @app.route("/alerts", methods=["GET"])
@@ -265,6 +858,12 @@ def get_alerts():
     Opcionalmente admite filtros simples por querystring:
     - iban=ES...
     - min_score=0.7
+    Paginación por cursor (keyset sobre id, de más reciente a más antigua):
+    - limit=N (por defecto ALERTS_DEFAULT_LIMIT, máximo ALERTS_MAX_LIMIT). limit=0 pide
+      todas sin paginar (se envían igualmente en streaming)
+    - cursor=<id>: devuelve alertas con id <= cursor
+    El cuerpo sigue siendo un array JSON (se envía en streaming); si hay más páginas,
+    la cabecera X-Next-Cursor trae el cursor de la siguiente (y Link rel="next" la URL).
     """
     q = AlertasEmitidas.query
     iban = request.args.get("iban")
@@ -279,36 +878,130 @@ def get_alerts():
         except Exception:
             return jsonify({"error": "min_score debe ser numérico"}), 400
 
-    rows = q.order_by(AlertasEmitidas.id.desc()).all()
-    out = []
-    for r in rows:
-        out.append({
-            "IBAN": r.iban,
-            "codigo_transaccion": r.codigo_transaccion,
-            "importe": r.importe,
-            "umbral_probabilistico": r.umbral_probabilistico,
-            "IBAN_empresa_cobradora": r.iban_empresa_cobradora,
-        })
-    return jsonify(out)
+    try:
+        limite = int(request.args.get("limit") or ALERTS_DEFAULT_LIMIT) or None
+        cursor = request.args.get("cursor")
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"error": "limit y cursor deben ser enteros"}), 400
+    if limite is not None and not 1 <= limite <= ALERTS_MAX_LIMIT:
+        return jsonify({"error": f"limit debe estar entre 1 y {ALERTS_MAX_LIMIT}"}), 400
+
+    if cursor is not None:
+        q = q.filter(AlertasEmitidas.id <= cursor)
+    q = q.order_by(AlertasEmitidas.id.desc())
+
+    # Primer id de la página siguiente (solo recorre el índice), antes de empezar a enviar
+    siguiente = None
+    if limite is not None:
+        siguiente = q.with_entities(AlertasEmitidas.id).offset(limite).limit(1).scalar()
+
+    filas = q.with_entities(
+        AlertasEmitidas.iban,
+        AlertasEmitidas.codigo_transaccion,
+        AlertasEmitidas.importe,
+        AlertasEmitidas.umbral_probabilistico,
+        AlertasEmitidas.iban_empresa_cobradora,
+    )
+    if limite is not None:
+        filas = filas.limit(limite)
+    filas = filas.yield_per(TAMANO_LOTE_IN)
+
+    def generar():
+        # Nunca se materializa la página entera: una fila del cursor -> un objeto JSON
+        yield "["
+        for indice, r in enumerate(filas):
+            yield ("," if indice else "") + json.dumps({
+                "IBAN": r.iban,
+                "codigo_transaccion": r.codigo_transaccion,
+                "importe": r.importe,
+                "umbral_probabilistico": r.umbral_probabilistico,
+                "IBAN_empresa_cobradora": r.iban_empresa_cobradora,
+            })
+        yield "]"
+
+    respuesta = Response(stream_with_context(generar()), mimetype="application/json")
+    if siguiente is not None:
+        argumentos = {**request.args.to_dict(), "limit": limite, "cursor": siguiente}
+        respuesta.headers["X-Next-Cursor"] = str(siguiente)
+        respuesta.headers["Link"] = f'<{request.base_url}?{urlencode(argumentos)}>; rel="next"'
+    return respuesta
+
+# 6) MODELO ML EN SERVICIO
+@app.route("/ml/model", methods=["GET"])
+def ml_model_info():
+    """
+    Versión y momento de carga de los artefactos ML que está sirviendo este proceso.
+    """
+    from ai.machineLearning.modelRegistry import registro_modelo
+    return jsonify(registro_modelo.info())
 
+# 7) SALUD DEL SERVICIO
+@app.route("/health/live", methods=["GET"])
+def liveness():
+    return jsonify({"status": "ok"})
 
+@app.route("/health/ready", methods=["GET"])
+def readiness():
+    """
+    200 cuando la BD está creada y los modelos están cargados; 503 mientras calientan.
+    Los endpoints CRUD no dependen de esto: sirven aunque los modelos no estén listos.
+    """
+    listo = ESTADO_ARRANQUE["bd"] and ESTADO_ARRANQUE["modelos"]
+    return jsonify({
+        "listo": listo,
+        "bd": ESTADO_ARRANQUE["bd"],
+        "modelos": ESTADO_ARRANQUE["modelos"],
+        "modo_arranque": ML_WARMUP,
+        "error_modelos": ESTADO_ARRANQUE["error_modelos"],
+    }), 200 if listo else 503
+
+# 8) CACHÉ DE RIESGOS LLM
+@app.route("/llm/cache", methods=["GET"])
+def llm_cache_stats():
+    """
+    Aciertos/fallos de la caché persistente de riesgos LLM en este proceso
+    y prefijos de cliente evaluados/reutilizados (LLM_PREFIX_REUSE).
+    """
+    estadisticas = cache_riesgo_llm.estadisticas()
+    estadisticas["prefijos"] = {
+        "evaluados": cache_prefijos.evaluaciones,
+        "reutilizados": cache_prefijos.reutilizaciones,
+    }
+    return jsonify(estadisticas)
 
-def forward_to_zombie_detector_ml(transacciones: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+# 9) MÉTRICAS
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Histogramas por etapa y contadores de este proceso en formato texto de Prometheus.
+    Con gunicorn cada worker tiene los suyos: cada raspado ve solo el worker que lo atiende.
+    """
+    return Response(metricas.exposicion(), mimetype="text/plain; version=0.0.4")
+
+
+
+def forward_to_zombie_detector_ml(transacciones: List[Dict[str, Any]], limite_llm: Optional[float] = None) -> List[Dict[str, Any]]:
     """
     Real integration with AI pipeline.
     Combines predictions from ML and LLM.
+    limite_llm: deadline (time.monotonic()) for the LLM; None = LLM_BATCH_DEADLINE_SECONDS from now.
     """
     enriched = []
+    inicio = time.perf_counter()
 
-    # Load client history (optional, if needed by LLM)
-    try:
-        with open(AI_DIR / "cliente1_total.json", "r", encoding="utf-8") as f:
-            historial_completo = json.load(f)
-    except Exception:
-        historial_completo = {"transactions": [], "user_profile": {}}
-
+    # Historial de cada cliente (por customer_id o IBAN) desde el almacén en memoria.
+    # Una vista por cliente y subida: mismo objeto para todas sus transacciones
+    almacen = obtener_almacen_historial()
+    vistas_historial: Dict[Any, Dict[str, Any]] = {}
     for t in transacciones:
-        tx_data = {
+        clave_cliente = (t.get('customer_id'), t.get('IBAN'))
+        if clave_cliente not in vistas_historial:
+            vistas_historial[clave_cliente] = almacen.historial_de(iban=t.get('IBAN'), customer_id=t.get('customer_id'))
+    historiales = [vistas_historial[(t.get('customer_id'), t.get('IBAN'))] for t in transacciones]
+
+    lista_tx_data = [
+        {
             'transaction_value': t.get('valor', 0.0),
             'is_recurring': t.get('recurrente', False),
             'is_first_purchase': t.get('primer_gasto_con_empresa', False),
@@ -318,23 +1011,27 @@ def forward_to_zombie_detector_ml(transacciones: List[Dict[str, Any]]) -> List[D
             'transaction_date': t.get('fecha', ''),
             'has_been_refunded': False  # no info in your schema, so default to False
         }
-
-        try:
-            riesgo_llm = queryLargeLanguageModel(tx_data, historial_completo)
-        except Exception:
-            riesgo_llm = 0.5
-
-        try:
-            riesgo_ml = queryMachineLearning(tx_data)
-        except Exception:
-            riesgo_ml = 0.5
-
-        score_final = round((riesgo_llm + riesgo_ml) / 2, 3)
-
+        for t in transacciones
+    ]
+
+    # Rasgos por (cliente, empresa cobradora) desde los agregados incrementales: O(1) por fila.
+    # Cada transacción entra en el historial al calcular sus rasgos, así la siguiente (de esta
+    # subida o de otra) ya la cuenta; las vistas de arriba se tomaron antes y no cambian
+    rasgos = almacen.rasgos_y_anadir([(tx_data, t.get('IBAN'), t.get('customer_id'))
+                                      for t, tx_data in zip(transacciones, lista_tx_data)])
+    DURACION_ETAPA.observar(time.perf_counter() - inicio, etapa="historial")
+
+    if not ESTADO_ARRANQUE["modelos"]:
+        cargar_modelos()
+    # ML + LLM y combinación: el mismo código que el procesado offline (ai/riskScoring.py)
+    puntuaciones = puntuar_lote(lista_tx_data, historiales, rasgos, limite=limite_llm)
+
+    for t, (score_final, solo_ml) in zip(transacciones, puntuaciones):
         enriched.append({
             **t,
-            "codigo_transaccion": t.get("codigo_transaccion") or f"TX-{abs(hash((t.get('IBAN'), t.get('empresa_cobradora_norm'), t.get('fecha'))))%10_000_000}",
+            "codigo_transaccion": t.get("codigo_transaccion") or f"TX-{huella_transaccion(t)[:24]}",
             "score": score_final,
+            "solo_ml": solo_ml,
         })
 
     return enriched
@@ -363,16 +1060,14 @@ def _upsert_user(id_usuario: str, iban: str, umbral: str, notificaciones: bool,
         user.umbral = UmbralEnum(umbral)
     return user
 
-def _add_alerta(iban: str, cod_tx: str, importe: float, score: float, empresa: str = None):
-    alerta = AlertasEmitidas(
-        iban=iban,
-        codigo_transaccion=cod_tx,
-        importe=importe,
-        umbral_probabilistico=score,
-        iban_empresa_cobradora=empresa
-    )
-    db.session.add(alerta)
-    return alerta
+def _fila_alerta(iban: str, cod_tx: str, importe: float, score: float, empresa: str = None):
+    return {
+        "iban": iban,
+        "codigo_transaccion": cod_tx,
+        "importe": importe,
+        "umbral_probabilistico": score,
+        "iban_empresa_cobradora": empresa,
+    }
 
 @app.route("/dev/seed", methods=["POST"])
 def dev_seed():
@@ -406,17 +1101,11 @@ def dev_seed():
         notificaciones=False     # desactiva alertas
     )
 
-    created_alerts = 0
+    filas_alertas = []
     if with_alerts:
         # Limpieza ligera: no borra todo, pero evita duplicar por código de transacción
-        existing_codes = {a.codigo_transaccion for a in AlertasEmitidas.query.all()}
-
         def safe_add(iban, cod, imp, sc, emp):
-            nonlocal created_alerts
-            if cod not in existing_codes:
-                _add_alerta(iban, cod, imp, sc, emp)
-                existing_codes.add(cod)
-                created_alerts += 1
+            filas_alertas.append(_fila_alerta(iban, cod, imp, sc, emp))
 
         # Para user_beta (umbral 0.50) → deberían aparecer muchas en /alerts
         safe_add(u2.iban, "TX-DEEZER-001", 12.99, 0.62, "DEEZER")
@@ -432,7 +1121,10 @@ def dev_seed():
         # user_gamma (notificaciones OFF) igualmente dejamos datos manuales para que existan en BD
         safe_add(u3.iban, "TX-PRUEBA-008", 19.99, 0.88, "TIENDA_X")
 
+    # Las que ya existían (índice único IBAN + código) las ignora el propio INSERT
+    created_alerts = guardar_alertas(filas_alertas)
     db.session.commit()
+    cache_umbrales.invalidar()
 
     return jsonify({
         "usuarios": [
@@ -450,9 +1142,19 @@ def dev_reset():
     """
     num_alerts = AlertasEmitidas.query.delete()
     num_users = Usuarios.query.delete()
+    # Si no, al volver a subir los mismos ficheros se saltarían como "ya puntuadas"
+    num_puntuadas = TransaccionesPuntuadas.query.delete()
     db.session.commit()
-    return jsonify({"reset_ok": True, "alertas_borradas": num_alerts, "usuarios_borrados": num_users})
+    cache_umbrales.invalidar()
+    return jsonify({"reset_ok": True, "alertas_borradas": num_alerts, "usuarios_borrados": num_users,
+                    "transacciones_puntuadas_borradas": num_puntuadas})
 
 
+# Los hilos de la cola no arrancan al importar (seed.py, benchmarks... reclamarían trabajos y los
+# dejarían "en_curso" al salir): los arranca quien sirve, aquí o en gunicorn (preparar_worker), y si
+# no, las rutas de trabajos (flask run)
 if __name__ == "__main__":
+    # Con debug=True este bloque corre también en el proceso del reloader, que no sirve peticiones
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_trabajadores()
     app.run(host="0.0.0.0", port=8000, debug=True)
@@ -0,0 +1,60 @@
+# benchmark_alert_inserts.py
+# Compara la escritura de alertas de /processing/file antes y después del insert en bloque:
+#   antes:   un AlertasEmitidas por fila con db.session.add y los PRAGMAs por defecto de SQLite
+#   despues: guardar_alertas (INSERT executemany) con SQLITE_PRAGMAS (WAL, synchronous NORMAL...)
+# Cada modo corre en un proceso nuevo contra una BD temporal vacía. Uso:
+#   python benchmark_alert_inserts.py                -> 100k alertas
+#   BENCH_ALERT_ROWS=20000 python benchmark_alert_inserts.py
+import os
+import subprocess
+import sys
+import tempfile
+
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+FILAS = int(os.getenv("BENCH_ALERT_ROWS", "100000"))
+
+CODIGO_MEDICION = """
+import sys, time
+from app import app, db, AlertasEmitidas, guardar_alertas, inicializar_bd
+modo, filas = sys.argv[1], int(sys.argv[2])
+inicializar_bd()
+alertas = [
+    {"iban": f"ES{i % 500:022d}", "codigo_transaccion": f"TX-{i}", "importe": 9.99 + i % 100,
+     "umbral_probabilistico": 0.5 + (i % 50) / 100, "iban_empresa_cobradora": f"EMPRESA_{i % 300}"}
+    for i in range(filas)
+]
+with app.app_context():
+    t0 = time.perf_counter()
+    if modo == "antes":
+        for alerta in alertas:
+            db.session.add(AlertasEmitidas(**alerta))
+    else:
+        guardar_alertas(alertas)
+    db.session.commit()
+    segundos = time.perf_counter() - t0
+    assert AlertasEmitidas.query.count() == filas
+print(f"{segundos:.4f}")
+"""
+
+PRAGMAS_POR_DEFECTO = {"SQLITE_JOURNAL_MODE": "", "SQLITE_SYNCHRONOUS": "", "SQLITE_CACHE_SIZE": "", "SQLITE_MMAP_SIZE": ""}
+
+
+def medir(modo: str, filas: int = FILAS) -> float:
+    with tempfile.TemporaryDirectory() as directorio:
+        entorno = dict(os.environ, ML_WARMUP="lazy", DB_PATH=os.path.join(directorio, "bench.db"))
+        if modo == "antes":
+            entorno.update(PRAGMAS_POR_DEFECTO)
+        salida = subprocess.run(
+            [sys.executable, "-c", CODIGO_MEDICION, modo, str(filas)],
+            cwd=BASE_DIR, env=entorno, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+    return float(salida)
+
+
+if __name__ == "__main__":
+    resultados = {modo: medir(modo) for modo in ("antes", "despues")}
+    for modo, segundos in resultados.items():
+        print(f"{modo:8s} {FILAS} alertas en {segundos:.2f} s -> {FILAS / segundos:,.0f} inserts/s")
+    print(f"mejora: x{resultados['antes'] / resultados['despues']:.1f}")
@@ -0,0 +1,242 @@
+# benchmark_scoring.py
+# Micro-benchmarks offline de los caminos calientes de la puntuación, cada uno por separado:
+#   fecha                 transformar_fecha_a_timestamp_simple sobre una columna de fechas
+#   preprocessor          preprocessor.transform por trozos de ML_BATCH_CHUNK_SIZE (como queryMachineLearningBatch)
+#   codificador           CodificadorCompilado.transform, el sustituto por defecto del anterior
+#   ml_fila               queryMachineLearning de una en una (como mucho BENCH_ML_SINGLE_ROWS filas)
+#   ml_lote               queryMachineLearningBatch con todas las filas
+#   historial_reciente    preparar_historial_reciente sobre un historial de N transacciones
+#   prompt                construir_prompt_riesgo por transacción (como mucho BENCH_PROMPT_ROWS)
+#   alertas               guardar_alertas + commit en una BD temporal (proceso aparte, ver benchmark_alert_inserts.py)
+# Las cargas son sintéticas con el esquema de json files/training y semilla fija. Uso:
+#   python benchmark_scoring.py --salida bench.json                      -> 1k, 100k y 1M transacciones
+#   python benchmark_scoring.py --tamanos 1000,100000 --solo fecha,ml_lote --salida bench.json
+#   python benchmark_scoring.py --tamanos 1000 --salida nuevo.json --comparar bench.json   -> sale con 1 si algo empeora
+import argparse
+import gc
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+DIRECTORIO_TRAINING = BASE_DIR.parent / "json files" / "training"
+TAMANOS_POR_DEFECTO = [1_000, 100_000, 1_000_000]
+BENCHMARKS = ['fecha', 'preprocessor', 'codificador', 'ml_fila', 'ml_lote', 'historial_reciente', 'prompt', 'alertas']
+# Los caminos por fila se miden sobre un prefijo del lote y se informan en filas/s
+MAX_FILAS_ML_INDIVIDUAL = int(os.getenv("BENCH_ML_SINGLE_ROWS", "200"))
+MAX_FILAS_PROMPT = int(os.getenv("BENCH_PROMPT_ROWS", "100000"))
+SEMILLA = int(os.getenv("BENCH_SEED", "1234"))
+
+
+def plantillas_training() -> List[Dict[str, Any]]:
+    """
+    Transacciones reales de json files/training con todas las columnas que usa el modelo.
+    """
+    columnas = ['transaction_value', 'transaction_date', 'product_category', 'collector_company',
+                'iban_anonymized', 'is_recurring', 'is_first_purchase']
+    plantillas = []
+    for ruta in sorted(glob.glob(str(DIRECTORIO_TRAINING / "*.json"))):
+        with open(ruta, 'r', encoding='utf-8') as file:
+            plantillas.extend(t for t in json.load(file).get('transactions', []) if all(c in t for c in columnas))
+    return plantillas
+
+
+def generar_transacciones(filas: int, plantillas: List[Dict[str, Any]], semilla: int = SEMILLA) -> List[Dict[str, Any]]:
+    """
+    'filas' transacciones con el esquema de training: categoría/empresa/IBAN de una plantilla real,
+    importe perturbado, fecha repartida en un año y código único. Siempre las mismas para la misma semilla.
+    """
+    aleatorio = random.Random(semilla)
+    inicio = date(2025, 1, 1)
+    fechas = [(inicio + timedelta(days=dia)).isoformat() for dia in range(365)]
+    transacciones = []
+    for indice in range(filas):
+        transaccion = dict(aleatorio.choice(plantillas))
+        transaccion['transaction_value'] = round(float(transaccion['transaction_value']) * aleatorio.uniform(0.5, 1.5), 2)
+        transaccion['transaction_date'] = aleatorio.choice(fechas)
+        transaccion['transaction_code'] = f"SYN-C{indice % 1000:03d}-{indice:07d}"
+        transacciones.append(transaccion)
+    return transacciones
+
+
+def cronometrar(funcion: Callable[[], Any], repeticiones: int) -> List[float]:
+    segundos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        inicio = time.perf_counter()
+        funcion()
+        segundos.append(time.perf_counter() - inicio)
+    return segundos
+
+
+def resultado(nombre: str, filas: int, filas_medidas: int, segundos: List[float]) -> Dict[str, Any]:
+    mediana = statistics.median(segundos)
+    return {
+        "benchmark": nombre,
+        "filas": filas,
+        "filas_medidas": filas_medidas,
+        "segundos": [round(s, 6) for s in segundos],
+        "mediana_s": round(mediana, 6),
+        "min_s": round(min(segundos), 6),
+        "filas_por_segundo": round(filas_medidas / mediana, 1) if mediana > 0 else None,
+    }
+
+
+def medir_tamano(filas: int, plantillas: List[Dict[str, Any]], seleccion: List[str], repeticiones: int) -> List[Dict[str, Any]]:
+    import pandas
+
+    from ai.featureStore import RASGOS_VACIOS
+    from ai.largeLanguageModel.queryLargeLanguageModel import construir_prompt_riesgo, preparar_contexto_cliente, preparar_historial_reciente
+    from ai.machineLearning.modelRegistry import registro_modelo
+    from ai.machineLearning.queryMachineLearning import TAMANO_TROZO_ML, columnas_modelo, queryMachineLearning, queryMachineLearningBatch
+    from ai.machineLearning.trainMachineLearning import transformar_fecha_a_timestamp_simple
+
+    transacciones = generar_transacciones(filas, plantillas)
+    resultados = []
+
+    def registrar(r: Dict[str, Any]) -> None:
+        print(f"  {r['benchmark']:20s} {r['filas_medidas']:>9d} filas  mediana {r['mediana_s']:.4f} s  {r['filas_por_segundo']:>14,.1f} filas/s")
+        resultados.append(r)
+
+    def anotar(nombre: str, filas_medidas: int, funcion: Callable[[], Any]) -> None:
+        if nombre in seleccion:
+            registrar(resultado(nombre, filas, filas_medidas, cronometrar(funcion, repeticiones)))
+
+    if any(nombre in seleccion for nombre in ('preprocessor', 'codificador', 'ml_fila', 'ml_lote')):
+        artefactos = registro_modelo.obtener()
+        columnas = columnas_modelo(artefactos.preprocessor)
+        # Si el modelo se entrenó con ML_USE_AGGREGATES, los rasgos van vacíos (cliente sin historial)
+        if any(columna in RASGOS_VACIOS for columna in columnas):
+            for transaccion in transacciones:
+                transaccion.update(RASGOS_VACIOS)
+
+    if 'fecha' in seleccion:
+        fechas = pandas.Series([t['transaction_date'] for t in transacciones], dtype=object)
+        anotar('fecha', filas, lambda: transformar_fecha_a_timestamp_simple(fechas))
+        del fechas
+
+    def transformar_por_trozos(transformar: Callable[[List[Dict[str, Any]]], Any]) -> None:
+        for inicio in range(0, filas, TAMANO_TROZO_ML):
+            transformar(transacciones[inicio:inicio + TAMANO_TROZO_ML])
+
+    if 'preprocessor' in seleccion:
+        anotar('preprocessor', filas, lambda: transformar_por_trozos(
+            lambda trozo: artefactos.preprocessor.transform(pandas.DataFrame.from_records(trozo, columns=columnas))))
+    if 'codificador' in seleccion and artefactos.codificador is not None:
+        anotar('codificador', filas, lambda: transformar_por_trozos(artefactos.codificador.transform))
+
+    individuales = transacciones[:MAX_FILAS_ML_INDIVIDUAL]
+    anotar('ml_fila', len(individuales), lambda: [queryMachineLearning(t) for t in individuales])
+    anotar('ml_lote', filas, lambda: queryMachineLearningBatch(transacciones))
+
+    historial = {'user_profile': {'age': 35, 'salary_usd': 35000.5, 'iban_number': 'ES00_BENCH', 'is_urban': True},
+                 'transactions': transacciones}
+    anotar('historial_reciente', filas, lambda: preparar_historial_reciente(historial))
+    contexto = preparar_contexto_cliente(historial)
+    prompts = transacciones[:MAX_FILAS_PROMPT]
+    anotar('prompt', len(prompts), lambda: [construir_prompt_riesgo(t, contexto) for t in prompts])
+
+    del transacciones, individuales, prompts, historial
+    gc.collect()
+    if 'alertas' in seleccion:
+        # Proceso aparte con BD temporal: no se mezcla con el estado de este proceso ni toca data.db.
+        # Cuenta solo lo que mide el propio proceso (insert + commit), sin arranque ni generación
+        from benchmark_alert_inserts import medir
+        registrar(resultado('alertas', filas, filas, [medir("despues", filas) for _ in range(repeticiones)]))
+    return resultados
+
+
+def entorno_ejecucion() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "semilla": SEMILLA,
+        "ML_BACKEND": os.getenv("ML_BACKEND", "keras"),
+        "ML_COMPILED_ENCODER": os.getenv("ML_COMPILED_ENCODER", "1"),
+        "ML_BATCH_CHUNK_SIZE": os.getenv("ML_BATCH_CHUNK_SIZE", "4096"),
+    }
+
+
+def comparar(actuales: List[Dict[str, Any]], ruta_anterior: str, tolerancia: float) -> List[str]:
+    """
+    Benchmarks (mismo nombre y tamaño) cuyo ritmo cae más de 'tolerancia' frente a una ejecución anterior.
+    """
+    with open(ruta_anterior, 'r', encoding='utf-8') as file:
+        anteriores = {(r["benchmark"], r["filas"]): r for r in json.load(file)["resultados"]}
+    regresiones = []
+    for actual in actuales:
+        anterior = anteriores.get((actual["benchmark"], actual["filas"]))
+        if not anterior or not anterior.get("filas_por_segundo") or not actual.get("filas_por_segundo"):
+            continue
+        cambio = actual["filas_por_segundo"] / anterior["filas_por_segundo"] - 1
+        actual["cambio_vs_anterior"] = round(cambio, 4)
+        if cambio < -tolerancia:
+            regresiones.append(f"{actual['benchmark']} ({actual['filas']} filas): "
+                               f"{anterior['filas_por_segundo']:,.1f} -> {actual['filas_por_segundo']:,.1f} filas/s ({cambio:+.0%})")
+    return regresiones
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de la puntuación (offline, cargas sintéticas)")
+    parser.add_argument('--tamanos', default=",".join(str(t) for t in TAMANOS_POR_DEFECTO),
+                        help="Transacciones por carga, separadas por comas")
+    parser.add_argument('--solo', help=f"Subconjunto de benchmarks: {','.join(BENCHMARKS)}")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', required=True, help="Fichero JSON de resultados")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Caída de filas/s admitida al comparar (0.2 = 20%%)")
+    argumentos = parser.parse_args(argv)
+
+    seleccion = argumentos.solo.split(",") if argumentos.solo else BENCHMARKS
+    desconocidos = [nombre for nombre in seleccion if nombre not in BENCHMARKS]
+    if desconocidos:
+        print(f"Error: benchmarks desconocidos: {', '.join(desconocidos)}")
+        return 1
+
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, str(BASE_DIR))
+    plantillas = plantillas_training()
+    if not plantillas:
+        print(f"Error: no hay transacciones de ejemplo en {DIRECTORIO_TRAINING}")
+        return 1
+
+    resultados = []
+    for filas in (int(t) for t in argumentos.tamanos.split(",")):
+        print(f"{filas} transacciones:")
+        resultados.extend(medir_tamano(filas, plantillas, seleccion, argumentos.repeticiones))
+
+    informe = {"entorno": entorno_ejecucion(), "repeticiones": argumentos.repeticiones, "resultados": resultados}
+    regresiones = comparar(resultados, argumentos.comparar, argumentos.tolerancia) if argumentos.comparar else []
+    if argumentos.comparar:
+        informe["comparado_con"] = argumentos.comparar
+        informe["regresiones"] = regresiones
+
+    with open(argumentos.salida, 'w', encoding='utf-8') as file:
+        json.dump(informe, file, indent=2, ensure_ascii=False)
+    print(f"Resultados en {argumentos.salida}")
+
+    for regresion in regresiones:
+        print(f"Regresión: {regresion}")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# check_import_time.py
+# Mide cuánto tarda un proceso nuevo en importar app.py (lo que paga cada arranque/worker)
+# y falla si se pasa del presupuesto. Uso:
+#   python check_import_time.py            -> mediana de 5 arranques contra IMPORT_BUDGET_MS
+#   IMPORT_BUDGET_MS=800 python check_import_time.py
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+# Referencia medida con ML_WARMUP=lazy: ~0.45 s (flask + sqlalchemy + requests).
+# Importando TF/pandas al cargar el módulo eran ~4 s con keras y ~1.6 s con numpy.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1000"))
+REPETICIONES = int(os.getenv("IMPORT_BUDGET_RUNS", "5"))
+
+CODIGO_MEDICION = """
+import sys, time
+t0 = time.perf_counter()
+import app
+ms = (time.perf_counter() - t0) * 1000
+pesados = [m for m in ("tensorflow", "pandas", "sklearn", "h5py") if m in sys.modules]
+print(f"{ms:.1f} {','.join(pesados)}")
+"""
+
+
+def medir_una_vez() -> tuple:
+    # BD temporal: la medición no deja ficheros en el árbol del repo
+    with tempfile.TemporaryDirectory() as directorio:
+        entorno = dict(os.environ, ML_WARMUP="lazy", DB_PATH=os.path.join(directorio, "import_budget.db"))
+        salida = subprocess.run(
+            [sys.executable, "-c", CODIGO_MEDICION],
+            cwd=BASE_DIR, env=entorno, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+    ms, _, pesados = salida.partition(" ")
+    return float(ms), pesados
+
+
+if __name__ == "__main__":
+    medidas = []
+    pesados = ""
+    for _ in range(REPETICIONES):
+        ms, pesados = medir_una_vez()
+        medidas.append(ms)
+
+    mediana = statistics.median(medidas)
+    print(f"import app: mediana {mediana:.0f} ms (min {min(medidas):.0f}, max {max(medidas):.0f}) presupuesto {IMPORT_BUDGET_MS:.0f} ms")
+    if pesados:
+        print(f"Módulos pesados importados al cargar app.py: {pesados}")
+        sys.exit(1)
+    if mediana > IMPORT_BUDGET_MS:
+        print("Fuera de presupuesto")
+        sys.exit(1)
@@ -0,0 +1,65 @@
+# gunicorn.conf.py
+# Servidor de producción de la API: varios procesos worker (gunicorn lee este fichero solo si se
+# arranca desde api/, como en el Dockerfile). Uso:
+#   gunicorn app:app
+#   GUNICORN_WORKERS=4 GUNICORN_THREADS=8 gunicorn app:app
+# `python app.py` sigue siendo el servidor de desarrollo de un solo proceso.
+#
+# - preload: app.py (y con ML_BACKEND=numpy los artefactos ML y el historial) se cargan una vez en
+#   el padre antes del fork; los workers los comparten copy-on-write en vez de tener una copia cada uno
+# - cada worker, al nacer, suelta las conexiones SQLite heredadas y arranca sus hilos de la cola
+#   (app.preparar_worker); al salir devuelve a "pendiente" el trabajo que tuviera a medias
+# - los workers se reciclan tras GUNICORN_MAX_REQUESTS peticiones (más un jitter para que no lo
+#   hagan todos a la vez), terminando antes lo que tengan en vuelo
+# Cada worker es un proceso con su propio estado en memoria: /metrics y las cachés de umbrales y
+# prefijos LLM son por worker (la BD y la caché LLM en SQLite no). El historial también: todos parten
+# de HISTORY_FILES y cada uno incorpora lo que puntúa (acotado por HISTORY_MAX_ROWS/HISTORY_MAX_CLIENTS).
+import gc
+import os
+
+
+def _nucleos() -> int:
+    try:
+        return len(os.sched_getaffinity(0))  # CPUs asignadas al contenedor/proceso
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Con TensorFlow (ML_BACKEND=keras) el runtime no sobrevive a un fork: cada worker carga su modelo
+# en segundo plano tras el fork. Con numpy se carga una sola vez en el padre
+BACKEND_ML = os.getenv("ML_BACKEND", "keras")
+os.environ.setdefault("ML_WARMUP", "eager" if BACKEND_ML == "numpy" else "background")
+os.environ["SERVIDOR_PREFORK"] = "1"
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+# Un worker por núcleo (la parte ML es CPU) y varios hilos por worker (la espera a Ollama es E/S)
+workers = int(os.getenv("GUNICORN_WORKERS", str(_nucleos())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+# Segundos sin latido antes de matar un worker colgado y de margen para acabar al pararlo/reciclarlo
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Reciclado de workers (0 lo desactiva). Con gthread, al reciclar se cierra sin respuesta la conexión
+# que el worker acababa de aceptar y aún no había leído (~1 por reciclado en load_test.py): umbral alto
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def when_ready(server):
+    # Lo cargado hasta aquí (módulos, modelos) no lo vuelve a tocar el GC en los workers,
+    # así sus páginas no se copian solo por recorrerlas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import preparar_worker
+    preparar_worker()
+
+
+def worker_exit(server, worker):
+    from app import detener_trabajadores
+    detener_trabajadores(graceful_timeout / 2)
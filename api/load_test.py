@@ -0,0 +1,335 @@
+# load_test.py
+# Prueba de carga de extremo a extremo contra la app Flask real (/users, /processing/file, /alerts)
+# con las peticiones de Hackathon.collection.postman_collection.json. Por defecto arranca:
+#   - el sustituto de Ollama (ai/largeLanguageModel/ollamaStandIn.py) con la latencia/errores pedidos
+#   - app.py en un puerto libre con una BD temporal y OLLAMA_URL apuntando al sustituto
+# y lanza --concurrencia usuarios virtuales durante --duracion segundos. Informa peticiones/s y
+# p50/p95/p99 por endpoint. Uso:
+#   python load_test.py --concurrencia 16 --duracion 60 --latencia-llm lognormal:0.4,0.6 --errores-llm 0.02
+#   python load_test.py --base-url http://localhost:8000 --salida carga.json      -> contra una API ya levantada
+#   python load_test.py --pesos /processing=4,/alerts=2,/users=1 --transacciones-por-fichero 50
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent
+COLECCION = BASE_DIR.parent / "Hackathon.collection.postman_collection.json"
+ENTORNO = BASE_DIR.parent / "Hackathon.env.postman_environment.json"
+# Roles de usuario de la colección: cada usuario virtual tiene su propio id e IBAN para cada uno
+ROLES = ("alto", "medio", "bajo", "null")
+PATRON_VARIABLE = re.compile(r"\{\{(\w+)\}\}")
+
+
+@dataclass
+class PeticionColeccion:
+    nombre: str
+    metodo: str
+    url: str            # con {{variables}}
+    cuerpo: Optional[str]
+    endpoint: str       # agrupación del informe, p.ej. "PUT /users/:id/config"
+    peso: float = 1.0
+
+
+@dataclass
+class Medidas:
+    latencias: List[float] = field(default_factory=list)
+    codigos: Dict[str, int] = field(default_factory=dict)
+    errores: int = 0
+    transacciones: int = 0
+
+
+def cargar_coleccion(ruta: Path = COLECCION) -> List[PeticionColeccion]:
+    with open(ruta, 'r', encoding='utf-8') as file:
+        coleccion = json.load(file)
+    peticiones = []
+    for item in coleccion["item"]:
+        peticion = item["request"]
+        url = peticion["url"]["raw"] if isinstance(peticion["url"], dict) else peticion["url"]
+        ruta_url = "/".join(":id" if PATRON_VARIABLE.fullmatch(parte) else parte
+                            for parte in urlsplit(url.replace("{{base_url}}", "")).path.split("/"))
+        cuerpo = (peticion.get("body") or {}).get("raw")
+        peticiones.append(PeticionColeccion(item["name"], peticion["method"], url, cuerpo, f"{peticion['method']} {ruta_url}"))
+    return peticiones
+
+
+def cargar_entorno(ruta: Path = ENTORNO) -> Dict[str, str]:
+    with open(ruta, 'r', encoding='utf-8') as file:
+        return {valor["key"]: valor["value"] for valor in json.load(file)["values"] if valor.get("enabled", True)}
+
+
+def aplicar_pesos(peticiones: List[PeticionColeccion], pesos: str) -> None:
+    """
+    'pesos' = "/processing=4,/alerts=2": cada petición toma el peso del prefijo de ruta más largo que casa.
+    """
+    prefijos = {}
+    for parte in filter(None, pesos.split(",")):
+        prefijo, _, peso = parte.partition("=")
+        prefijos[prefijo.strip()] = float(peso)
+    for peticion in peticiones:
+        ruta = peticion.endpoint.split(" ", 1)[1]
+        casan = [prefijo for prefijo in prefijos if ruta.startswith(prefijo)]
+        peticion.peso = prefijos[max(casan, key=len)] if casan else 1.0
+
+
+def variables_usuario_virtual(entorno: Dict[str, str], numero: int) -> Dict[str, str]:
+    variables = dict(entorno)
+    for indice, rol in enumerate(ROLES):
+        variables[f"user_id_{rol}"] = f"{entorno.get(f'user_id_{rol}', rol)}_vu{numero}"
+        variables[f"iban_{rol}"] = f"ES{numero:08d}{indice:014d}"
+    return variables
+
+
+def renderizar(plantilla: str, variables: Dict[str, str]) -> str:
+    return PATRON_VARIABLE.sub(lambda coincidencia: variables.get(coincidencia.group(1), coincidencia.group(0)), plantilla)
+
+
+def cuerpo_procesamiento(cuerpo: Dict[str, Any], etiqueta: str, transacciones_por_fichero: int) -> Dict[str, Any]:
+    """
+    Repite las transacciones de la colección hasta 'transacciones_por_fichero' con códigos únicos
+    (si no, la API las reconoce como ya puntuadas y no pasan por el modelo).
+    """
+    plantillas = cuerpo["transacciones"]
+    total = transacciones_por_fichero or len(plantillas)
+    transacciones = []
+    for indice, plantilla in zip(range(total), itertools.cycle(plantillas)):
+        transaccion = dict(plantilla)
+        transaccion["codigo_transaccion"] = f"{plantilla.get('codigo_transaccion', 'TX')}-{etiqueta}-{indice}"
+        transaccion["valor"] = round(float(plantilla["valor"]) * (1 + (indice % 7) / 10), 2)
+        transacciones.append(transaccion)
+    return {"transacciones": transacciones}
+
+
+class UsuarioVirtual(threading.Thread):
+    def __init__(self, numero: int, base_url: str, peticiones: List[PeticionColeccion], variables: Dict[str, str],
+                 fin: float, transacciones_por_fichero: int, medidas: Dict[str, Medidas], lock: threading.Lock):
+        super().__init__(name=f"vu-{numero}", daemon=True)
+        self.numero = numero
+        self.base_url = base_url
+        self.peticiones = peticiones
+        self.variables = dict(variables, base_url=base_url)
+        self.fin = fin
+        self.transacciones_por_fichero = transacciones_por_fichero
+        self.medidas = medidas
+        self.lock = lock
+        self.sesion = requests.Session()
+        # Secuencia determinista por usuario virtual según los pesos
+        pesos = [peticion.peso for peticion in peticiones]
+        self.orden = itertools.cycle(self._muestrear(pesos, 1000))
+
+    def _muestrear(self, pesos: List[float], n: int) -> List[int]:
+        aleatorio = random.Random(self.numero)
+        return aleatorio.choices(range(len(pesos)), weights=pesos, k=n)
+
+    def enviar(self, peticion: PeticionColeccion, iteracion: int) -> None:
+        url = renderizar(peticion.url, self.variables)
+        cuerpo = json.loads(renderizar(peticion.cuerpo, self.variables)) if peticion.cuerpo else None
+        if cuerpo is not None and "transacciones" in cuerpo:
+            cuerpo = cuerpo_procesamiento(cuerpo, f"vu{self.numero}-{iteracion}", self.transacciones_por_fichero)
+
+        inicio = time.perf_counter()
+        codigo, transacciones = "error", 0
+        try:
+            respuesta = self.sesion.request(peticion.metodo, url, json=cuerpo, timeout=300)
+            codigo = str(respuesta.status_code)
+            if respuesta.ok and peticion.endpoint == "POST /processing/file":
+                transacciones = respuesta.json().get("procesadas", 0)
+        except requests.RequestException:
+            pass
+        latencia = time.perf_counter() - inicio
+
+        with self.lock:
+            medidas = self.medidas.setdefault(peticion.endpoint, Medidas())
+            medidas.latencias.append(latencia)
+            medidas.codigos[codigo] = medidas.codigos.get(codigo, 0) + 1
+            medidas.errores += codigo == "error" or codigo.startswith("5")
+            medidas.transacciones += transacciones
+
+    def run(self) -> None:
+        for iteracion in itertools.count():
+            if time.monotonic() >= self.fin:
+                return
+            self.enviar(self.peticiones[next(self.orden)], iteracion)
+
+
+def percentil(ordenadas: List[float], p: float) -> float:
+    # Rango más cercano: el menor valor que deja al menos el p% de las muestras por debajo o igual
+    return ordenadas[max(0, math.ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+def resumen(medidas: Dict[str, Medidas], segundos: float) -> Dict[str, Any]:
+    endpoints = {}
+    for endpoint, m in sorted(medidas.items()):
+        ordenadas = sorted(m.latencias)
+        endpoints[endpoint] = {
+            "peticiones": len(ordenadas),
+            "peticiones_por_segundo": round(len(ordenadas) / segundos, 2),
+            "p50_ms": round(percentil(ordenadas, 50) * 1000, 1),
+            "p95_ms": round(percentil(ordenadas, 95) * 1000, 1),
+            "p99_ms": round(percentil(ordenadas, 99) * 1000, 1),
+            "max_ms": round(ordenadas[-1] * 1000, 1),
+            "errores": m.errores,
+            "codigos": m.codigos,
+        }
+        if m.transacciones:
+            endpoints[endpoint]["transacciones_por_segundo"] = round(m.transacciones / segundos, 2)
+    total = sum(len(m.latencias) for m in medidas.values())
+    return {"segundos": round(segundos, 2), "peticiones": total,
+            "peticiones_por_segundo": round(total / segundos, 2), "endpoints": endpoints}
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar(url: str, segundos: float, proceso: subprocess.Popen) -> None:
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"El proceso terminó antes de estar listo ({url}), código {proceso.returncode}")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} no respondió 200 en {segundos:.0f} s")
+
+
+def arrancar_sustituto_llm(argumentos, directorio: str) -> Tuple[subprocess.Popen, str]:
+    puerto = puerto_libre()
+    comando = [sys.executable, "-m", "ai.largeLanguageModel.ollamaStandIn", "--port", str(puerto),
+               "--latencia", argumentos.latencia_llm, "--errores", str(argumentos.errores_llm),
+               "--malformadas", str(argumentos.malformadas_llm), "--semilla", "1"]
+    proceso = subprocess.Popen(comando, cwd=BASE_DIR, stdout=open(os.path.join(directorio, "ollama.log"), "w"),
+                               stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{puerto}"
+    esperar(f"{base}/stats", 30, proceso)
+    return proceso, base
+
+
+def arrancar_api(ollama_url: str, directorio: str) -> Tuple[subprocess.Popen, str]:
+    puerto = puerto_libre()
+    entorno = dict(os.environ, DB_PATH=os.path.join(directorio, "carga.db"), OLLAMA_URL=ollama_url)
+    # Servidor de desarrollo de Flask con hilos; para medir el despliegue real, usar --base-url
+    codigo = (f"from app import app, iniciar_trabajadores; iniciar_trabajadores(); "
+              f"app.run(host='127.0.0.1', port={puerto}, threaded=True)")
+    proceso = subprocess.Popen([sys.executable, "-c", codigo], cwd=BASE_DIR, env=entorno,
+                               stdout=open(os.path.join(directorio, "api.log"), "w"), stderr=subprocess.STDOUT)
+    base = f"http://127.0.0.1:{puerto}"
+    # /health/ready: BD creada y modelos cargados, así el calentamiento no cuenta en las latencias
+    esperar(f"{base}/health/ready", 300, proceso)
+    return proceso, base
+
+
+def dar_de_alta(base_url: str, peticiones: List[PeticionColeccion], variables: Dict[str, str]) -> None:
+    """
+    Crea los cuatro usuarios de cada usuario virtual con la plantilla de alta de la colección,
+    para que config/baja no devuelvan 404 durante la carga.
+    """
+    alta = next(peticion for peticion in peticiones if peticion.endpoint == "POST /users" and peticion.cuerpo)
+    for rol in ROLES:
+        cuerpo = json.loads(renderizar(alta.cuerpo, variables))
+        cuerpo.update(id_usuario=variables[f"user_id_{rol}"], iban=variables[f"iban_{rol}"])
+        if rol != "null":
+            cuerpo["umbral"] = rol
+        requests.post(f"{base_url}/users", json=cuerpo, timeout=30).raise_for_status()
+
+
+def imprimir(informe: Dict[str, Any]) -> None:
+    print(f"{informe['peticiones']} peticiones en {informe['segundos']} s -> {informe['peticiones_por_segundo']} pet/s")
+    print(f"  {'endpoint':28s} {'pet':>7s} {'pet/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errores':>8s}")
+    for endpoint, datos in informe["endpoints"].items():
+        print(f"  {endpoint:28s} {datos['peticiones']:>7d} {datos['peticiones_por_segundo']:>8.2f} {datos['p50_ms']:>9.1f} "
+              f"{datos['p95_ms']:>9.1f} {datos['p99_ms']:>9.1f} {datos['errores']:>8d}  {datos['codigos']}")
+        if "transacciones_por_segundo" in datos:
+            print(f"  {'':28s} {datos['transacciones_por_segundo']} transacciones/s")
+    if informe.get("llm"):
+        print(f"  LLM (sustituto): {informe['llm']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con las peticiones de la colección Postman")
+    parser.add_argument("--base-url", help="API ya levantada; si no se indica se arranca app.py en local")
+    parser.add_argument("--ollama-url", help="OLLAMA_URL para la API arrancada; si no se indica se arranca el sustituto")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Usuarios virtuales en paralelo")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos de carga")
+    parser.add_argument("--pesos", default="/users=1,/processing=1,/alerts=1",
+                        help="Peso por prefijo de ruta de cada petición de la colección")
+    parser.add_argument("--transacciones-por-fichero", type=int, default=0,
+                        help="Transacciones por POST /processing/file (0 = las de la colección)")
+    parser.add_argument("--latencia-llm", default="lognormal:0.3,0.5", help="Distribución de latencia del sustituto de Ollama")
+    parser.add_argument("--errores-llm", type=float, default=0.0, help="Fracción de peticiones al LLM que fallan con 500")
+    parser.add_argument("--malformadas-llm", type=float, default=0.0, help="Fracción de respuestas del LLM sin número")
+    parser.add_argument("--salida", help="Fichero JSON con el informe")
+    argumentos = parser.parse_args(argv)
+
+    peticiones = cargar_coleccion()
+    aplicar_pesos(peticiones, argumentos.pesos)
+    entorno = cargar_entorno()
+    procesos = []
+    base_llm = None
+    directorio = tempfile.mkdtemp(prefix="carga_")
+    try:
+        base_url = argumentos.base_url
+        if not base_url:
+            ollama_url = argumentos.ollama_url
+            if not ollama_url:
+                proceso, base_llm = arrancar_sustituto_llm(argumentos, directorio)
+                procesos.append(proceso)
+                ollama_url = f"{base_llm}/api/generate"
+            proceso, base_url = arrancar_api(ollama_url, directorio)
+            procesos.append(proceso)
+            print(f"API en {base_url} (OLLAMA_URL={ollama_url}, logs en {directorio})")
+
+        variables = [variables_usuario_virtual(entorno, numero) for numero in range(argumentos.concurrencia)]
+        for variables_vu in variables:
+            dar_de_alta(base_url, peticiones, variables_vu)
+
+        medidas: Dict[str, Medidas] = {}
+        lock = threading.Lock()
+        inicio = time.monotonic()
+        usuarios = [UsuarioVirtual(numero, base_url, peticiones, variables[numero], inicio + argumentos.duracion,
+                                   argumentos.transacciones_por_fichero, medidas, lock)
+                    for numero in range(argumentos.concurrencia)]
+        for usuario in usuarios:
+            usuario.start()
+        for usuario in usuarios:
+            usuario.join()
+        informe = resumen(medidas, time.monotonic() - inicio)
+        informe["configuracion"] = {clave: valor for clave, valor in vars(argumentos).items() if clave != "salida"}
+        if base_llm:
+            informe["llm"] = requests.get(f"{base_llm}/stats", timeout=5).json()
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+    imprimir(informe)
+    if argumentos.salida:
+        with open(argumentos.salida, 'w', encoding='utf-8') as file:
+            json.dump(informe, file, indent=2, ensure_ascii=False)
+        print(f"Informe en {argumentos.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # seed_one.py
 from datetime import datetime
-from app import app, db, Usuarios, UmbralEnum
+from app import app, db, Usuarios, UmbralEnum, inicializar_bd
+
+inicializar_bd()
 
 with app.app_context():
     uid = "user_demo_1"  # mantener siempre el mismo id para tener 1 fila
@@ -0,0 +1,53 @@
+# Configuración común de los tests (python -m pytest api/tests). Se importa antes que los módulos
+# de test, así que fija aquí el entorno que app.py lee al importarse.
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# Los tests importan igual que la API al ejecutarse desde api/: app, ai.*
+DIRECTORIO_API = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRECTORIO_REPO = os.path.dirname(DIRECTORIO_API)
+sys.path.insert(0, DIRECTORIO_API)
+
+# BD, caché LLM y spool de trabajos en un directorio temporal, nunca los de api/
+_DIRECTORIO_DATOS = tempfile.mkdtemp(prefix="cleanpai_tests_")
+atexit.register(shutil.rmtree, _DIRECTORIO_DATOS, ignore_errors=True)
+os.environ["DB_PATH"] = os.path.join(_DIRECTORIO_DATOS, "zombis.db")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_DIRECTORIO_DATOS, "llm_cache.db")
+os.environ["JOBS_SPOOL_DIR"] = os.path.join(_DIRECTORIO_DATOS, "jobs_spool")
+os.environ.setdefault("ML_WARMUP", "lazy")
+
+
+@pytest.fixture(scope="session")
+def transacciones_entrenamiento():
+    """
+    Transacciones de json files/training/all_transactions.json (las columnas que espera el modelo).
+    """
+    ruta = os.path.join(DIRECTORIO_REPO, "json files", "training", "all_transactions.json")
+    with open(ruta, "r", encoding="utf-8") as fichero:
+        return json.load(fichero)["transactions"]
+
+
+@pytest.fixture(scope="session")
+def artefactos_numpy():
+    """
+    Preprocesador y pesos versionados en ai/machineLearning, con el backend NumPy (sin TensorFlow).
+    """
+    from ai.machineLearning.modelRegistry import cargar_artefactos
+    return cargar_artefactos(backend="numpy")
+
+
+@pytest.fixture
+def cliente():
+    """
+    Cliente de pruebas de la API sobre la BD temporal, vacía al empezar cada test.
+    """
+    import app
+    cliente = app.app.test_client()
+    assert cliente.post("/dev/reset").status_code == 200
+    return cliente
@@ -0,0 +1,66 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def alertas(cliente):
+    """
+    12 alertas de dos IBAN alternos; devuelve sus códigos de la más reciente a la más antigua.
+    """
+    filas = [{"iban": f"ES0{indice % 2}", "codigo_transaccion": f"tx{indice:02d}", "importe": float(indice),
+              "umbral_probabilistico": 0.5 + indice / 100, "iban_empresa_cobradora": "ES99"} for indice in range(12)]
+    with app.app.app_context():
+        assert app.guardar_alertas(filas) == len(filas)
+        app.db.session.commit()
+    return [fila["codigo_transaccion"] for fila in reversed(filas)]
+
+
+def recorrer(cliente, consulta):
+    """
+    Sigue X-Next-Cursor desde la primera página; devuelve los códigos y el tamaño de cada página.
+    """
+    codigos, paginas = [], []
+    cursor = None
+    while True:
+        respuesta = cliente.get("/alerts", query_string=dict(consulta, **({"cursor": cursor} if cursor else {})))
+        assert respuesta.status_code == 200
+        codigos += [alerta["codigo_transaccion"] for alerta in respuesta.get_json()]
+        paginas.append(len(respuesta.get_json()))
+        cursor = respuesta.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return codigos, paginas
+
+
+def test_pagina_por_defecto_acotada(cliente, alertas, monkeypatch):
+    monkeypatch.setattr(app, "ALERTS_DEFAULT_LIMIT", 5)
+    codigos, paginas = recorrer(cliente, {})
+
+    assert paginas == [5, 5, 2]
+    assert codigos == alertas
+
+
+def test_limit_explicito_y_filtros(cliente, alertas):
+    codigos, paginas = recorrer(cliente, {"limit": 4, "iban": "ES01"})
+
+    assert paginas == [4, 2]
+    assert codigos == [codigo for codigo in alertas if int(codigo[2:]) % 2 == 1]
+
+
+def test_limit_0_devuelve_todas_sin_cursor(cliente, alertas, monkeypatch):
+    monkeypatch.setattr(app, "ALERTS_DEFAULT_LIMIT", 5)
+    respuesta = cliente.get("/alerts", query_string={"limit": 0})
+
+    assert [alerta["codigo_transaccion"] for alerta in respuesta.get_json()] == alertas
+    assert "X-Next-Cursor" not in respuesta.headers
+
+
+def test_min_score_con_cursor(cliente, alertas):
+    codigos, _ = recorrer(cliente, {"limit": 3, "min_score": 0.6})
+
+    assert codigos == [codigo for codigo in alertas if int(codigo[2:]) >= 10]
+
+
+@pytest.mark.parametrize("consulta", [{"limit": -1}, {"limit": app.ALERTS_MAX_LIMIT + 1}, {"limit": "x"}, {"cursor": "x"}])
+def test_parametros_invalidos(cliente, consulta):
+    assert cliente.get("/alerts", query_string=consulta).status_code == 400
@@ -0,0 +1,76 @@
+import numpy
+import pandas
+import pytest
+
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+
+from ai.machineLearning.compiledEncoder import CodificadorCompilado
+from ai.machineLearning.queryMachineLearning import (COLUMNA_FECHA, COLUMNAS_BOOLEANAS, COLUMNAS_CATEGORICAS,
+                                                     COLUMNAS_NUMERICAS, columnas_modelo)
+from ai.machineLearning.trainMachineLearning import CodificadorHashing, transformar_fecha_a_timestamp_simple
+
+
+def transformar_con_preprocesador(preprocessor, registros):
+    X = preprocessor.transform(pandas.DataFrame.from_records(registros, columns=columnas_modelo(preprocessor)))
+    return (X.toarray() if sparse.issparse(X) else X).astype(float)
+
+
+def preprocesador(codificador_categoricas):
+    # Misma disposición que trainMachineLearning.py
+    return ColumnTransformer(
+        transformers=[
+            ('date', FunctionTransformer(transformar_fecha_a_timestamp_simple, validate=False,
+                                         feature_names_out='one-to-one'), [COLUMNA_FECHA]),
+            ('num', StandardScaler(), COLUMNAS_NUMERICAS),
+            ('cat', codificador_categoricas, COLUMNAS_CATEGORICAS),
+            ('bool', 'passthrough', COLUMNAS_BOOLEANAS),
+        ],
+        remainder='drop',
+    )
+
+
+@pytest.fixture(scope="module")
+def registros(transacciones_entrenamiento):
+    """
+    Transacciones de entrenamiento más variantes que no vio el preprocesador: categorías
+    desconocidas, otras fechas, fechas inválidas o vacías.
+    """
+    base = transacciones_entrenamiento[:200]
+    variantes = [
+        dict(base[0], collector_company="Empresa Nueva", iban_anonymized="IBAN_NUEVO"),
+        dict(base[1], product_category="Categoría Nueva", transaction_date="2024-02-29"),
+        dict(base[2], transaction_date="no es una fecha"),
+        dict(base[3], transaction_date=None),
+        dict(base[4], transaction_value=0.0, is_recurring=False, is_first_purchase=True),
+    ]
+    return base + variantes
+
+
+def test_igual_que_el_preprocesador_versionado(artefactos_numpy, registros):
+    codificador = CodificadorCompilado(artefactos_numpy.preprocessor)
+    numpy.testing.assert_allclose(codificador.transform(registros),
+                                  transformar_con_preprocesador(artefactos_numpy.preprocessor, registros),
+                                  rtol=0, atol=1e-9)
+
+
+def test_fila_suelta_igual_que_en_lote(artefactos_numpy, registros):
+    codificador = CodificadorCompilado(artefactos_numpy.preprocessor)
+    lote = codificador.transform(registros)
+    for indice in (0, len(registros) - 3):
+        numpy.testing.assert_array_equal(codificador.transform([registros[indice]])[0], lote[indice])
+
+
+def test_igual_que_el_preprocesador_con_hashing(registros):
+    preprocessor = preprocesador(CodificadorHashing(n_features=64))
+    preprocessor.fit(pandas.DataFrame.from_records(registros[:200], columns=columnas_modelo(preprocessor)))
+    numpy.testing.assert_allclose(CodificadorCompilado(preprocessor).transform(registros),
+                                  transformar_con_preprocesador(preprocessor, registros), rtol=0, atol=1e-9)
+
+
+def test_rechaza_transformadores_no_soportados(registros):
+    preprocessor = preprocesador(OneHotEncoder(drop='first', sparse_output=False))
+    preprocessor.fit(pandas.DataFrame.from_records(registros[:200], columns=columnas_modelo(preprocessor)))
+    with pytest.raises(ValueError):
+        CodificadorCompilado(preprocessor)
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import app
+
+
+IBAN = "ES0012345678"
+TRANSACCIONES = [{"IBAN": IBAN, "producto_map": "Monthly Subscription", "empresa_cobradora_norm": "Netflix",
+                  "valor": 12.99 + indice, "fecha": f"2025-0{indice + 1}-17"} for indice in range(3)]
+
+
+@pytest.fixture
+def puntuador(cliente, monkeypatch):
+    """
+    Sustituye ML+LLM por un score fijo por encima de cualquier umbral y anota cuántas filas
+    llegan a puntuarse en cada llamada. 'solo_ml' decide si el LLM "respondió".
+    """
+    estado = {"solo_ml": False, "llamadas": []}
+
+    def puntuar_lote(lista_tx_data, historiales, rasgos, tiempos=None, limite=None):
+        estado["llamadas"].append(len(lista_tx_data))
+        return [(0.99, estado["solo_ml"])] * len(lista_tx_data)
+
+    monkeypatch.setattr(app, "puntuar_lote", puntuar_lote)
+    monkeypatch.setitem(app.ESTADO_ARRANQUE, "modelos", True)
+    assert cliente.post("/users", json={"iban": IBAN, "id_usuario": "u1", "token_acceso": "t",
+                                        "valido_hasta": "2030-01-01T00:00:00", "umbral": "bajo"}).status_code == 201
+    return estado
+
+
+def subir(cliente, transacciones):
+    respuesta = cliente.post("/processing/file", query_string={"async": 0}, json={"transacciones": transacciones})
+    assert respuesta.status_code == 202
+    return respuesta.get_json()["alertas_creadas"]
+
+
+def subir_ndjson(cliente, transacciones):
+    cuerpo = "".join(json.dumps(transaccion) + "\n" for transaccion in transacciones)
+    respuesta = cliente.post("/processing/file", query_string={"async": 0}, data=cuerpo, content_type="application/x-ndjson")
+    assert respuesta.status_code == 202
+    return respuesta.get_json()["alertas_creadas"]
+
+
+def test_resubida_no_vuelve_a_puntuar_ni_duplica_alertas(cliente, puntuador):
+    assert subir(cliente, TRANSACCIONES) == 3
+    assert subir(cliente, TRANSACCIONES) == 0
+    assert subir(cliente, TRANSACCIONES[1:] + [dict(TRANSACCIONES[0], valor=99.0)]) == 1
+
+    assert puntuador["llamadas"] == [3, 1]
+    assert len(cliente.get("/alerts", query_string={"limit": 0}).get_json()) == 4
+
+
+def test_filas_identicas_cuentan_aunque_caigan_en_trozos_distintos(cliente, puntuador, monkeypatch):
+    monkeypatch.setattr(app.en_trozos, "__defaults__", (2,))  # trozos de 2 filas
+    repetida, otra = TRANSACCIONES[0], TRANSACCIONES[1]
+
+    assert subir_ndjson(cliente, [repetida, otra, repetida]) == 3
+    codigos = {alerta["codigo_transaccion"] for alerta in cliente.get("/alerts", query_string={"limit": 0}).get_json()}
+    assert len(codigos) == 3
+    # El mismo fichero otra vez: mismos códigos, nada nuevo
+    assert subir_ndjson(cliente, [repetida, otra, repetida]) == 0
+    assert subir(cliente, [repetida, otra, repetida]) == 0
+
+
+def test_sin_iban_tampoco_se_repuntua(cliente, puntuador):
+    sin_iban = [{clave: valor for clave, valor in transaccion.items() if clave != "IBAN"} for transaccion in TRANSACCIONES]
+    subir(cliente, sin_iban)
+    subir(cliente, sin_iban)
+
+    assert puntuador["llamadas"] == [3]
+
+
+def test_solo_ml_se_repuntua_hasta_tener_llm(cliente, puntuador):
+    puntuador["solo_ml"] = True
+    assert subir(cliente, TRANSACCIONES) == 3
+    puntuador["solo_ml"] = False
+    assert subir(cliente, TRANSACCIONES) == 0  # la alerta ya existía
+    subir(cliente, TRANSACCIONES)
+
+    assert puntuador["llamadas"] == [3, 3]
+
+
+def test_quitar_duplicados_deja_la_mas_antigua(cliente):
+    tabla = app.AlertasEmitidas.__table__
+    indice = next(indice for indice in tabla.indexes if indice.unique)
+    filas = [{"IBAN": IBAN, "Cod_Transaccion": codigo, "Importe": importe, "Umbral_probabilistico": 0.9}
+             for codigo, importe in (("a", 1.0), ("a", 2.0), ("b", 3.0), ("a", 4.0))]
+    with app.app.app_context():
+        indice.drop(app.db.engine)
+        try:
+            with app.db.engine.begin() as conexion:
+                conexion.execute(tabla.insert(), filas)
+            assert app.quitar_duplicados(tabla, indice) == 2
+        finally:
+            indice.create(app.db.engine)
+
+    importes = {alerta["codigo_transaccion"]: alerta["importe"]
+                for alerta in cliente.get("/alerts", query_string={"limit": 0}).get_json()}
+    assert importes == {"a": 1.0, "b": 3.0}
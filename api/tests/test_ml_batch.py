@@ -0,0 +1,39 @@
+import numpy
+import pytest
+
+from ai.machineLearning import queryMachineLearning as ml
+
+
+@pytest.fixture
+def registro_numpy(monkeypatch, artefactos_numpy):
+    """
+    El registro del proceso sirviendo los artefactos del backend NumPy ya cargados.
+    """
+    monkeypatch.setattr(ml.registro_modelo, "_artefactos", artefactos_numpy)
+    return ml.registro_modelo
+
+
+def test_lote_igual_que_fila_a_fila(registro_numpy, transacciones_entrenamiento):
+    muestra = transacciones_entrenamiento[:150]
+    por_fila = [ml.queryMachineLearning(transaccion) for transaccion in muestra]
+    lote = ml.queryMachineLearningBatch(muestra)
+
+    assert lote.shape == (len(muestra),)
+    numpy.testing.assert_allclose(lote, por_fila, rtol=0, atol=1e-6)
+
+
+def test_trozos_no_cambian_el_resultado(registro_numpy, transacciones_entrenamiento):
+    muestra = transacciones_entrenamiento[:150]
+    numpy.testing.assert_allclose(ml.queryMachineLearningBatch(muestra, tamano_trozo=7),
+                                  ml.queryMachineLearningBatch(muestra), rtol=0, atol=1e-6)
+
+
+def test_fila_sin_columnas_queda_en_05_sin_afectar_al_resto(registro_numpy, transacciones_entrenamiento):
+    muestra = list(transacciones_entrenamiento[:10])
+    completa = ml.queryMachineLearningBatch(muestra)
+    muestra[3] = {clave: valor for clave, valor in muestra[3].items() if clave != "collector_company"}
+
+    riesgos = ml.queryMachineLearningBatch(muestra)
+
+    assert riesgos[3] == 0.5
+    numpy.testing.assert_allclose(numpy.delete(riesgos, 3), numpy.delete(completa, 3), rtol=0, atol=1e-6)
@@ -0,0 +1,33 @@
+import numpy
+import pandas
+import pytest
+
+from ai.machineLearning.modelRegistry import NOMBRE_ARCHIVO_MODELO, cargar_artefactos
+from ai.machineLearning.numpyInference import TOLERANCIA_FLOAT32, TOLERANCIA_FLOAT64, ModeloNumpy
+from ai.machineLearning.queryMachineLearning import columnas_modelo
+
+
+@pytest.fixture(scope="module")
+def matriz_y_referencia(transacciones_entrenamiento):
+    """
+    Transacciones preprocesadas y lo que predice Keras con los mismos pesos.
+    """
+    pytest.importorskip("tensorflow")
+    artefactos_keras = cargar_artefactos(backend="keras")
+    preprocessor = artefactos_keras.preprocessor
+    X = preprocessor.transform(pandas.DataFrame.from_records(transacciones_entrenamiento,
+                                                             columns=columnas_modelo(preprocessor))).astype(float)
+    return X, artefactos_keras.model.predict(X, batch_size=X.shape[0], verbose=0)
+
+
+@pytest.mark.parametrize("dtype, tolerancia", [("float64", TOLERANCIA_FLOAT64), ("float32", TOLERANCIA_FLOAT32)])
+def test_numpy_igual_que_keras(matriz_y_referencia, dtype, tolerancia):
+    X, referencia = matriz_y_referencia
+    prediccion = ModeloNumpy(NOMBRE_ARCHIVO_MODELO, dtype).predict(X)
+
+    assert prediccion.shape == referencia.shape
+    assert numpy.abs(prediccion - referencia).max() <= tolerancia
+
+
+def test_pesos_coinciden_con_el_preprocesador(artefactos_numpy):
+    assert artefactos_numpy.model.num_features == artefactos_numpy.num_features
@@ -0,0 +1,62 @@
+import pytest
+
+from ai.largeLanguageModel import queryLargeLanguageModel as llm
+from ai.largeLanguageModel.ollamaStandIn import ServidorOllamaLocal
+
+
+HISTORIAL = {
+    "user_profile": {"age": 35, "salary_usd": 35000.5, "is_urban": True},
+    "transactions": [
+        {"product_category": "Monthly Subscription", "collector_company": "Netflix", "transaction_value": 12.99,
+         "transaction_date": f"2025-{mes:02d}-17", "is_recurring": True, "has_been_refunded": False}
+        for mes in range(1, 10)
+    ],
+}
+TRANSACCIONES = [{"product_category": "Monthly Subscription", "collector_company": f"Servicio {i}",
+                  "transaction_value": 5.0 + i, "transaction_date": "2025-10-17"} for i in range(6)]
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    """
+    Sustituto de Ollama en un puerto efímero, sin caché de riesgos y con la caché de prefijos vacía.
+    """
+    servidor = ServidorOllamaLocal().iniciar()
+    monkeypatch.setattr(llm, "OLLAMA_URL", servidor.url)
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(llm, "cache_prefijos", llm.CachePrefijos())
+    yield servidor
+    servidor.parar()
+
+
+def test_prefijo_da_los_mismos_riesgos_con_menos_tokens(servidor, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PREFIX_REUSE", False)
+    completos = [llm.evaluar_riesgo_llm(transaccion, HISTORIAL) for transaccion in TRANSACCIONES]
+    tokens_completos = servidor.tokens_prompt_evaluados
+
+    monkeypatch.setattr(llm, "LLM_PREFIX_REUSE", True)
+    servidor.tokens_prompt_evaluados = 0
+    reutilizados = llm.queryLargeLanguageModelBatch(TRANSACCIONES, [HISTORIAL] * len(TRANSACCIONES))
+
+    assert reutilizados == completos
+    assert None not in reutilizados
+    assert servidor.tokens_prompt_evaluados < tokens_completos
+    assert servidor.peticiones_con_context == len(TRANSACCIONES)
+
+
+def test_prefijo_se_evalua_una_vez_por_cliente(servidor, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PREFIX_REUSE", True)
+    llm.queryLargeLanguageModelBatch(TRANSACCIONES, [HISTORIAL] * len(TRANSACCIONES))
+
+    assert llm.cache_prefijos.evaluaciones == 1
+    assert llm.cache_prefijos.reutilizaciones == len(TRANSACCIONES) - 1
+
+
+def test_historial_cambiado_evalua_prefijo_nuevo(servidor, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_PREFIX_REUSE", True)
+    llm.evaluar_riesgo_llm(TRANSACCIONES[0], HISTORIAL)
+    historial = dict(HISTORIAL, transactions=HISTORIAL["transactions"] + [
+        dict(HISTORIAL["transactions"][-1], transaction_date="2025-10-17")])
+    llm.evaluar_riesgo_llm(TRANSACCIONES[0], historial)
+
+    assert llm.cache_prefijos.evaluaciones == 2